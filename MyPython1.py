@@ -1,36 +1,50 @@
 import os
 import sys
+import re
 import csv
+import array
+import mmap
 import math
 import time
 import copy
+import queue
+import pickle
+import hashlib
+import json
+import argparse
+import contextlib
+import atexit
+import socket
+import socketserver
+import threading
+import traceback
+import operator
+import multiprocessing
+import warnings
 import numpy
-import pandapower as pp
-from pandas import options as pdoptions
-
-cwd = os.path.dirname(__file__)
-
-# -- DEVELOPMENT DEFAULT ------------------------------------------------------
-if not sys.argv[1:]:
-    con_fname = cwd + r'/sandbox/scenario_1/custom_case.con'
-    inl_fname = cwd + r'/sandbox/scenario_1/case.inl'
-    raw_fname = cwd + r'/sandbox/scenario_1/custom_case.raw'
-    rop_fname = cwd + r'/sandbox/scenario_1/case.rop'
-    outfname1 = cwd + r'/sandbox/scenario_1/solution1.txt'
-    outfname2 = cwd + r'/sandbox/scenario_1/solution2.txt'
-
-# -- USING COMMAND LINE -------------------------------------------------------
-if sys.argv[1:]:
-    print()
-    con_fname = sys.argv[1]
-    inl_fname = sys.argv[2]
-    raw_fname = sys.argv[3]
-    rop_fname = sys.argv[4]
-    outfname1 = 'solution1.txt'
-    outfname2 = 'solution2.txt'
+try:
+    import resource
+except ImportError:     # not available on windows, peak rss is not reported
+    resource = None
+# -- PANDAS, SCIPY AND PANDAPOWER ARE IMPORTED WHERE THEY ARE USED, PARSING AND PREFLIGHT DO NOT NEED THEM --
 
 CONRATING = 2       # contingency line and xfmr ratings 0=RateA, 1=RateB, 2=RateC
 ITMXN = 40          # max iterations solve option
+OPF_ITMXN = 150     # max interior point iterations of a contingency opf (pips default)
+CASE_CACHE_VERSION = 5  # bump when the layout of cached parsed cases changes
+GOVERNOR_ITERATIONS = 10    # max power flows per governor response contingency
+GOVERNOR_TOLERANCE = 1.0    # kw, slack output change left unshared after a governor response power flow
+LOW_RANK_ITERATIONS = 50    # max chord iterations of a branch outage power flow on the updated base case jacobian
+LOW_RANK_PANDAPOWER = ('1.6.',)     # pandapower releases whose private internals the low rank branch outage solve is written against
+TIER_LOADING = 0.9          # tiered solve: dc opf branch loading (fraction of rating) that calls for the ac opf
+TIER_ANGLE = 30.0           # tiered solve: dc opf branch angle difference (degrees) that calls for the ac opf
+NATIVE_OPF_FEASTOL = 5e-6       # native opf: constraint violation tolerance (pandapower's OPF_VIOLATION)
+NATIVE_OPF_TOLERANCE = 1e-6     # native opf: gradient, complementarity and cost change tolerance (pips default)
+NATIVE_OPF_COST_SCALE = 1e-4    # native opf: objective scale factor in the interior point iterations (pips default)
+NATIVE_OPF_STEP = 0.99995       # native opf: fraction of the step to the boundary that is taken (pips default)
+NATIVE_OPF_CENTERING = 0.1      # native opf: barrier reduction per iteration (pips default)
+NATIVE_OPF_DELTA = 1e-10        # native opf: generator limits are narrowed in p and widened in q by this, as pandapower does
+NATIVE_CHECK_TOLERANCE = {'vm_pu': 1e-6, 'va_degree': 1e-4, 'mw': 1e-3, 'objective': 1e-8}    # --check-native-opf limits, objective relative
 # RUN_OPF = 1         # 0=normal powerflow, 1=optimal powerflow
 
 
@@ -76,30 +90,100 @@ def get_reserve_csvdata(fname):
     return
 
 
+# -- CONTINGENCY TABLE: ELEMENT KINDS IN THE CON FILE, RESOLVED PANDAPOWER ELEMENT TABLES ------
+CON_GEN = 0         # REMOVE UNIT id FROM BUS i
+CON_BRANCH = 1      # OPEN BRANCH FROM BUS i TO BUS j CIRCUIT ckt
+CON_ELEMENTS = ['gen', 'line', 'trafo']     # resolved table codes 0, 1, 2, -1 when not in the network
+# -- PLAIN CON RECORDS, ONE PER LINE WITH UNQUOTED IDS, MATCHED ON '\n' + TEXT + '\n' (A '\n' PREFIX SCANS FAST, ^ WITH re.M DOES NOT) --
+CON_PLAIN_LABEL = re.compile(r"\n[ \t]*CONTINGENCY[ \t]+[^'\s]+[ \t]*(?=\n)")
+CON_PLAIN_UNIT = re.compile(r"\n[ \t]*REMOVE[ \t]+UNIT[ \t]+([^'\s]+)[ \t]+FROM[ \t]+BUS[ \t]+([1-9]\d*)[ \t]*(?=\n)")
+CON_PLAIN_BRANCH = re.compile(r"\n[ \t]*OPEN[ \t]+BRANCH[ \t]+FROM[ \t]+BUS[ \t]+([1-9]\d*)[ \t]+TO[ \t]+BUS[ \t]+([1-9]\d*)[ \t]+CIRCUIT[ \t]+([^'\s]+)[ \t]*(?=\n)")
+CON_PLAIN_END = re.compile(r"\n[ \t]*END[ \t]*(?=\n)")
+
+
+def get_con_fields(line):
+    """ split one con record, unit ids and circuits may be quoted """
+    if "'" not in line:
+        return line.split()
+    return [x.strip() for x in next(csv.reader([line], delimiter=' ', quotechar="'", skipinitialspace=True)) if x.strip()]
+
+
 def get_contingencies(fname):
-    condict = {'branch': {}, 'gen': {}}
-    dobj = get_con_csvdata(fname)
-    while True:
-        line = next(dobj)
-        if not line:
-            continue
-        if line[0].upper() == 'END':
-            break
-        if line[0].upper() == 'CONTINGENCY':
-            clabel = line[1]
-            while True:
-                line = next(dobj)
-                if not line:
-                    continue
-                if line[0].upper() == 'END':
+    """ stream the con file into a compact contingency table, labels in file order, contingency c owns the element
+        rows offsets[c]:offsets[c + 1] of kinds (CON_GEN, CON_BRANCH), ibus, jbus (0 for units) and ids (unit id or circuit) """
+    labels = []
+    offsets = array.array('q', [0])
+    kinds = array.array('b')
+    ibus = array.array('q')
+    jbus = array.array('q')
+    ids = []
+    inside = False
+    with open(fname, 'r') as fobject:
+        for line in fobject:
+            fields = get_con_fields(line)
+            if not fields:
+                continue
+            keyword = fields[0].upper()
+            if keyword == 'END':
+                if not inside:
                     break
-                if len(line) == 10:
-                    bkey = line[4] + '-' + line[7] + '-' + line[9]
-                    condict['branch'].update({bkey: clabel})
-                if len(line) == 6:
-                    gkey = line[5] + '-' + line[2]
-                    condict['gen'].update({gkey: clabel})
-    return condict
+                offsets.append(len(kinds))
+                inside = False
+            elif keyword == 'CONTINGENCY':
+                labels.append(fields[1])
+                inside = True
+            elif inside and len(fields) == 10:
+                kinds.append(CON_BRANCH)
+                ibus.append(int(fields[4]))
+                jbus.append(int(fields[7]))
+                ids.append(sys.intern(fields[9]))
+            elif inside and len(fields) == 6:
+                kinds.append(CON_GEN)
+                ibus.append(int(fields[5]))
+                jbus.append(0)
+                ids.append(sys.intern(fields[2]))
+    return {'labels': labels, 'offsets': numpy.frombuffer(offsets, dtype=numpy.int64), 'kinds': numpy.frombuffer(kinds, dtype=numpy.int8),
+            'ibus': numpy.frombuffer(ibus, dtype=numpy.int64), 'jbus': numpy.frombuffer(jbus, dtype=numpy.int64), 'ids': ids}
+
+
+def get_contingency_keys(contable):
+    """ generator and branch keys of every contingency element, as create_network keys genidxdict, linedict and xfmrdict """
+    return [('%d-%s' % (i, x)) if kind == CON_GEN else ('%d-%d-%s' % (i, j, x))
+            for kind, i, j, x in zip(contable['kinds'].tolist(), contable['ibus'].tolist(), contable['jbus'].tolist(), contable['ids'])]
+
+
+def get_contingency_key_sets(fname):
+    """ generator and branch key sets of a con file holding only plain CONTINGENCY, REMOVE UNIT, OPEN BRANCH and END lines,
+        None for any other layout; the sets hold every key get_contingency_keys would return for the file """
+    with open(fname, 'r') as fobject:
+        text = '\n' + fobject.read() + '\n'
+    lines = text.split('\n')
+    units = CON_PLAIN_UNIT.findall(text)
+    branches = CON_PLAIN_BRANCH.findall(text)
+    if len(lines) - lines.count('') != len(CON_PLAIN_LABEL.findall(text)) + len(CON_PLAIN_END.findall(text)) + len(units) + len(branches):
+        return None
+    return [{i + '-' + x for x, i in units}, {i + '-' + j + '-' + x for i, j, x in branches}]
+
+
+def resolve_contingencies(contable, g_dict, l_dict, x_dict):
+    """ pandapower element table code (position in CON_ELEMENTS, -1 when not found) and index of every contingency element,
+        branches are also looked up with their buses swapped """
+    tables = numpy.full(len(contable['kinds']), -1, dtype=numpy.int8)
+    indices = numpy.full(len(contable['kinds']), -1, dtype=numpy.int64)
+    for k, (kind, key) in enumerate(zip(contable['kinds'].tolist(), get_contingency_keys(contable))):
+        if kind == CON_GEN:
+            if key in g_dict:
+                tables[k], indices[k] = 0, g_dict[key]
+            continue
+        i, j, ckt = key.split('-', 2)
+        for bkey in [key, j + '-' + i + '-' + ckt]:
+            if bkey in l_dict:
+                tables[k], indices[k] = 1, l_dict[bkey]
+                break
+            if bkey in x_dict:
+                tables[k], indices[k] = 2, x_dict[bkey]
+                break
+    return [tables, indices]
 
 
 def get_gen_reserves(fname):
@@ -116,227 +200,249 @@ def get_gen_reserves(fname):
     return pfdict
 
 
-def format_busdata(lol):
-    areanums = []
-    if lol != [[]]:
-        for i in range(len(lol)):
-            lol[i] = [int(lol[i][0]), str(lol[i][1]), float(lol[i][2]), int(lol[i][3]), int(lol[i][4]), int(lol[i][5]), int(lol[i][6]),
-                      float(lol[i][7]), float(lol[i][8]), float(lol[i][9]), float(lol[i][10]), float(lol[i][11]), float(lol[i][12])]
-            areanums.append(lol[i][3])
-            areanums = list(set(areanums))
-            areanums.sort()
-    return lol, areanums
-
-
-def format_loaddata(lol):
-    # load = ['I', 'ID', 'STATUS', 'AREA', 'ZONE', 'PL', 'QL', 'IP', 'IQ', 'YP', 'YQ', 'OWNER', 'SCALE', 'INTRPT']
-    if lol != [[]]:
-        for i in range(len(lol)):
-            lol[i] = [int(lol[i][0]), str(lol[i][1]), int(lol[i][2]), int(lol[i][3]), int(lol[i][4]), float(lol[i][5]), float(lol[i][6]),
-                      float(lol[i][7]), float(lol[i][8]), float(lol[i][9]), float(lol[i][10]), int(lol[i][11]), int(lol[i][12]), int(lol[i][13])]
-    return lol
-
-
-def format_fixshuntdata(lol):
-    # fixshunt = ['I', 'ID', 'STATUS', 'GL', 'BL']
-    if lol != [[]]:
-        for i in range(len(lol)):
-            lol[i] = [int(lol[i][0]), str(lol[i][1]), int(lol[i][2]), -1e3 * float(lol[i][3]), -1e3 * float(lol[i][4])]
-    return lol
-
-
-def format_gendata(lol):
-    # gens = ['I', 'ID', 'PG', 'QG', 'QT', 'QB', 'VS', 'IREG', 'MBASE', 'ZR', 'ZX', 'RT', 'XT', 'GTAP', 'STAT', 'RMPCT', 'PT', 'PB',
-    #         'O1', 'F1', 'O2', 'F2', 'O3', 'F3', 'O4', 'F4', 'WMOD', 'WPF']
-    if lol != [[]]:
-        for i in range(len(lol)):
-            lol[i] = [int(lol[i][0]), str(lol[i][1]),
-                      -1e3 * float(lol[i][2]), -1e3 * float(lol[i][3]),
-                      -1e3 * float(lol[i][4]), -1e3 * float(lol[i][5]),
-                      float(lol[i][6]), int(lol[i][7]), float(lol[i][8]), float(lol[i][9]), float(lol[i][10]),
-                      float(lol[i][11]), float(lol[i][12]), float(lol[i][13]), int(lol[i][14]), float(lol[i][15]),
-                      -1e3 * float(lol[i][16]),
-                      -1e3 * float(lol[i][17]),
-                      int(lol[i][18]), float(lol[i][19]),
-                      int(lol[i][20]), float(lol[i][21]),
-                      int(lol[i][22]), float(lol[i][23]),
-                      int(lol[i][24]), float(lol[i][25]),
-                      int(lol[i][26]), int(lol[i][27])]
-    return lol
-
-
-def format_branchdata(lol):
-    # branch = ['I', 'J', 'CKT', 'R', 'X', 'B', 'RATEA', 'RATEB', 'RATEC', 'GI', 'BI', 'GJ', 'BJ', 'ST', 'MET', 'LEN',
-    #           'O1', 'F1', 'O2', 'F2', 'O3', 'F3', 'O4', 'F4']
-    if lol != [[]]:
-        for i in range(len(lol)):
-            lol[i] = [int(lol[i][0]), int(lol[i][1]), str(lol[i][2]), float(lol[i][3]), float(lol[i][4]), float(lol[i][5]), float(lol[i][6]),
-                      float(lol[i][7]), float(lol[i][8]), float(lol[i][9]), float(lol[i][10]), float(lol[i][11]), float(lol[i][12]), int(lol[i][13]),
-                      int(lol[i][14]), float(lol[i][15]), int(lol[i][16]), float(lol[i][17]), int(lol[i][18]), float(lol[i][19]),
-                      int(lol[i][20]), float(lol[i][21]), int(lol[i][22]), float(lol[i][23])]
-    return lol
-
-
-def split_xfmrdata(lol):
+# -- RAW SECTION FIELDS: (NAME, TYPE, SCALE), TYPE i=int f=float s=string --------
+# -- SCALE -1e3 CONVERTS MW/MVAR TO PANDAPOWER KW/KVAR GENERATION CONVENTION --
+RAW_BUS_FIELDS = [('I', 'i', 1), ('NAME', 's', 1), ('BASKV', 'f', 1), ('IDE', 'i', 1), ('AREA', 'i', 1), ('ZONE', 'i', 1), ('OWNER', 'i', 1),
+                  ('VM', 'f', 1), ('VA', 'f', 1), ('NVHI', 'f', 1), ('NVLO', 'f', 1), ('EVHI', 'f', 1), ('EVLO', 'f', 1)]
+RAW_LOAD_FIELDS = [('I', 'i', 1), ('ID', 's', 1), ('STATUS', 'i', 1), ('AREA', 'i', 1), ('ZONE', 'i', 1), ('PL', 'f', 1), ('QL', 'f', 1),
+                   ('IP', 'f', 1), ('IQ', 'f', 1), ('YP', 'f', 1), ('YQ', 'f', 1), ('OWNER', 'i', 1), ('SCALE', 'i', 1), ('INTRPT', 'i', 1)]
+RAW_FIXSHUNT_FIELDS = [('I', 'i', 1), ('ID', 's', 1), ('STATUS', 'i', 1), ('GL', 'f', -1e3), ('BL', 'f', -1e3)]
+RAW_GEN_FIELDS = [('I', 'i', 1), ('ID', 's', 1), ('PG', 'f', -1e3), ('QG', 'f', -1e3), ('QT', 'f', -1e3), ('QB', 'f', -1e3),
+                  ('VS', 'f', 1), ('IREG', 'i', 1), ('MBASE', 'f', 1), ('ZR', 'f', 1), ('ZX', 'f', 1), ('RT', 'f', 1), ('XT', 'f', 1),
+                  ('GTAP', 'f', 1), ('STAT', 'i', 1), ('RMPCT', 'f', 1), ('PT', 'f', -1e3), ('PB', 'f', -1e3),
+                  ('O1', 'i', 1), ('F1', 'f', 1), ('O2', 'i', 1), ('F2', 'f', 1), ('O3', 'i', 1), ('F3', 'f', 1), ('O4', 'i', 1), ('F4', 'f', 1),
+                  ('WMOD', 'i', 1), ('WPF', 'f', 1)]
+RAW_BRANCH_FIELDS = [('I', 'i', 1), ('J', 'i', 1), ('CKT', 's', 1), ('R', 'f', 1), ('X', 'f', 1), ('B', 'f', 1),
+                     ('RATEA', 'f', 1), ('RATEB', 'f', 1), ('RATEC', 'f', 1), ('GI', 'f', 1), ('BI', 'f', 1), ('GJ', 'f', 1), ('BJ', 'f', 1),
+                     ('ST', 'i', 1), ('MET', 'i', 1), ('LEN', 'f', 1),
+                     ('O1', 'i', 1), ('F1', 'f', 1), ('O2', 'i', 1), ('F2', 'f', 1), ('O3', 'i', 1), ('F3', 'f', 1), ('O4', 'i', 1), ('F4', 'f', 1)]
+RAW_XFMR2W_FIELDS = [
+    # -- record1 --------------------------------------------------------------
+    ('I', 'i', 1), ('J', 'i', 1), ('K', 'i', 1), ('CKT', 's', 1), ('CW', 'i', 1), ('CZ', 'i', 1), ('CM', 'i', 1),
+    ('MAG1', 'f', 1), ('MAG2', 'f', 1), ('NMETR', 'i', 1), ('NAME', 's', 1), ('STAT', 'i', 1),
+    ('O1', 'i', 1), ('F1', 'f', 1), ('O2', 'i', 1), ('F2', 'f', 1), ('O3', 'i', 1), ('F3', 'f', 1), ('O4', 'i', 1), ('F4', 'f', 1),
+    ('VECGRP', 's', 1),
+    # -- record2 --------------------------------------------------------------
+    ('R1_2', 'f', 1), ('X1_2', 'f', 1), ('SBASE1_2', 'f', 1),
+    # -- record3 --------------------------------------------------------------
+    ('WINDV1', 'f', 1), ('NOMV1', 'f', 1), ('ANG1', 'f', 1), ('RATA1', 'f', 1), ('RATB1', 'f', 1), ('RATC1', 'f', 1),
+    ('COD1', 'i', 1), ('CONT1', 'i', 1), ('RMA1', 'f', 1), ('RMI1', 'f', 1), ('VMA1', 'f', 1), ('VMI1', 'f', 1),
+    ('NTP1', 'i', 1), ('TAB1', 'i', 1), ('CR1', 'f', 1), ('CX1', 'f', 1), ('CNXA1', 'f', 1),
+    # -- record4 --------------------------------------------------------------
+    ('WINDV2', 'f', 1), ('NOMV2', 'f', 1)]
+RAW_ZONE_FIELDS = [('I', 'i', 1), ('ZONAME', 's', 1)]
+RAW_SWSHUNT_FIELDS = [('I', 'i', 1), ('MODSW', 'i', 1), ('ADJM', 'i', 1), ('STAT', 'i', 1), ('VSWHI', 'f', 1), ('VSWLO', 'f', 1),
+                      ('SWREM', 'i', 1), ('RMPCT', 'f', 1), ('RMIDNT', 's', 1), ('BINIT', 'f', -1e3),
+                      ('N1', 'i', 1), ('B1', 'f', -1e3), ('N2', 'i', 1), ('B2', 'f', -1e3), ('N3', 'i', 1), ('B3', 'f', -1e3),
+                      ('N4', 'i', 1), ('B4', 'f', -1e3), ('N5', 'i', 1), ('B5', 'f', -1e3), ('N6', 'i', 1), ('B6', 'f', -1e3),
+                      ('N7', 'i', 1), ('B7', 'f', -1e3), ('N8', 'i', 1), ('B8', 'f', -1e3)]
+
+# -- RAW SECTIONS IN FILE ORDER, WITH FIELDS FOR THE SECTIONS THE PIPELINE USES --
+RAW_SECTIONS = [('bus', RAW_BUS_FIELDS), ('load', RAW_LOAD_FIELDS), ('fixshunt', RAW_FIXSHUNT_FIELDS), ('gen', RAW_GEN_FIELDS),
+                ('branch', RAW_BRANCH_FIELDS), ('xfmr', None), ('area', None), ('dcline', None), ('vsc', None), ('xfmric', None),
+                ('mtdcline', None), ('msline', None), ('zone', RAW_ZONE_FIELDS), ('areaxfer', None), ('owner', None), ('facts', None),
+                ('swshunt', RAW_SWSHUNT_FIELDS), ('gne', None), ('machine', None)]
+
+
+# -- '0 / END OF ... DATA' OR BARE '0' SECTION TERMINATORS AND THE 'Q' END OF FILE RECORD, FROM THE PRECEDING NEWLINE --
+RAW_TERMINATOR_LINE = re.compile(br"\n[ \t]*(0[ \t]*(?=/|\r?\n|\Z)|0 +[^\s,]|Q)")
+
+
+RAW_QUOTED = re.compile(r"'[^']*'")
+
+
+def get_raw_section_rows(records):
+    """ tokenize the records of one raw section, skipping blank lines """
+    reader = csv.reader(records, delimiter=',', quotechar="'")
+    return [row for row in reader if row]
+
+
+def get_raw_section_columns(records, fields, counted=False):
+    """ fast path: mask quoted strings and convert every numeric field of the section with one numpy call,
+        return None if the records do not all have exactly the expected fields (counted: no record has more) """
+    nrecords = len(records)
+    nfields = len(fields)
+    nstrings = len([x for x in fields if x[1] == 's'])
+    text = '\n'.join(records)
+    strings = RAW_QUOTED.findall(text)
+    if len(strings) != nrecords * nstrings:
+        return None
+    text = RAW_QUOTED.sub('0', text)
+    if not counted and any(x.count(',') != nfields - 1 for x in text.split('\n')):
+        return None
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        values = numpy.fromstring(text.replace('\n', ','), sep=',')
+    if values.size != nrecords * nfields:
+        return None
+    values = values.reshape(nrecords, nfields)
+    strings = numpy.array([x[1:-1].strip() for x in strings]).reshape(nrecords, nstrings)
+    columns = []
+    k = 0
+    for j in range(nfields):
+        name, kind, scale = fields[j]
+        if kind == 's':
+            columns.append(strings[:, k])
+            k += 1
+        elif kind == 'i':
+            columns.append(values[:, j].astype(numpy.int64))
+        else:
+            columns.append(values[:, j] * scale if scale != 1 else values[:, j].copy())
+    return columns
+
+
+def get_raw_section_array(records, fields, section, counted=False):
+    """ convert the records of one raw section to a numpy structured array, one typed column per field,
+        counted records are known to hold at most len(fields) fields """
+    records = [x for x in records if x.strip()]
+    nfields = len(fields)
+    if not records:
+        return numpy.zeros(0, dtype=[(name, 'U1' if kind == 's' else ('i8' if kind == 'i' else 'f8')) for name, kind, scale in fields])
+    columns = get_raw_section_columns(records, fields, counted)
+    if columns is None:
+        # -- IRREGULAR RECORDS (UNQUOTED IDS, EXTRA FIELDS), USE CSV READER ---
+        rows = get_raw_section_rows(records)
+        if min(len(row) for row in rows) < nfields:
+            raise ValueError('RAW ' + section.upper() + ' DATA RECORD HAS FEWER THAN ' + str(nfields) + ' FIELDS')
+        rows = list(zip(*rows))
+        columns = []
+        for j in range(nfields):
+            name, kind, scale = fields[j]
+            if kind == 's':
+                column = numpy.array([x.strip() for x in rows[j]])
+            elif kind == 'i':
+                column = numpy.array(rows[j]).astype(float).astype(numpy.int64)
+            else:
+                column = numpy.array(rows[j]).astype(float)
+                if scale != 1:
+                    column *= scale
+            columns.append(column)
+    data = numpy.zeros(len(records), dtype=[(fields[j][0], columns[j].dtype) for j in range(nfields)])
+    for j in range(nfields):
+        data[fields[j][0]] = columns[j]
+    return data
+
+
+def split_xfmrdata(records):
+    """ join the 4 (2w) or 5 (3w) lines of each transformer record into one record """
+    records = [x for x in records if x.strip()]
     xfmrdata2w = []
     xfmrdata3w = []
     i = 0
-    while i < len(lol):
-        if lol[i][2] == '0':
-            xfmrdata2w.append(lol[i + 0] + lol[i + 1] + lol[i + 2] + lol[i + 3])
+    while i < len(records):
+        if records[i].split(',', 3)[2].strip() == '0':
+            xfmrdata2w.append(','.join(records[i:i + 4]))
             i += 4
-        elif lol[i][2] != '0':
-            xfmrdata3w.append(lol[i + 0] + lol[i + 1] + lol[i + 2] + lol[i + 3] + lol[i + 4])
+        else:
+            xfmrdata3w.append(','.join(records[i:i + 5]))
             i += 5
     return xfmrdata2w, xfmrdata3w
 
 
-def format_xfmr2wdata(lol):
-    # 2wxfmr = ['I', 'J', 'K', 'CKT', 'CW', 'CZ', 'CM', 'MAG1', 'MAG2', 'NMETR', 'NAME', 'STAT', 'O1', 'F1', 'O2', 'F2', 'O3', 'F3', 'O4', 'F4', 'VECGRP',
-    #           'R1-2', 'X1-2', 'SBASE1-2', 'WINDV1', 'NOMV1', 'ANG1', 'RATA1', 'RATB1', 'RATC1', 'COD1', 'CONT1', 'RMA1', 'RMI1', 'VMA1', 'VMI1',
-    #           'NTP1', 'TAB1', 'CR1', 'CX1', 'CNXA1', 'WINDV2', 'NOMV2']
-    if lol != [[]]:
-        for i in range(len(lol)):
-            lol[i] = [
-                # -- record1 --------------------------------------------------
-                int(lol[i][0]), int(lol[i][1]), int(lol[i][2]), str(lol[i][3]),
-                int(lol[i][4]), int(lol[i][5]), int(lol[i][6]),
-                float(lol[i][7]), float(lol[i][8]), int(lol[i][9]),
-                str(lol[i][10]), int(lol[i][11]),  # status is end
-                int(lol[i][12]), float(lol[i][13]),  # o1 f1
-                int(lol[i][14]), float(lol[i][15]),  # o2 f2
-                int(lol[i][16]), float(lol[i][17]),  # o3 f3
-                int(lol[i][18]), float(lol[i][19]),  # o4 f4
-                str(lol[i][20]),  # vecgroup
-                # -- record2 --------------------------------------------------
-                float(lol[i][21]), float(lol[i][22]), float(lol[i][23]),  # r1 x1 sbase1-2
-                # -- record3 --------------------------------------------------
-                float(lol[i][24]), float(lol[i][25]), float(lol[i][26]),  # windv1 nomv1 angle1
-                float(lol[i][27]), float(lol[i][28]), float(lol[i][29]),  # rate1A rate1A rate1C
-                int(lol[i][30]), int(lol[i][31]),  # cod1 cont1
-                float(lol[i][32]), float(lol[i][33]),  # rma1 rmi1
-                float(lol[i][34]), float(lol[i][35]),  # vma1 vmi1
-                int(lol[i][36]), int(lol[i][37]),  # ntp1 tab1
-                float(lol[i][38]), float(lol[i][39]), float(lol[i][40]),  # cr1 cx1 cnxa1
-                # -- record4 --------------------------------------------------
-                float(lol[i][41]), float(lol[i][42])  # windv2 nomv2
-            ]
-    return lol
-
-
-def format_xfmr3wdata(lol):
-    # 3wxfmr = ['I', 'J', 'K', 'CKT', 'CW', 'CZ', 'CM', 'MAG1', 'MAG2', 'NMETR', 'NAME', 'STAT', 'O1', 'F1', 'O2', 'F2', 'O3', 'F3', 'O4', 'F4', 'VECGRP',
-    #           'R1 - 2', 'X1 - 2', 'SBASE1 - 2', 'R2 - 3', 'X2 - 3', 'SBASE2 - 3', 'R3 - 1', 'X3 - 1', 'SBASE3 - 1', 'VMSTAR', 'ANSTAR',
-    #           'WINDV1', 'NOMV1', 'ANG1', 'RATA1', 'RATB1', 'RATC1', 'COD1', 'CONT1', 'RMA1', 'RMI1', 'VMA1', 'VMI1', 'NTP1', 'TAB1', 'CR1', 'CX1', 'CNXA1',
-    #           'WINDV2', 'NOMV2', 'ANG2', 'RATA2', 'RATB2', 'RATC2', 'COD2', 'CONT2', 'RMA2', 'RMI2', 'VMA2', 'VMI2', 'NTP2', 'TAB2', 'CR2', 'CX2', 'CNXA2',
-    #           'WINDV3', 'NOMV3', 'ANG3', 'RATA3', 'RATB3', 'RATC3', 'COD3', 'CONT3', 'RMA3', 'RMI3', 'VMA3', 'VMI3', 'NTP3', 'TAB3', 'CR3', 'CX3', 'CNXA3']
-    if lol != [[]]:
-        for i in range(len(lol)):
-            lol[i] = [
-                # -- record1 --------------------------------------------------
-                int(lol[i][0]), int(lol[i][1]), int(lol[i][2]), str(lol[i][3]),
-                int(lol[i][4]), int(lol[i][5]), int(lol[i][6]),
-                float(lol[i][7]), float(lol[i][8]), int(lol[i][9]),
-                str(lol[i][10]), int(lol[i][11]),  # status is end
-                int(lol[i][12]), float(lol[i][13]),  # o1 f1
-                int(lol[i][14]), float(lol[i][15]),  # o2 f2
-                int(lol[i][16]), float(lol[i][17]),  # o3 f3
-                int(lol[i][18]), float(lol[i][19]),  # o4 f4
-                str(lol[i][20]),  # vecgroup
-                # -- record2 --------------------------------------------------
-                float(lol[i][21]), float(lol[i][22]), float(lol[i][23]),  # r1 x1 sbase1
-                float(lol[i][24]), float(lol[i][25]), float(lol[i][26]),  # r2 x3 sbase2
-                float(lol[i][27]), float(lol[i][28]), float(lol[i][29]),  # r3 x3 sbase3
-                int(lol[i][30]), int(lol[i][31]),  # vmstar anstar
-                # -- record3 --------------------------------------------------
-                float(lol[i][32]), float(lol[i][33]), float(lol[i][34]),  # windv1 nomv1 angle1
-                float(lol[i][35]), float(lol[i][36]), float(lol[i][37]),  # rate1A rate1A rate1C
-                int(lol[i][38]), int(lol[i][39]),  # cod1 cont1
-                float(lol[i][40]), float(lol[i][41]),  # rma1 rmi1
-                float(lol[i][42]), float(lol[i][43]),  # vma1 vmi1
-                int(lol[i][44]), int(lol[i][45]),  # ntp1 tab1
-                float(lol[i][46]), float(lol[i][47]), float(lol[i][48]),  # cr1 cx1 cnxa1
-                # -- record4 --------------------------------------------------
-                float(lol[i][49]), float(lol[i][50]), float(lol[i][51]),  # windv2 nomv2 angle2
-                float(lol[i][52]), float(lol[i][53]), float(lol[i][54]),  # rate2A rate2A rate2C
-                int(lol[i][55]), int(lol[i][56]),  # cod2 cont2
-                float(lol[i][57]), float(lol[i][58]),  # rma2 rmi2
-                float(lol[i][59]), float(lol[i][60]),  # vma2 vmi2
-                int(lol[i][61]), int(lol[i][62]),  # ntp2 tab2
-                float(lol[i][63]), float(lol[i][64]), float(lol[i][65]),  # cr2 cx2 cnxa2
-                # -- record5 --------------------------------------------------
-                float(lol[i][66]), float(lol[i][67]), float(lol[i][68]),  # windv3 nomv3 angle3
-                float(lol[i][69]), float(lol[i][70]), float(lol[i][71]),  # rate3A rate3A rate3C
-                int(lol[i][72]), int(lol[i][73]),  # cod3 cont3
-                float(lol[i][74]), float(lol[i][75]),  # rma3 rmi3
-                float(lol[i][76]), float(lol[i][77]),  # vma3 vmi3
-                int(lol[i][78]), int(lol[i][79]),  # ntp3 tab3
-                float(lol[i][80]), float(lol[i][81]), float(lol[i][82])  # cr3 cx3 cnxa3
-            ]
-    return lol
-
-
-def format_zonedata(lol):
-    if lol != [[]]:
-        for i in range(len(lol)):
-            lol[i] = [int(lol[i][0]), str(lol[i][1])]
-    return lol
-
-
-def format_ownerdata(lol):
-    if lol != [[]]:
-        for i in range(len(lol)):
-            lol[i] = [int(lol[i][0]), str(lol[i][1])]
-    return lol
-
-
-def format_swshuntdata(lol):
-    # I, MODSW, ADJM, STAT, VSWHI, VSWLO, SWREM, RMPCT, RMIDNT, BINIT, N1, B1, N2, B2, N3, B3, N4, B4, N5, B5, N6, B6, N7, B7, N8, B8
-    if lol != [[]]:
-        for i in range(len(lol)):
-            lol[i] = [
-
-                int(lol[i][0]), int(lol[i][1]), int(lol[i][2]), int(lol[i][3]), float(lol[i][4]),
-                float(lol[i][5]), int(lol[i][6]), float(lol[i][7]), str(lol[i][8]), -1e3 * float(lol[i][9]),
-                int(lol[i][10]), -1e3 * float(lol[i][11]), int(lol[i][12]), -1e3 * float(lol[i][13]), int(lol[i][14]), -1e3 * float(lol[i][15]),
-                int(lol[i][16]), -1e3 * float(lol[i][17]), int(lol[i][18]), -1e3 * float(lol[i][19]), int(lol[i][20]),  -1e3 * float(lol[i][21]),
-                int(lol[i][22]), -1e3 * float(lol[i][23]), int(lol[i][24]), -1e3 * float(lol[i][25])]
-    return lol
+def get_raw_section_index(fname):
+    """ memory map the raw file and scan it once for the section terminators, return the header record and the
+        byte range of every section present in the file, by RAW_SECTIONS name """
+    with open(fname, 'rb') as fobject:
+        buffer = mmap.mmap(fobject.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        header = next(csv.reader([buffer[:buffer.find(b'\n')].decode()], delimiter=',', quotechar="'"))
+        # -- THE FIRST THREE LINES ARE THE HEADER RECORDS -------------------------
+        start = -1
+        for k in range(3):
+            start = buffer.find(b'\n', start + 1)
+            if start < 0:
+                return [header, {}]
+        sectionranges = {}
+        sectionnames = iter([x[0] for x in RAW_SECTIONS])
+        start += 1
+        for terminator in RAW_TERMINATOR_LINE.finditer(buffer, start - 1):
+            if start >= len(buffer):
+                break
+            name = next(sectionnames, None)
+            if name is None:
+                break
+            sectionranges[name] = (start, terminator.start() + 1)
+            start = buffer.find(b'\n', terminator.end())
+            start = len(buffer) if start < 0 else start + 1
+            if terminator.group(1) == b'Q':
+                break
+        else:
+            name = next(sectionnames, None)
+            if name is not None and start < len(buffer):
+                sectionranges[name] = (start, len(buffer))
+    finally:
+        buffer.close()
+    return [header, sectionranges]
+
+
+def get_raw_section_data(buffer, section, start, end, keyfields=None):
+    """ parse one raw section straight from its byte range of the mapped file, return {name: array}, the transformer
+        section gives the 2w array and the 3w records """
+    records = buffer[start:end].decode().splitlines() if end > start else []
+    if section == 'xfmr':
+        xfmr2wdata, xfmr3wdata = split_xfmrdata(records)
+        return {'xfmr2w': get_raw_key_array(xfmr2wdata, RAW_XFMR2W_FIELDS, 'xfmr2w', keyfields), 'xfmr3w': get_raw_section_rows(xfmr3wdata)}
+    return {section: get_raw_key_array(records, dict(RAW_SECTIONS)[section], section, keyfields)}
+
+
+def get_raw_data(fname, keyfields=None):
+    """ read a raw file, return mva base, base frequency and a dict of numpy structured arrays by section,
+        keyfields = {section: positions} keeps only the fields at those positions of the listed sections and skips the others,
+        sections without fields in RAW_SECTIONS (facts, multi-terminal dc, gne, ...) are never tokenized """
+    header, sectionranges = get_raw_section_index(fname)
+    mva_base = float(header[1].strip())
+    basefreq = float(header[5].strip()[:4])
+    # -- SECTIONS ARE PARSED IN THIS PROCESS: WORKER STARTUP AND SENDING THE ARRAYS BACK COST MORE THAN THE PARSE --
+    rawdata = {}
+    with open(fname, 'rb') as fobject:
+        buffer = mmap.mmap(fobject.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        for section, fields in RAW_SECTIONS:
+            if fields is None and section != 'xfmr':
+                continue
+            start, end = sectionranges.get(section, (0, 0))
+            if keyfields is not None and section not in keyfields and section != 'xfmr':
+                start, end = (0, 0)
+            rawdata.update(get_raw_section_data(buffer, section, start, end, keyfields))
+    finally:
+        buffer.close()
+    return mva_base, basefreq, rawdata
+
+
+def get_raw_key_array(records, fields, section, keyfields):
+    """ get_raw_section_array over all fields, or over the fields at positions keyfields[section] only; records with a
+        comma inside a quoted string cannot be split by position and are parsed over all fields """
+    if keyfields is None:
+        return get_raw_section_array(records, fields, section)
+    positions = keyfields.get(section, [])
+    if not positions:
+        return get_raw_section_array([], fields[:1], section)
+    records = list(filter(str.strip, records))
+    if any(',' in x for x in RAW_QUOTED.findall('\n'.join(records))):
+        return get_raw_section_array(records, fields, section)
+    pick = operator.itemgetter(*positions)
+    nsplit = max(positions) + 1
+    if len(positions) == 1:
+        records = [pick(x.split(',', nsplit)) for x in records]
+    else:
+        records = [','.join(pick(x.split(',', nsplit))) for x in records]
+    return get_raw_section_array(records, [fields[j] for j in positions], section, counted=True)
 
 
-def get_swingbus_data(lol):
+def get_swingbus_data(busdata):
     # bus = ['I', 'NAME', 'BASKV', 'IDE', 'AREA', 'ZONE', 'OWNER', 'VM', 'VA', 'NVHI', 'NVLO', 'EVHI', 'EVLO']
-    swbus = None
-    swangle = 0.0
-    for i in lol:
-        if i[3] == 3:
-            swbus = i[0]
-            swname = i[1]
-            swkv = i[2]
-            swangle = i[8]
-            swvhigh = i[11]
-            swvlow = i[12]
-            break
-    return [swbus, swname, swkv, swangle, swvlow, swvhigh]
+    i = numpy.flatnonzero(busdata['IDE'] == 3)[0]
+    return [busdata['I'][i], busdata['NAME'][i], busdata['BASKV'][i], busdata['VA'][i], busdata['EVLO'][i], busdata['EVHI'][i]]
 
 
-def get_swing_gen_data(lol, swbus):
+def get_swing_gen_data(gendata, swbus):
     # gens = ['I', 'ID', '-PG', '-QG', 'QT', 'QB', 'VS', 'IREG', 'MBASE', 'ZR', 'ZX', 'RT', 'XT', 'GTAP', 'STAT', 'RMPCT', '-PT', '-PB',
     #         'O1', 'F1', 'O2', 'F2', 'O3', 'F3', 'O4', 'F4', 'WMOD', 'WPF']
-    for i in lol:
-        if i[0] == swbus:
-            sw_key = str(i[0]) + '-' + i[1]
-            sw_id = i[1]
-            sw_pgen = i[2]
-            sw_qgen = i[3]
-            sw_qmin = i[4]
-            sw_qmax = i[5]
-            vreg_sw = i[6]
-            sw_pmin = i[16]
-            sw_pmax =i[17]
-            break
-    gdata = [x for x in lol if x[0] != swbus]
-    return [gdata, sw_key, sw_id, vreg_sw,  sw_pgen, sw_pmin, sw_pmax, sw_qgen, sw_qmin, sw_qmax]
+    i = numpy.flatnonzero(gendata['I'] == swbus)[0]
+    sw_key = str(gendata['I'][i]) + '-' + gendata['ID'][i]
+    gdata = gendata[gendata['I'] != swbus]
+    return [gdata, sw_key, gendata['ID'][i], gendata['VS'][i], gendata['PG'][i], gendata['PT'][i], gendata['PB'][i],
+            gendata['QG'][i], gendata['QT'][i], gendata['QB'][i]]
 
 
 def write_csvdata(fname, lol, label):
@@ -349,171 +455,250 @@ def write_csvdata(fname, lol, label):
     return
 
 
-def write_base_bus_results(fname, b_results, fx_dict, sw_dict, g_results, sh_results, exgridbus):
-    # -- DELETE UNUSED DATAFRAME COLUMNS --------------------------------------
-    try:
-        del b_results['p_kw']        # not used for reporting
-    except KeyError:
-        pass
-    try:
-        del b_results['q_kvar']      # not used for reporting
-    except KeyError:
-        pass
-    try:
-        del b_results['lam_p']       # not used for reporting
-    except KeyError:
-        pass
-    try:
-        del b_results['lam_q']       # not used for reporting
-    except KeyError:
-        pass
-    # -- REMOVE EXTERNAL GRID BUS RESULTS -------------------------------------
-    b_results.drop([exgridbus], inplace=True)
-    # -- ADD BUSNUMBER COLUMN -------------------------------------------------
-    b_results.insert(0, 'bus', b_results.index)
-    # -- ADD SHUNT MVARS COLUMN (FILLED WITH 0.0) -----------------------------
-    b_results['sh_mvars'] = 0.0
-    # -- RENAME COLUMN HEADINGS -----------------------------------------------
-    b_results.rename(columns={'vm_pu': 'voltage', 'va_degree': 'angle'}, inplace=True)
-    # -- PREVENT NEGATIVE ZEROS -----------------------------------------------
-    b_results['voltage'] += 0.0
-    b_results['angle'] += 0.0
-    # -- CONVERT PANDAS DATAFRAME TO LIST FOR REPORTING -----------------------
-    buslist = [b_results.columns.values.tolist()] + b_results.values.tolist()
-    # -- GET ANY SHUNT MVARS FOR REPORTING ------------------------------------
-    # -- (SWITCHED SHUNTS ARE MODELED AS GENERATORS) --------------------------
-    for j in range(1, len(buslist)):
-        buslist[j][0] = int(buslist[j][0])
-        bus = buslist[j][0]
-        mvars = 0.0
-        #if bus in fx_dict:
-        #    mvars = -1e-3 * sh_results.loc[fx_dict[bus], 'q_kvar']
-        #if bus in sw_dict:
-        #    mvars = -1e-3 * g_results.loc[sw_dict[bus], 'q_kvar']
-        #if bus in fx_dict and bus in sw_dict:
-        #    mvars1 = -1e-3 * sh_results.loc[fx_dict[bus], 'q_kvar']
-        #    mvars2 = -1e-3 * g_results.loc[sw_dict[bus], 'q_kvar']
-        #    mvars = mvars1 + mvars2
-        buslist[j][3] = mvars + 0.0
-    # -- WRITE THE BUS RESULTS TO FILE ----------------------------------------
-    write_csvdata(fname, buslist, [['--bus section']])
-    return
-
+# -- RUN METRICS: WALL TIME, CPU TIME AND PEAK RSS PER STAGE AND CONTINGENCY ----
+def get_peak_rss_mb():
+    """ peak resident set size of this process and its finished children in MB, None where unavailable """
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak / (1024.0 ** 2 if sys.platform == 'darwin' else 1024.0)
+
+
+def get_cpu_time():
+    """ user + system cpu time of this process and its finished children """
+    return sum(os.times()[:4])
+
+
+class RunMetrics(object):
+    """ collects stage and contingency timings, written as json and csv next to the solution files """
+    def __init__(self, listener=None):
+        self.stages = []
+        self.contingencies = []
+        self.current = None
+        self.listener = listener    # optional callable, gets a progress event dict per stage and contingency
+
+    def start(self, name):
+        self.stop()
+        self.current = (name, time.time(), get_cpu_time())
+        if self.listener is not None:
+            self.listener({'event': 'stage', 'stage': name})
+        return
+
+    def stop(self):
+        if self.current is None:
+            return
+        name, wall_start, cpu_start = self.current
+        self.stages.append({'stage': name, 'wall_time': time.time() - wall_start, 'cpu_time': get_cpu_time() - cpu_start,
+                            'peak_rss_mb': get_peak_rss_mb()})
+        self.current = None
+        return
+
+    def add_contingency(self, c_result, write_time):
+        self.contingencies.append({'label': c_result['label'], 'path': c_result['path'], 'start': c_result['start'],
+                                   'wall_time': c_result['wall_time'], 'cpu_time': c_result['cpu_time'],
+                                   'peak_rss_mb': c_result['peak_rss_mb'], 'write_time': write_time})
+        if self.listener is not None:
+            self.listener({'event': 'contingency', 'label': c_result['label'], 'path': c_result['path'],
+                           'count': len(self.contingencies), 'wall_time': c_result['wall_time']})
+        return
+
+    def write(self, fname):
+        """ write fname.json with all records and fname.csv with one row per stage and contingency """
+        self.stop()
+        with open(fname + '.json', 'w') as fobject:
+            json.dump({'stages': self.stages, 'contingencies': self.contingencies}, fobject, indent=1)
+        columns = ['kind', 'name', 'path', 'start', 'wall_time', 'cpu_time', 'peak_rss_mb', 'write_time']
+        rows = [['stage', x['stage'], '', '', x['wall_time'], x['cpu_time'], x['peak_rss_mb'], ''] for x in self.stages]
+        rows += [['contingency', x['label'], x['path'], x['start'], x['wall_time'], x['cpu_time'], x['peak_rss_mb'], x['write_time']]
+                 for x in self.contingencies]
+        with open(fname + '.csv', 'w', newline='') as fobject:
+            writer = csv.writer(fobject)
+            writer.writerow(columns)
+            writer.writerows([['' if x is None else x for x in row] for row in rows])
+        return
+
+
+class ResultWriter(object):
+    """ buffered csv writer holding one output file open for the whole run, optionally serializing on a background thread """
+    def __init__(self, fname, background=False, buffersize=1 << 20):
+        self.fobject = open(fname, 'w', newline='', buffering=buffersize)
+        self.writer = csv.writer(self.fobject, delimiter=',', quotechar='"')
+        self.error = None
+        self.queue = None
+        self.thread = None
+        if background:
+            self.queue = queue.Queue(maxsize=64)
+            self.thread = threading.Thread(target=self.run, name='ResultWriter', daemon=True)
+            self.thread.start()
+
+    def write(self, lol, label):
+        """ write a section block (label rows, then data rows), blocks are written in call order """
+        if self.queue is None:
+            self.write_block(lol, label)
+            return
+        if self.error is not None:
+            raise self.error
+        self.queue.put((lol, label))
+        return
+
+    def write_block(self, lol, label):
+        for j in label:
+            self.writer.writerow(j)
+        self.writer.writerows(lol)
+        return
 
-def write_base_gen_results(fname, g_results, genids, gbuses, e_results, swing_bus, exgridbus, sw_idxs):
-    g_results.drop(sw_idxs, inplace=True)
-    del g_results['vm_pu']
-    del g_results['va_degree']
+    def run(self):
+        """ background thread: serialize queued blocks, flush whenever the queue runs dry """
+        while True:
+            block = self.queue.get()
+            if block is None:
+                break
+            if self.error is None:
+                try:
+                    self.write_block(*block)
+                    if self.queue.empty():
+                        self.fobject.flush()
+                except Exception as e:
+                    self.error = e
+        return
+
+    def close(self):
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+        self.fobject.close()
+        if self.error is not None:
+            raise self.error
+        return
+
+
+def get_result_maps(net, fx_dict, sw_dict, exgridbus, sw_idxs, swing_bus):
+    """ precompute result row positions used by the bus and generator writers """
+    import pandas
+    busnums = net.bus.index.values
+    busrows = numpy.flatnonzero(busnums != exgridbus)       # external grid bus is not reported
+    reported = pandas.Index(busnums[busrows])
+    genrows = numpy.flatnonzero(~net.gen.index.isin(sw_idxs))   # switched shunt generators are not reported
+    return {'busrows': busrows,
+            'busnums': busnums[busrows].tolist(),
+            'fx_rows': reported.get_indexer(list(fx_dict.keys())),
+            'fx_pos': net.shunt.index.get_indexer(list(fx_dict.values())),
+            'sw_rows': reported.get_indexer(list(sw_dict.keys())),
+            'sw_pos': net.gen.index.get_indexer(list(sw_dict.values())),
+            'genrows': genrows,
+            'swingrow': numpy.flatnonzero(net.gen.index.values[genrows] == swing_bus)[0],
+            'exgridrow': net.ext_grid.index.get_loc(exgridbus)}
+
+
+def get_bus_report(b_results, maps, g_results, sh_results):
+    """ bus report rows [bus, voltage, angle, shunt mvars] from the result arrays """
+    busrows = maps['busrows']
+    voltage = b_results['vm_pu'].values[busrows] + 0.0           # + 0.0 prevents negative zeros
+    angle = b_results['va_degree'].values[busrows] + 0.0
+    # -- SHUNT MVARS, FIXED SHUNTS PLUS SWITCHED SHUNTS (MODELED AS GENERATORS) --
+    mvars = numpy.zeros(len(busrows))
+    mvars[maps['fx_rows']] = -1e-3 * sh_results['q_kvar'].values[maps['fx_pos']]
+    mvars[maps['sw_rows']] += -1e-3 * g_results['q_kvar'].values[maps['sw_pos']]
+    mvars += 0.0
+    return [list(x) for x in zip(maps['busnums'], voltage.tolist(), angle.tolist(), mvars.tolist())]
+
+
+def get_gen_report(g_results, genids, gbuses, e_results, maps):
+    """ generator report rows [bus, id, mw, mvar] with the external grid added to the swing generator, and total mw """
+    genrows = maps['genrows']
+    p_kw = g_results['p_kw'].values[genrows]
+    q_kvar = g_results['q_kvar'].values[genrows]
     # -- COMBINE SWING GENERATOR AND EXTERNAL GRID CONTRIBUTIONS --------------
-    sw_kw = g_results.loc[swing_bus, 'p_kw']
-    sw_kvar = g_results.loc[swing_bus, 'q_kvar']
-    ex_kw = e_results.loc[exgridbus, 'p_kw']
-    ex_kvar = e_results.loc[exgridbus, 'q_kvar']
-    g_results.loc[swing_bus, 'p_kw'] = sw_kw + ex_kw
-    g_results.loc[swing_bus, 'q_kvar'] = sw_kvar + ex_kvar
+    p_kw[maps['swingrow']] += e_results['p_kw'].values[maps['exgridrow']]
+    q_kvar[maps['swingrow']] += e_results['q_kvar'].values[maps['exgridrow']]
     # -- CONVERT BACK TO MW AND MVARS -----------------------------------------
-    g_results['p_kw'] *= -1e-3
-    g_results['q_kvar'] *= -1e-3
-    g_results['p_kw'] += 0.0
-    g_results['q_kvar'] += 0.0
-    # -- RENAME COLUMN HEADINGS -----------------------------------------------
-    g_results.rename(columns={'p_kw': 'mw', 'q_kvar': 'mvar'}, inplace=True)
-    # -- ADD GENERATOR BUSNUMBERS AND IDS -------------------------------------
-    g_results.insert(0, 'id', genids)
-    g_results.insert(0, 'bus', gbuses)
+    mw = (p_kw * -1e-3 + 0.0).tolist()
+    mvar = (q_kvar * -1e-3 + 0.0).tolist()
     # -- CALCULATE TOTAL POWER OF PARTICIPATING GENERATORS --------------------
-    pgenerators = sum([x for x in g_results['mw'].values if x != 0.0])
-    # -- CONVERT PANDAS DATAFRAME TO LIST FOR REPORTING -----------------------
-    glist = [g_results.columns.values.tolist()] + g_results.values.tolist()
-    # -- WRITE THE GENERATION RESULTS TO FILE ---------------------------------
-    write_csvdata(fname, glist, [['--generator section']])
-    return pgenerators
+    pgenerators = sum([x for x in mw if x != 0.0])
+    return [list(x) for x in zip(gbuses, genids, mw, mvar)], pgenerators
 
 
-def write_bus_results(fname, b_results, fx_dict, sw_dict, g_results, sh_results, clabel, exgridbus):
-    # -- DELETE UNUSED DATAFRAME COLUMNS --------------------------------------
-    try:
-        del b_results['p_kw']        # not used for reporting
-    except KeyError:
-        pass
-    try:
-        del b_results['q_kvar']      # not used for reporting
-    except KeyError:
-        pass
-    try:
-        del b_results['lam_p']       # not used for reporting
-    except KeyError:
-        pass
-    try:
-        del b_results['lam_q']       # not used for reporting
-    except KeyError:
-        pass
-    # -- REMOVE EXTERNAL GRID BUS RESULTS -------------------------------------
-    b_results.drop([exgridbus], inplace=True)
-    # -- ADD BUSNUMBER COLUMN -------------------------------------------------
-    b_results.insert(0, 'bus', b_results.index)
-    # -- ADD SHUNT MVARS COLUMN (FILLED WITH 0.0) -----------------------------
-    b_results['sw_mvars'] = 0.0
-    # -- RENAME COLUMN HEADINGS -----------------------------------------------
-    b_results.rename(columns={'vm_pu': 'voltage', 'va_degree': 'angle'}, inplace=True)
-    # -- PREVENT NEGATIVE ZEROS -----------------------------------------------
-    b_results['voltage'] += 0.0
-    b_results['angle'] += 0.0
-    # -- CONVERT PANDAS DATAFRAME TO LIST FOR REPORTING -----------------------
-    buslist = [b_results.columns.values.tolist()] + b_results.values.tolist()
-    # -- GET ANY SHUNT MVARS FOR REPORTING ------------------------------------
-    # -- (SWITCHED SHUNTS ARE MODELED AS GENERATORS) --------------------------
-    for j in range(1, len(buslist)):
-        buslist[j][0] = int(buslist[j][0])
-        bus = buslist[j][0]
-        mvars = 0.0
-        #if bus in fx_dict:
-        #    mvars = -1e-3 * sh_results.loc[fx_dict[bus], 'q_kvar']
-        #if bus in sw_dict:
-        #    mvars = -1e-3 * g_results.loc[sw_dict[bus], 'q_kvar']
-        #if bus in fx_dict and bus in sw_dict:
-        #    mvars1 = -1e-3 * sh_results.loc[fx_dict[bus], 'q_kvar']
-        #    mvars2 = -1e-3 * g_results.loc[sw_dict[bus], 'q_kvar']
-        #    mvars = mvars1 + mvars2
-        buslist[j][3] = mvars + 0.0
-    # -- WRITE THE BUS RESULTS TO FILE ----------------------------------------
-    write_csvdata(fname, [], [['--contingency'], ['label'], [clabel]])
-    write_csvdata(fname, buslist, [['--bus section']])
+def write_base_bus_results(writer, busrows):
+    writer.write([['bus', 'voltage', 'angle', 'sh_mvars']] + busrows, [['--bus section']])
     return
 
 
-def write_gen_results(fname, g_results, genids, gbuses, b_pgens, e_results, swbus, exgridbus, sw_idxs):
-    g_results.drop(sw_idxs, inplace=True)
-    del g_results['vm_pu']
-    del g_results['va_degree']
-    # -- COMBINE SWING GENERATOR AND EXTERNAL GRID CONTRIBUTIONS --------------
-    sw_kw = g_results.loc[swbus, 'p_kw']
-    sw_kvar = g_results.loc[swbus, 'q_kvar']
-    ex_kw = e_results.loc[exgridbus, 'p_kw']
-    ex_kvar = e_results.loc[exgridbus, 'q_kvar']
-    g_results.loc[swbus, 'p_kw'] = sw_kw + ex_kw
-    g_results.loc[swbus, 'q_kvar'] = sw_kvar + ex_kvar
-    # -- CONVERT BACK TO MW AND MVARS -----------------------------------------
-    g_results['p_kw'] *= -1e-3
-    g_results['q_kvar'] *= -1e-3
-    g_results['p_kw'] += 0.0
-    g_results['q_kvar'] += 0.0
-    # -- RENAME COLUMN HEADINGS -----------------------------------------------
-    g_results.rename(columns={'p_kw': 'mw', 'q_kvar': 'mvar'}, inplace=True)
-    # -- ADD GENERATOR BUSNUMBERS AND IDS -------------------------------------
-    g_results.insert(0, 'id', genids)
-    g_results.insert(0, 'bus', gbuses)
-    # -- CALCULATE TOTAL POWER OF PARTICIPATING GENERATORS --------------------
-    c_gens = sum([x for x in g_results['mw'].values if x != 0.0])
-    # -- CONVERT PANDAS DATAFRAME TO LIST FOR REPORTING -----------------------
-    glist = [g_results.columns.values.tolist()] + g_results.values.tolist()
-    # -- WRITE THE GENERATION RESULTS TO FILE ---------------------------------
-    write_csvdata(fname, glist, [['--generator section']])
-    deltapgens = c_gens - b_pgens
-    write_csvdata(fname, [], [['--delta section'], ['delta_p'], [deltapgens]])
+def write_base_gen_results(writer, genrows):
+    writer.write([['bus', 'id', 'mw', 'mvar']] + genrows, [['--generator section']])
+    return
+
+
+def write_bus_results(writer, busrows, clabel):
+    writer.write([], [['--contingency'], ['label'], [clabel]])
+    writer.write([['bus', 'voltage', 'angle', 'sw_mvars']] + busrows, [['--bus section']])
+    return
+
+
+def write_gen_results(writer, genrows, deltapgens):
+    writer.write([['bus', 'id', 'mw', 'mvar']] + genrows, [['--generator section']])
+    writer.write([], [['--delta section'], ['delta_p'], [deltapgens]])
+    return
+
+
+def write_fidelity(writer, fidelity):
+    """ tag a result that is not an ac opf solution (dc opf or estimate), its voltages and mvars are not solved values """
+    if fidelity != 'ac':
+        writer.write([], [['--fidelity section'], ['fidelity'], [fidelity]])
     return
 
 
+CONVERGENCE_COLUMNS = ['label', 'path', 'fidelity', 'dc_critical', 'start', 'status', 'iterations', 'solve_time', 'objective', 'max_mismatch_kva',
+                       'message']
+
+
+class SolutionFiles(object):
+    """ result sink writing the base case to solution1, contingencies to solution2, their solver convergence to the
+        convergence csv and optionally the screening csv """
+    def __init__(self, fname1, fname2, background=False, screening=False):
+        self.solution1 = ResultWriter(fname1)
+        self.solution2 = ResultWriter(fname2, background=background)
+        self.convergence = ResultWriter(os.path.splitext(fname2)[0] + '_convergence.csv')
+        self.convergence.write([], [CONVERGENCE_COLUMNS])
+        self.screenfname = os.path.splitext(fname2)[0] + '_screening.csv'
+        self.screen_rows = [] if screening else None
+        try:
+            os.remove(self.screenfname)
+        except FileNotFoundError:
+            pass
+
+    def write_base(self, base):
+        write_base_bus_results(self.solution1, base['buses'])
+        write_base_gen_results(self.solution1, base['generators'])
+        write_fidelity(self.solution1, base['fidelity'])
+        self.solution1.close()
+        return
+
+    def write_contingency(self, c_result):
+        conlabel = "'" + c_result['label'] + "'"
+        # -- A CONTINGENCY WITHOUT A SOLUTION ONLY GETS ITS CONVERGENCE ROW ------
+        if c_result['fidelity'] != 'none':
+            write_bus_results(self.solution2, c_result['buses'], conlabel)
+            write_gen_results(self.solution2, c_result['generators'], c_result['delta_p'])
+            write_fidelity(self.solution2, c_result['fidelity'])
+        # -- DC, FALLBACK AND TOPOLOGY RESULTS DO NOT SOLVE THE NETWORK ------
+        row = [conlabel, c_result['path'], c_result['fidelity'], c_result.get('dc_critical'), c_result['start'],
+               c_result.get('status', 'not_solved'), c_result.get('iterations', 0),
+               c_result['wall_time'], c_result.get('objective'), c_result.get('mismatch'), c_result.get('message', '')]
+        self.convergence.write([['' if x is None else x for x in row]], [])
+        if self.screen_rows is not None:
+            severity = '' if c_result['severity'] is None else c_result['severity']
+            self.screen_rows.append([conlabel, c_result['path'], severity])
+        return
+
+    def close(self):
+        self.solution2.close()
+        self.convergence.close()
+        if self.screen_rows is not None:
+            write_csvdata(self.screenfname, self.screen_rows, [['label', 'path', 'severity']])
+        return
+
+
 def format_gendispdata(lol):
     # dispdata = ['I', 'ID', 'PARTICIPATION_FACTOR', 'POWER_DISP_TABLE']
     gddict = {}
@@ -540,507 +725,2730 @@ def format_powerdispdata(lol):
     return pdict
 
 
-def format_pwlcostdata(lol):
+def format_pwlcostdata(records, shared=True):
     # pwl_header = ['TABLE_NUM', 'TABLE_ID', 'NUM_PIECES']
     # pwl_data = ['MW', 'COST']
-    cdict = {}
-    if lol != [[]]:
-        for i in range(len(lol)):
-            if len(lol[i]) == 3:
-                lol[i] = [int(lol[i][0]), str(lol[i][1]), int(lol[i][2])]
-                ckey = lol[i][0]
-                cdict.update({ckey: []})
-            if len(lol[i]) == 2:
-                lol[i] = [-1e3 * float(lol[i][0]), float(lol[i][1])]
-                cdict[ckey].append(lol[i])
-    for ckey in cdict:
-        # cdict[ckey] = tupleoftuples(cdict[ckey])
-        # cdict[ckey] = list(set(cdict[ckey]))
-        # cdict[ckey] = listoflists(cdict[ckey])
-        cdict[ckey].sort()
-        cdict[ckey][0][0] -= 1.0
-        cdict[ckey][-1][0] += 1.0
-        for j in range(1, len(cdict[ckey])):
-            cdict[ckey][j][0] = cdict[ckey][j][0] + 0.1 * j
-
-
-    return cdict
-
-
-def print_dataframes_results(_net):
-    pdoptions.display.max_columns = 1000
-    pdoptions.display.max_rows = 1000
-    pdoptions.display.max_colwidth = 199
-    pdoptions.display.width = None
-    pdoptions.display.precision = 4
-    print()
-    print('BUS DATAFRAME')
-    print(_net.bus)
-    print()
-    print('BUS RESULTS')
-    print(_net.res_bus)
-    print()
-    print('LINE DATAFRAME')
-    print(_net.line)
-    print()
-    print('LINE RESULTS')
-    print(_net.res_line)
-    print()
-    print('TRANSFORMER DATAFRAME')
-    print(_net.trafo)
-    print()
-    print('TRANSFORMER RESULTS')
-    print(_net.res_trafo)
-    print()
-    print('GENERATOR DATAFRAME')
-    print(_net.gen)
-    print()
-    print('GENERATOR RESULTS')
-    print(_net.res_gen)
-    print()
-    return
-
-
-# =============================================================================
-# -- MAIN ---------------------------------------------------------------------
-# =============================================================================
-if __name__ == "__main__":
-    cwd = os.getcwd()
-    start_time = time.time()
-
-    # =========================================================================
-    # -- PARSE THE RAW FILE ---------------------------------------------------
-    # =========================================================================
-    print()
-    print('GETTING RAW DATA FROM FILE .........................................', os.path.split(raw_fname)[1])
-    raw_busdata = []
-    raw_loaddata = []
-    raw_fixshuntdata = []
-    raw_gendata = []
-    raw_branchdata = []
-    raw_xfmrdata = []
-    raw_areaidata = []
-    raw_dclinedata = []
-    raw_vscdata = []
-    raw_xfmricdata = []
-    raw_mtdclinedata = []
-    raw_mslinedata = []
-    raw_zonedata = []
-    raw_areaxferdata = []
-    raw_ownerdata = []
-    raw_factsdata = []
-    raw_swshuntdata = []
-    raw_gnedata = []
-    raw_machinedata = []
-    raw_rawdata = [raw_busdata, raw_loaddata, raw_fixshuntdata, raw_gendata, raw_branchdata, raw_xfmrdata, raw_areaidata, raw_dclinedata, raw_vscdata, raw_xfmricdata,
-                   raw_mtdclinedata, raw_mslinedata, raw_zonedata, raw_areaxferdata, raw_ownerdata, raw_factsdata, raw_swshuntdata, raw_gnedata, raw_machinedata]
-    dataobj = get_raw_csvdata(raw_fname)
-    line = next(dataobj)
-    mva_base = float(line[1])
-    basefreq = float(line[5][:4])
-    line = next(dataobj)
-    line = next(dataobj)
-    for record in raw_rawdata:
-        if line[0].startswith('Q'):
-            break
-        while True:
-            line = next(dataobj)
-            if line[0].startswith('0 ') or line[0].startswith('Q'):
-                break
-            record.append(line)
-    # =========================================================================
-    # if not raw_busdata: raw_busdata = [[]]
-    # if not raw_loaddata: raw_loaddata = [[]]
-    if not raw_fixshuntdata: raw_fixshuntdata = [[]]
-    # if not raw_gendata: raw_gendata = [[]]
-    # if not raw_branchdata: raw_branchdata = [[]]
-    # if not raw_xfmrdata: raw_xfmrdata = [[]]
-    if not raw_zonedata: raw_zonedata = [[]]
-    if not raw_ownerdata: raw_ownerdata = [[]]
-    if not raw_swshuntdata: raw_swshuntdata = [[]]
-
-    # -- SEPARATE 2WXFMRS AND 3WXFMRS -----------------------------------------
-    raw_xfmr2wdata, raw_xfmr3wdata = split_xfmrdata(raw_xfmrdata)
-    if not raw_xfmr2wdata: raw_xfmr2wdata = [[]]
-    if not raw_xfmr3wdata: raw_xfmr3wdata = [[]]
-
-    # -- ASSIGN DATA TYPES TO RAW DATA ----------------------------------------
-    # print('FORMATTING RAW DATA ................................................')
-    busdata, areas = format_busdata(raw_busdata)
-    loaddata = format_loaddata(raw_loaddata)
-    fixshuntdata = format_fixshuntdata(raw_fixshuntdata)
-    gendata = format_gendata(raw_gendata)
-    branchdata = format_branchdata(raw_branchdata)
-    xfmr2wdata = format_xfmr2wdata(raw_xfmr2wdata)
-    # xfmr3wdata = format_xfmr3wdata(raw_xfmr3wdata)
-    zonedata = format_zonedata(raw_zonedata)
-    swshuntdata = format_swshuntdata(raw_swshuntdata)
-
-    # -- GET SWING BUS FROM RAW BUSDATA ---------------------------------------
-    swingbus, swing_name, swing_kv, swing_angle, swing_vlow, swing_vhigh = get_swingbus_data(raw_busdata)
-
-    # -- GET SWING GEN DATA FROM GENDATA (REMOVE SWING GEN FROM GENDATA) ------
-    gendata, swing_key, swing_id, swing_vreg, swing_pgen, swing_pmin, swing_pmax, swing_qgen, swing_qmin, swing_qmax = get_swing_gen_data(gendata, swingbus)
-
-    # =========================================================================
-    # -- PARSE CON FILE -------------------------------------------------------
-    # =========================================================================
-    print('GETTING CONTINGENCY DATA FROM FILE .................................', os.path.split(con_fname)[1])
-    outagedict = get_contingencies(con_fname)
-    # =========================================================================
-
-    # =========================================================================
-    # -- PARSE THE ROP FILE ---------------------------------------------------
-    # =========================================================================
-    print('GETTING GENERATOR OPF DATA FROM FILE ...............................', os.path.split(rop_fname)[1])
-    rop_icode = None
-    rop_busvattdata = []
-    rop_adjshuntdata = []
-    rop_loaddata = []
-    rop_adjloaddata = []
-    rop_gendispdata = []
-    rop_powerdispdata = []
-    rop_genresdata = []
-    rop_genreactdata = []
-    rop_adjbranchreactdata = []
-    rop_pwlcostdata = []
-    rop_pwqcostdata = []
-    rop_polyexpcostdata = []
-    rop_periodresdata = []
-    rop_branchflowdata = []
-    rop_interfaceflowdata = []
-    rop_linearconstdata = []
-    rop_ropdata = [rop_busvattdata, rop_adjshuntdata, rop_loaddata, rop_adjloaddata, rop_gendispdata, rop_powerdispdata,
-                   rop_genresdata, rop_genreactdata, rop_adjbranchreactdata, rop_pwlcostdata, rop_pwqcostdata, rop_polyexpcostdata,
-                   rop_periodresdata, rop_branchflowdata, rop_interfaceflowdata, rop_linearconstdata]
-    dataobj = get_raw_csvdata(rop_fname)
-    line = []
-    while not line:
-        line = next(dataobj)
-    rop_icode = line[0][:1]
-    for record in rop_ropdata:
-        line = next(dataobj)
-        if line[0].startswith('0 '):
-            continue
-        while True:
-            if line[0].startswith('0 '):
-                break
-            record.append(line)
-            line = next(dataobj)
-
-    # =========================================================================
-    if not rop_gendispdata: rop_gendispdata = [[]]
-    if not rop_powerdispdata: rop_powerdispdata = [[]]
-    if not rop_pwlcostdata: rop_pwlcostdata = [[]]
+    # -- POINTS IN KW GENERATION CONVENTION, SORTED PER TABLE, END POINTS WIDENED BY 1 KW AND
+    # -- INNER POINTS SHIFTED BY 0.1 KW * POSITION SO THAT NO TWO POINTS SHARE THE SAME POWER --
+    # -- CURVES ARE STORED CSR STYLE, CURVE ROW r IS p[offsets[r]:offsets[r + 1]], f[...], TABLES MAP TO ROWS
+    # -- AND TABLES WITH IDENTICAL POINTS SHARE ONE ROW, UNLESS shared IS FALSE (ONE ROW PER TABLE) --
+    commas = numpy.array([x.count(',') for x in records], dtype=numpy.int64)
+    owner = numpy.cumsum(commas == 2) - 1                             # header position owning each record
+    headers = numpy.flatnonzero(commas == 2).tolist()
+    if not headers:
+        return {'tables': {}, 'offsets': numpy.zeros(1, dtype=numpy.int64), 'p': numpy.zeros(0), 'f': numpy.zeros(0)}
+    points = numpy.flatnonzero((commas == 1) & (owner >= 0))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        values = numpy.fromstring(','.join([records[i] for i in points.tolist()]), sep=',')
+    if values.size != 2 * len(points):
+        raise ValueError('ROP PIECEWISE LINEAR COST POINT IS NOT A NUMBER PAIR')
+    values = values.reshape(-1, 2)
+    p = -1e3 * values[:, 0]
+    f = values[:, 1]
+    table = owner[points]
+    order = numpy.lexsort((f, p, table))
+    table, p, f = table[order], p[order], f[order]
+    starts = numpy.searchsorted(table, numpy.arange(len(headers)))
+    ends = numpy.append(starts[1:], len(table))
+    position = numpy.arange(len(table)) - starts[table]
+    nonempty = ends > starts
+    p[starts[nonempty]] -= 1.0
+    p[ends[nonempty] - 1] += 1.0
+    p[position > 0] += 0.1 * position[position > 0]
+    tablenums = [int(row[0]) for row in get_raw_section_rows([records[i] for i in headers])]
+    if not shared:
+        return {'tables': dict(zip(tablenums, range(len(headers)))), 'offsets': numpy.append(starts, len(table)).astype(numpy.int64), 'p': p, 'f': f}
+    curves = {}
+    rows = [curves.setdefault((p[i:j].tobytes(), f[i:j].tobytes()), len(curves)) for i, j in zip(starts.tolist(), ends.tolist())]
+    first = numpy.unique(rows, return_index=True)[1]                 # first table of each curve row
+    lengths = (ends - starts)[first]
+    offsets = numpy.append(0, numpy.cumsum(lengths)).astype(numpy.int64)
+    gather = numpy.repeat(starts[first] - offsets[:-1], lengths) + numpy.arange(offsets[-1])
+    return {'tables': dict(zip(tablenums, rows)), 'offsets': offsets, 'p': p[gather], 'f': f[gather]}
+
+
+def get_pwl_curve(pwlcostdata, table):
+    """ kw and cost points of a piecewise linear cost table, views of the shared curve arrays """
+    row = pwlcostdata['tables'][table]
+    i, j = pwlcostdata['offsets'][row:row + 2]
+    return [pwlcostdata['p'][i:j], pwlcostdata['f'][i:j]]
+
+
+def check_pwl_curves(pwlcostdata):
+    """ per curve row: points in strictly ascending kw order, lowest and highest kw (nan for empty curves) """
+    offsets = pwlcostdata['offsets']
+    p = pwlcostdata['p']
+    nrows = len(offsets) - 1
+    with numpy.errstate(invalid='ignore'):
+        steps = numpy.flatnonzero(~(p[1:] > p[:-1])) + 1             # points not above the previous one, nan included
+    steprows = numpy.searchsorted(offsets, steps, side='right') - 1
+    ascending = numpy.ones(nrows, dtype=bool)
+    ascending[steprows[steps != offsets[steprows]]] = False           # a row's first point follows another row
+    nonempty = offsets[1:] > offsets[:-1]
+    pmin = numpy.full(nrows, numpy.nan)
+    pmax = numpy.full(nrows, numpy.nan)
+    pmin[nonempty] = p[offsets[:-1][nonempty]]
+    pmax[nonempty] = p[offsets[1:][nonempty] - 1]
+    return [ascending, pmin, pmax]
+
+
+# -- ROP SECTION TERMINATORS: '0 / END OF ... DATA' RECORDS ---------------------
+ROP_TERMINATOR = re.compile(r"\n[ \t]*0 +[^\s,][^\n]*")         # a literal '\n' prefix scans faster than ^ with re.M
+
+
+def get_rop_sections(fname):
+    """ non-blank records of the generator dispatch, active power dispatch and piecewise linear cost sections of the rop file """
+    # -- ROP SECTIONS IN FILE ORDER: 0 BUS VOLTAGE ATTRIBUTES, 1 ADJUSTABLE SHUNTS, 2 LOADS, 3 ADJUSTABLE LOADS,
+    # -- 4 GENERATOR DISPATCH, 5 ACTIVE POWER DISPATCH, 6 GENERATOR RESERVES, 7 REACTIVE CAPABILITY,
+    # -- 8 ADJUSTABLE BRANCH REACTANCE, 9 PWL COSTS, 10 PWQ COSTS, 11 POLYNOMIAL COSTS, 12 PERIOD RESERVES,
+    # -- 13 BRANCH FLOWS, 14 INTERFACE FLOWS, 15 LINEAR CONSTRAINTS. ONLY 4, 5 AND 9 ARE USED ------------
+    with open(fname, 'r') as fobject:
+        text = fobject.read().lstrip()
+    body = '\n' + text.split('\n', 1)[1] if '\n' in text else ''  # first line is the header record, '\n' starts the first record
+    sections = []
+    start = 0
+    for terminator in ROP_TERMINATOR.finditer(body):
+        sections.append((start, terminator.start()))
+        start = terminator.end()
+    sections += [(start, start)] * (10 - len(sections))
+    return [[x for x in body[i:j].splitlines() if x.strip()] for i, j in [sections[4], sections[5], sections[9]]]
+
+
+def get_rop_data(fname):
+    """ parse the rop file, return generator dispatch, power dispatch and piecewise linear cost dicts """
+    rop_gendispdata, rop_powerdispdata, rop_pwlcostdata = get_rop_sections(fname)
+    rop_gendispdata = [[x.strip() for x in row] for row in get_raw_section_rows(rop_gendispdata)] or [[]]
+    rop_powerdispdata = [[x.strip() for x in row] for row in get_raw_section_rows(rop_powerdispdata)] or [[]]
 
     # -- ASSIGN DATA TYPES TO ROP DATA AND CONVERT TO DICTS -------------------
     # print('FORMATTING ROP DATA ................................................')
     genopfdict = format_gendispdata(rop_gendispdata)
     gdispdict = format_powerdispdata(rop_powerdispdata)
     pwlcostdata = format_pwlcostdata(rop_pwlcostdata)
+    return [genopfdict, gdispdict, pwlcostdata]
+
+
+def get_rop_fields(records, columns):
+    """ stripped fields at the given positions of comma separated rop records, one list per position """
+    rows = get_raw_section_rows(records) if any("'" in x for x in records) else [x.split(',') for x in records]
+    return [[row[j].strip() for row in rows] for j in columns]
+
+
+def get_rop_keys(fname):
+    """ preflight parse of the rop file: the dispatch table links of get_rop_data from their key fields only,
+        piecewise linear costs with one unshared curve row per table """
+    rop_gendispdata, rop_powerdispdata, rop_pwlcostdata = get_rop_sections(fname)
+    gens, ids, tables = get_rop_fields(rop_gendispdata, [0, 1, 3])
+    tablenums, costtables = get_rop_fields(rop_powerdispdata, [0, 6])
+    genopfdict = dict(zip([x + '-' + y for x, y in zip(gens, ids)], [int(x) for x in tables]))
+    gdispdict = dict(zip([int(x) for x in tablenums], [int(x) for x in costtables]))
+    return [genopfdict, gdispdict, format_pwlcostdata(rop_pwlcostdata, shared=False)]
+
+
+def get_bus_positions(busindex, buses, element):
+    """ map element bus numbers to rows of the raw bus array """
+    positions = busindex.get_indexer(buses)
+    if (positions < 0).any():
+        raise UserWarning('%s ATTACHED TO NON-EXISTING BUS %s' % (element.upper(), buses[positions < 0][0]))
+    return positions
+
+
+def create_elements(net, element, index, values):
+    """ append a block of elements to a pandapower table in one concat, keeping table column order and dtypes """
+    import pandas
+    table = net[element]
+    dtypes = table.dtypes
+    columns = table.columns.tolist() + [x for x in values if x not in table.columns]
+    block = pandas.DataFrame(values, index=pandas.Index(index, dtype=numpy.int64), columns=columns)
+    table = pandas.concat([table.reindex(columns=columns), block])
+    for column in columns:
+        dtype = dtypes[column] if column in dtypes else block[column].dtype
+        if table[column].dtype != dtype:
+            table[column] = table[column].astype(dtype)
+    net[element] = table
+    return index
+
+
+def create_network(mva_base, basefreq, rawdata, genopfdict, gdispdict, pwlcostdata, participation_dict):
+    """ build the pandapower network with one table append per element type """
+    import pandas
+    import pandapower as pp
+    busdata = rawdata['bus']
+    loaddata = rawdata['load']
+    fixshuntdata = rawdata['fixshunt']
+    branchdata = rawdata['branch']
+    xfmr2wdata = rawdata['xfmr2w']
+    swshuntdata = rawdata['swshunt']
+    swingbus, swing_name, swing_kv, swing_angle, swing_vlow, swing_vhigh = get_swingbus_data(busdata)
+    gendata, swing_key, swing_id, swing_vreg, swing_pgen, swing_pmin, swing_pmax, swing_qgen, swing_qmin, swing_qmax = get_swing_gen_data(rawdata['gen'], swingbus)
 
-    # =========================================================================
-    # -- PARSE THE INL FILE ---------------------------------------------------
-    # =========================================================================
-    print('GETTING GENERATOR PARTICIPATION FACTORS FROM FILE ..................', os.path.split(inl_fname)[1])
-    participation_dict = get_gen_reserves(inl_fname)
-    # =========================================================================
-
-    # =========================================================================
-    # == CREATE NETWORK =======================================================
-    # =========================================================================
-    print('------------------------- CREATING NETWORK -------------------------')
     kva_base = 1000 * mva_base
     net = pp.create_empty_network('net', basefreq, kva_base)
 
     # == ADD BUSES TO NETWORK =================================================
     # bus = ['I', 'NAME', 'BASKV', 'IDE', 'AREA', 'ZONE', 'OWNER', 'VM', 'VA', 'NVHI', 'NVLO', 'EVHI', 'EVLO']
-    busdict = {}
     print('ADD BUSES ..........................................................')
-    for data in busdata:
-        busnum = data[0]
-        busname = data[1]
-        buskv = data[2]
-        buszone = data[5]
-        status = abs(data[3]) < 4
-        vmax = data[11]
-        vmin = data[12]
-        busdict.update({busnum: buskv})
-        idx = pp.create_bus(net, vn_kv=buskv, name=busname, index=busnum, type="b", zone=buszone, in_service=status, max_vm_pu=vmax, min_vm_pu=vmin)
+    busindex = pandas.Index(busdata['I'])
+    if not busindex.is_unique:
+        raise UserWarning('A BUS WITH INDEX %s ALREADY EXISTS' % busindex[busindex.duplicated()][0])
+    buskv = busdata['BASKV']
+    create_elements(net, 'bus', busdata['I'], {
+        'name': busdata['NAME'], 'vn_kv': buskv, 'type': 'b', 'zone': busdata['ZONE'], 'in_service': abs(busdata['IDE']) < 4,
+        'min_vm_pu': busdata['EVLO'], 'max_vm_pu': busdata['EVHI']})
 
     # == ADD LOADS TO NETWORK =================================================
     print('ADD LOADS ..........................................................')
     # load = ['I', 'ID', 'STATUS', 'AREA', 'ZONE', 'PL', 'QL', 'IP', 'IQ', 'YP', 'YQ', 'OWNER', 'SCALE', 'INTRPT']
-    for data in loaddata:
-        status = bool(data[2])
-        if not status:
-            continue
-        loadbus = data[0]
-        loadid = data[1]
-        loadname = str(loadbus) + loadid
-        loadp = data[5] * 1e3
-        loadq = data[6] * 1e3
-        pp.create_load(net, loadbus, loadp, q_kvar=loadq, name=loadname, scaling=1.0,
-                       max_p_kw=loadp, min_p_kw=loadp, max_q_kvar=loadq, min_q_kvar=loadq, controllable=False)
+    loads = loaddata[loaddata['STATUS'] != 0]
+    get_bus_positions(busindex, loads['I'], 'load')
+    loadp = loads['PL'] * 1e3
+    loadq = loads['QL'] * 1e3
+    create_elements(net, 'load', numpy.arange(len(loads)), {
+        'name': [str(x) + y for x, y in zip(loads['I'].tolist(), loads['ID'].tolist())], 'bus': loads['I'],
+        'p_kw': loadp, 'q_kvar': loadq, 'const_z_percent': 0.0, 'const_i_percent': 0.0, 'sn_kva': numpy.nan, 'scaling': 1.0,
+        'in_service': True, 'type': None, 'min_p_kw': loadp, 'max_p_kw': loadp, 'min_q_kvar': loadq, 'max_q_kvar': loadq,
+        'controllable': False})
 
     # == ADD GENERATORS TO NETWORK ============================================
     # gens = ['I', 'ID', 'PG', 'QG', 'QT', 'QB', 'VS', 'IREG', 'MBASE', 'ZR', 'ZX', 'RT', 'XT', 'GTAP', 'STAT', 'RMPCT', 'PT', 'PB',
     #         'O1', 'F1', 'O2', 'F2', 'O3', 'F3', 'O4', 'F4', 'WMOD', 'WPF']
+    # -- SWING GENERATOR FIRST AT INDEX SWINGBUS, REMAINING GENERATORS FOLLOW -
     print('ADD GENERATORS .....................................................')
-    genbuses = []
-    gids = []
-    genreg = {}
-    genidxdict = {}
-    pfactor_dict = {}
-    # -- ADD SWING GENERATOR --------------------------------------------------
-    genbus = swingbus
-    gid = swing_id
-    pgen = swing_pgen
-    qgen = swing_pgen
-    qmin = swing_qmin
-    qmax = swing_qmax
-    vreg = swing_vreg
-    status = True
-    pmin = swing_pmin
-    pmax = swing_pmax
-    pcostdata = None
-    genkey = str(swingbus) + '-' + gid
-
-    if genkey in genopfdict:
-        disptablekey = genopfdict[genkey]
-        costtablekey = gdispdict[disptablekey]
-        pcostdata = numpy.array(pwlcostdata[costtablekey])
-        idx = pp.create_gen(net, genbus, pgen, vm_pu=vreg, name=genkey, min_p_kw=pmin, max_p_kw=pmax, min_q_kvar=qmin, max_q_kvar=qmax,
-                            scaling=1.0, controllable=True, in_service=status, index=swingbus)  # force index to swingbus
-        pp.create_piecewise_linear_cost(net, idx, 'gen', pcostdata, type='p')
-
-        if genkey in participation_dict:
-            pfactor = participation_dict[genkey]
-            pfactor_dict.update({genkey: pfactor})
-    else:
-        idx = pp.create_gen(net, genbus, pgen, vm_pu=vreg, name=genkey, min_p_kw=pmin, max_p_kw=pmax, min_q_kvar=qmin, max_q_kvar=qmax,
-                            scaling=1.0, controllable=False, in_service=status, index=swingbus)  # force index to swingbus
-
-    genidxdict.update({genkey: idx})
-    genreg.update({genbus: vreg})
-    genbuses.append(genbus)
-    gids.append("'" + gid + "'")
-
-    # -- ADD REMAINING GENERATOR ----------------------------------------------
-    for data in gendata:
-        genbus = data[0]
-        gid = data[1]
-        pgen = data[2]
-        qgen = data[3]
-        qmin = data[4]
-        qmax = data[5]
-        vreg = data[6]
-        status = bool(data[14])
-        pmin = data[16]
-        pmax = data[17]
-        pcostdata = None
-        genkey = str(genbus) + '-' + gid
-        if genkey in genopfdict:
-            disptablekey = genopfdict[genkey]
-            costtablekey = gdispdict[disptablekey]
-            pcostdata = numpy.array(pwlcostdata[costtablekey])
-            idx = pp.create_gen(net, genbus, pgen, vm_pu=vreg, name=genkey, min_p_kw=pmin, max_p_kw=pmax, min_q_kvar=qmin, max_q_kvar=qmax,
-                                scaling=1.0, controllable=True, in_service=status)
-
-            pp.create_piecewise_linear_cost(net, idx, 'gen', pcostdata, type='p')
-
-            if genkey in participation_dict:
-                pfactor = participation_dict[genkey]
-                pfactor_dict.update({genkey: pfactor})
-
-        else:
-            idx = pp.create_gen(net, genbus, pgen, vm_pu=vreg, name=genkey, min_p_kw=pmin, max_p_kw=pmax, min_q_kvar=qmin, max_q_kvar=qmax,
-                                scaling=1.0, controllable=True, in_service=status)
-
-        genidxdict.update({genkey: idx})
-        genreg.update({genbus: vreg})
-        genbuses.append(genbus)
-        gids.append("'" + gid + "'")
-    genbuses = list(set(genbuses))
+    get_bus_positions(busindex, gendata['I'], 'gen')
+    genbus = numpy.append(swingbus, gendata['I'])
+    gen_ids = [swing_id] + gendata['ID'].tolist()
+    genkeys = [str(x) + '-' + y for x, y in zip(genbus.tolist(), gen_ids)]
+    genvreg = numpy.append(swing_vreg, gendata['VS'])
+    genpmin = numpy.append(swing_pmin, gendata['PT'])
+    genpmax = numpy.append(swing_pmax, gendata['PB'])
+    gencontrol = numpy.ones(len(genbus), dtype=bool)
+    gencontrol[0] = swing_key in genopfdict
+    genidx = swingbus + numpy.arange(len(genbus), dtype=numpy.int64)
+    genidxdict = dict(zip(genkeys, genidx.tolist()))
+    genreg = dict(zip(genbus.tolist(), genvreg.tolist()))
+    gids = ["'" + x + "'" for x in gen_ids]
+    genbuses = list(set(genbus.tolist()))
+
+    create_elements(net, 'gen', genidx, {
+        'name': genkeys, 'bus': genbus, 'p_kw': numpy.append(swing_pgen, gendata['PG']), 'vm_pu': genvreg, 'sn_kva': numpy.nan,
+        'min_q_kvar': numpy.append(swing_qmin, gendata['QT']), 'max_q_kvar': numpy.append(swing_qmax, gendata['QB']), 'scaling': 1.0,
+        'in_service': numpy.append(True, gendata['STAT'] != 0), 'type': None, 'min_p_kw': genpmin, 'max_p_kw': genpmax,
+        'controllable': gencontrol})
+
+    # -- PIECEWISE LINEAR COSTS FOR DISPATCHABLE GENERATORS, ONE P AND F ARRAY PER SHARED CURVE ROW --
+    dispatchable = [i for i, genkey in enumerate(genkeys) if genkey in genopfdict]
+    pfactor_dict = dict([(genkeys[i], participation_dict[genkeys[i]]) for i in dispatchable if genkeys[i] in participation_dict])
+    costrows = numpy.array([pwlcostdata['tables'][gdispdict[genopfdict[genkeys[i]]]] for i in dispatchable], dtype=numpy.int64)
+    ascending, curve_pmin, curve_pmax = check_pwl_curves(pwlcostdata)
+    with numpy.errstate(invalid='ignore'):
+        covered = (genpmax[dispatchable] <= curve_pmax[costrows]) & (genpmin[dispatchable] >= curve_pmin[costrows])
+    bad = numpy.flatnonzero(~ascending[costrows] | ~covered)
+    if len(bad):
+        genkey = genkeys[dispatchable[bad[0]]]
+        if not ascending[costrows[bad[0]]]:
+            raise ValueError('PIECEWISE LINEAR COSTS FOR ' + genkey + ' ARE NOT IN ASCENDING ORDER')
+        raise ValueError('PIECEWISE LINEAR COSTS FOR ' + genkey + ' DO NOT COVER THE GENERATOR POWER RANGE')
+    offsets = pwlcostdata['offsets']
+    curves = dict([(r, (pwlcostdata['p'][offsets[r]:offsets[r + 1]].reshape((1, -1)), pwlcostdata['f'][offsets[r]:offsets[r + 1]].reshape((1, -1))))
+                   for r in set(costrows.tolist())])
+    cost_elements = genidx[dispatchable].tolist()
+    cost_p = [curves[r][0] for r in costrows.tolist()]
+    cost_f = [curves[r][1] for r in costrows.tolist()]
+    if cost_elements:
+        elements = numpy.empty(len(cost_elements), dtype=object)
+        costs_p = numpy.empty(len(cost_elements), dtype=object)
+        costs_f = numpy.empty(len(cost_elements), dtype=object)
+        elements[:] = cost_elements
+        costs_p[:] = cost_p
+        costs_f[:] = cost_f
+        create_elements(net, 'piecewise_linear_cost', numpy.arange(len(cost_elements)), {
+            'type': 'p', 'element': elements, 'element_type': 'gen', 'p': costs_p, 'f': costs_f})
 
     # == ADD FIXED SHUNT DATA TO NETWORK ======================================
     # fixshunt = ['I', 'ID', 'STATUS', 'GL', 'BL']
     fxidxdict = {}
-    if fixshuntdata != [[]]:
+    if len(fixshuntdata):
         print('ADD FIXED SHUNTS ...................................................')
-        for data in fixshuntdata:
-            status = bool(data[2])
-            if not status:
-                continue
-            shuntbus = data[0]
-            shuntname = str(shuntbus) + '-FX'
-            kvar = data[4]
-            idx = pp.create_shunt(net, shuntbus, kvar, step=1, max_step=True, name=shuntname)
-            fxidxdict.update({shuntbus: idx})
+        fixshunts = fixshuntdata[fixshuntdata['STATUS'] != 0]
+        fxidx = numpy.arange(len(fixshunts))
+        fxidxdict = dict(zip(fixshunts['I'].tolist(), fxidx.tolist()))
+        create_elements(net, 'shunt', fxidx, {
+            'bus': fixshunts['I'], 'name': [str(x) + '-FX' for x in fixshunts['I'].tolist()], 'p_kw': 0.0, 'q_kvar': fixshunts['BL'],
+            'vn_kv': buskv[get_bus_positions(busindex, fixshunts['I'], 'fixed shunt')], 'step': 1, 'max_step': 1, 'in_service': True})
 
     # == ADD SWITCHED SHUNTS TO NETWORK =======================================
     # -- SWSHUNTS ARE MODELED AS Q-GENERATORS ---------------------------------
     # swshunt = ['I', 'MODSW', 'ADJM', 'STAT', 'VSWHI', 'VSWLO', 'SWREM', 'RMPCT', 'RMIDNT', 'BINIT', 'N1', 'B1',
     #            'N2', 'B2', 'N3', 'B3', 'N4', 'B4', 'N5', 'B5', 'N6', 'B6', 'N7', 'B7', 'N8', 'B8']
-    # gens = ['I', 'ID', 'PG', 'QG', 'QT', 'QB', 'VS', 'IREG', 'MBASE', 'ZR', 'ZX', 'RT', 'XT', 'GTAP', 'STAT', 'RMPCT', 'PT', 'PB',
-    #         'O1', 'F1', 'O2', 'F2', 'O3', 'F3', 'O4', 'F4', 'WMOD', 'WPF']
     swidxdict = {}
     swidxs = []
-    if swshuntdata != [[]]:
+    if len(swshuntdata):
         print('ADD SWITCHED SHUNTS ................................................')
-        for data in swshuntdata:
-            status = bool(data[3])
-            if not status:
-                continue
-            shuntbus = data[0]
-            max_vreg = data[4]
-            min_vreg = data[5]
-            vreg = round((max_vreg + min_vreg) / 2.0, 4)
+        swshunts = swshuntdata[swshuntdata['STAT'] != 0]
+        get_bus_positions(busindex, swshunts['I'], 'switched shunt')
+        swvreg = numpy.round((swshunts['VSWHI'] + swshunts['VSWLO']) / 2.0, 4)
+        for i, shuntbus in enumerate(swshunts['I'].tolist()):
             if shuntbus in genreg:
-                vreg = genreg[shuntbus]
-            kvar_int = data[9]
-            swshkey = str(shuntbus) + '-SW'
-            steps = [data[10], data[12], data[14], data[16], data[18], data[20], data[22], data[24]]
-            kvars = [data[11], data[13], data[15], data[17], data[19], data[21], data[23], data[25]]
-            total_qmin = 0.0
-            total_qmax = 0.0
-            for j in range(len(kvars)):
-                if kvars[j] < 0.0:
-                    total_qmin += steps[j] * kvars[j]
-                elif kvars[j] > 0.0:
-                    total_qmax += steps[j] * kvars[j]
-            idx = pp.create_gen(net, shuntbus, kvar_int, vm_pu=vreg, min_q_kvar=total_qmin, max_q_kvar=total_qmax,
-                                min_p_kw=0.0, max_p_kw=0.0, controllable=False, name=swshkey)
-            swidxdict.update({shuntbus: idx})
-            swidxs.append(idx)
+                swvreg[i] = genreg[shuntbus]
+        total_qmin = numpy.zeros(len(swshunts))
+        total_qmax = numpy.zeros(len(swshunts))
+        for j in range(1, 9):                           # accumulate blocks in record order
+            kvars = swshunts['B' + str(j)]
+            block_kvar = swshunts['N' + str(j)] * kvars
+            total_qmin += numpy.where(kvars < 0.0, block_kvar, 0.0)
+            total_qmax += numpy.where(kvars > 0.0, block_kvar, 0.0)
+        swidx = net.gen.index.values.max() + 1 + numpy.arange(len(swshunts), dtype=numpy.int64)
+        swidxdict = dict(zip(swshunts['I'].tolist(), swidx.tolist()))
+        swidxs = swidx.tolist()
+        create_elements(net, 'gen', swidx, {
+            'name': [str(x) + '-SW' for x in swshunts['I'].tolist()], 'bus': swshunts['I'], 'p_kw': swshunts['BINIT'], 'vm_pu': swvreg,
+            'sn_kva': numpy.nan, 'min_q_kvar': total_qmin, 'max_q_kvar': total_qmax, 'scaling': 1.0, 'in_service': True, 'type': None,
+            'min_p_kw': 0.0, 'max_p_kw': 0.0, 'controllable': False})
 
     # == ADD LINES TO NETWORK =================================================
     # branch = ['I', 'J', 'CKT', 'R', 'X', 'B', 'RATEA', 'RATEB', 'RATEC', 'GI', 'BI', 'GJ', 'BJ', 'ST', 'MET', 'LEN',
     #           'O1', 'F1', 'O2', 'F2', 'O3', 'F3', 'O4', 'F4']
     linedict = {}
-    if branchdata != [[]]:
+    if len(branchdata):
         print('ADD LINES ..........................................................')
-        for data in branchdata:
-            frombus = data[0]
-            tobus = data[1]
-            ckt = data[2]
-            status = bool(data[13])
-            length = data[15]
-            if length == 0.0:
-                length = 1.0
-            kv = busdict[frombus]
-            zbase = kv ** 2 / mva_base
-            r_pu = data[3] / length
-            x_pu = data[4] / length
-            b_pu = data[5] / length
-            r = r_pu * zbase
-            x = x_pu * zbase
-            b = b_pu / zbase
-            capacitance = 1e9 * b / (2 * math.pi * basefreq)
-            if CONRATING == 0:
-                mva_rating = data[6]
-            elif CONRATING == 1:
-                mva_rating = data[7]
-            elif CONRATING == 2:
-                mva_rating = data[8]
-            i_rating = mva_rating / (math.sqrt(3) * kv)
-            linekey = str(frombus) + '-' + str(tobus) + '-' + ckt
-            idx = pp.create_line_from_parameters(net, frombus, tobus, length, r, x, capacitance, i_rating, name=linekey,
-                                                 in_service=status, max_loading_percent=100.0)
-            linedict.update({linekey: idx})
+        frombus = branchdata['I']
+        tobus = branchdata['J']
+        get_bus_positions(busindex, tobus, 'line')
+        length = numpy.where(branchdata['LEN'] == 0.0, 1.0, branchdata['LEN'])
+        kv = buskv[get_bus_positions(busindex, frombus, 'line')]
+        zbase = kv ** 2 / mva_base
+        r = branchdata['R'] / length * zbase
+        x = branchdata['X'] / length * zbase
+        b = branchdata['B'] / length / zbase
+        capacitance = 1e9 * b / (2 * math.pi * basefreq)
+        mva_rating = branchdata[['RATEA', 'RATEB', 'RATEC'][CONRATING]]
+        i_rating = mva_rating / (math.sqrt(3) * kv)
+        linekeys = [str(x) + '-' + str(y) + '-' + z for x, y, z in zip(frombus.tolist(), tobus.tolist(), branchdata['CKT'].tolist())]
+        lineidx = numpy.arange(len(branchdata))
+        linedict = dict(zip(linekeys, lineidx.tolist()))
+        create_elements(net, 'line', lineidx, {
+            'name': linekeys, 'length_km': length, 'from_bus': frombus, 'to_bus': tobus, 'in_service': branchdata['ST'] != 0,
+            'std_type': None, 'df': 1.0, 'r_ohm_per_km': r, 'x_ohm_per_km': x, 'c_nf_per_km': capacitance, 'max_i_ka': i_rating,
+            'parallel': 1, 'type': None, 'g_us_per_km': 0.0, 'max_loading_percent': 100.0})
 
     # == ADD 2W TRANSFORMERS TO NETWORK =======================================
     # 2wxfmr = ['I', 'J', 'K', 'CKT', 'CW', 'CZ', 'CM', 'MAG1', 'MAG2', 'NMETR', 'NAME', 'STAT', 'O1', 'F1', 'O2', 'F2', 'O3', 'F3', 'O4', 'F4', 'VECGRP',
     #           'R1-2', 'X1-2', 'SBASE1-2', 'WINDV1', 'NOMV1', 'ANG1', 'RATA1', 'RATB1', 'RATC1', 'COD1', 'CONT1', 'RMA1', 'RMI1', 'VMA1', 'VMI1',
     #           'NTP1', 'TAB1', 'CR1', 'CX1', 'CNXA1', 'WINDV2', 'NOMV2']
     xfmrdict = {}
-    xfmr_ratea_dict = {}
-    if xfmr2wdata != [[]]:
+    if len(xfmr2wdata):
         print('ADD 2W TRANSFORMERS ................................................')
-        for data in xfmr2wdata:
-            status = bool(data[11])
-            frombus = data[0]
-            tobus = data[1]
-            ckt = data[3]
-            fromkv = busdict[frombus]
-            tokv = busdict[tobus]
-            tap1 = data[24]
-            tap2 = data[41]
-            if fromkv < tokv:                           # force from bus to be highside
-                frombus, tobus = tobus, frombus
-                fromkv, tokv = tokv, fromkv
-                tap1, tap2 = tap2, tap1
-            net_tap = tap1 / tap2                       # net tap setting on highside
-            phaseshift = data[26]
-            r_pu = data[21]                             # @ mva_base
-            x_pu = data[22]                             # @ mva_base
-            mva_rating_a = data[27]
-            mva_rating_b = data[28]
-            mva_rating_c = data[28]
-            if CONRATING == 0:                          # if global is rate a
-                mva_rating = mva_rating_b
-            elif CONRATING == 1:                        # if global is rate b
-                mva_rating = mva_rating_c
-            elif CONRATING == 2:                        # if global is rate c
-                mva_rating = data[29]
-            r_pu *= mva_rating / mva_base               # pandapower uses given transformer rating as test mva
-            x_pu *= mva_rating / mva_base               # so convert to mva_rating base
-            z_pu = math.sqrt(r_pu ** 2 + x_pu ** 2)     # calculate 'nameplate' pu impedance
-            z_pct = 100.0 * z_pu                        # pandadower uses percent impedance
-            r_pct = 100.0 * r_pu                        # pandadower uses percent resistance
-            kva_rating = 1e3 * mva_rating               # pandadower uses kva instead of mva
-            kva_rating_a = 1e3 * mva_rating_a           # capture rate a for base case analysis
-            tapside = 'hv'                              # use highside tap setting
-            tap_pct = 100.0 * abs(1 - net_tap)          # calculate off-nominal percent
-            tapmax = 2
-            tapmid = 0
-            tapmin = -2
-            if net_tap > 1.0:
-                tappos = 1
-            elif net_tap == 1.0:
-                tappos = 0
-            elif net_tap < 1.0:
-                tappos = -1
-            noloadlosses = 100.0 * data[7]              # % no-load current / full-load current
-            ironlosses = 0.0
-            xfmr2wkey = str(frombus) + '-' + str(tobus) + '-' + ckt
-
-            idx = pp.create_transformer_from_parameters(net, frombus, tobus, kva_rating, fromkv, tokv, r_pct, z_pct, ironlosses, noloadlosses, shift_degree=phaseshift,
-                                                        tp_side=tapside, tp_mid=tapmid, tp_max=tapmax, tp_min=tapmin, tp_st_percent=tap_pct, tp_pos=tappos, in_service=status,
-                                                        max_loading_percent=100.0, name=xfmr2wkey)
-            xfmrdict.update({xfmr2wkey: idx})
-            xfmr_ratea_dict.update({xfmr2wkey: kva_rating_a})
+        fromkv = buskv[get_bus_positions(busindex, xfmr2wdata['I'], 'trafo')]
+        tokv = buskv[get_bus_positions(busindex, xfmr2wdata['J'], 'trafo')]
+        swap = fromkv < tokv                                                        # force from bus to be highside
+        frombus = numpy.where(swap, xfmr2wdata['J'], xfmr2wdata['I'])
+        tobus = numpy.where(swap, xfmr2wdata['I'], xfmr2wdata['J'])
+        net_tap = numpy.where(swap, xfmr2wdata['WINDV2'], xfmr2wdata['WINDV1']) / numpy.where(swap, xfmr2wdata['WINDV1'], xfmr2wdata['WINDV2'])
+        fromkv, tokv = numpy.where(swap, tokv, fromkv), numpy.where(swap, fromkv, tokv)
+        mva_rating = xfmr2wdata[['RATB1', 'RATB1', 'RATC1'][CONRATING]]
+        r_pu = xfmr2wdata['R1_2'] * (mva_rating / mva_base)                          # convert to mva_rating base
+        x_pu = xfmr2wdata['X1_2'] * (mva_rating / mva_base)
+        z_pu = numpy.sqrt(r_pu ** 2 + x_pu ** 2)
+        tappos = numpy.select([net_tap > 1.0, net_tap == 1.0, net_tap < 1.0], [1, 0, -1])
+        xfmrkeys = [str(x) + '-' + str(y) + '-' + z for x, y, z in zip(frombus.tolist(), tobus.tolist(), xfmr2wdata['CKT'].tolist())]
+        xfmridx = numpy.arange(len(xfmr2wdata))
+        xfmrdict = dict(zip(xfmrkeys, xfmridx.tolist()))
+        create_elements(net, 'trafo', xfmridx, {
+            'name': xfmrkeys, 'hv_bus': frombus, 'lv_bus': tobus, 'in_service': xfmr2wdata['STAT'] != 0, 'std_type': None,
+            'sn_kva': 1e3 * mva_rating, 'vn_hv_kv': fromkv, 'vn_lv_kv': tokv, 'vsc_percent': 100.0 * z_pu, 'vscr_percent': 100.0 * r_pu,
+            'pfe_kw': 0.0, 'i0_percent': 100.0 * xfmr2wdata['MAG1'], 'tp_mid': 0, 'tp_max': 2, 'tp_min': -2,
+            'shift_degree': xfmr2wdata['ANG1'], 'tp_side': 'hv', 'tp_st_percent': 100.0 * abs(1 - net_tap), 'tp_st_degree': numpy.nan,
+            'tp_phase_shifter': False, 'parallel': 1, 'df': 1.0, 'tp_pos': tappos, 'max_loading_percent': 100.0})
 
     # == ADD EXTERNAL GRID (PARALLEL TO SWING BUS) ============================
     ext_grid_bus = pp.create_bus(net, vn_kv=swing_kv, name='Ex_Grid_Bus', in_service=True, max_vm_pu=swing_vhigh, min_vm_pu=swing_vlow)
     ext_tie_rating = 1e9/(math.sqrt(3) * swing_kv)
-    # tie_index = int(str(swingbus) + str(ext_grid_bus))
     pp.create_line_from_parameters(net,  swingbus, ext_grid_bus, 1.0, 0.0, 0.002, 0.0, ext_tie_rating, name='Swing-Tie')
     pp.create_ext_grid(net, ext_grid_bus, vm_pu=swing_vreg, va_degree=swing_angle, min_p_kw=-1e9, max_p_kw=0.0,
                        min_q_kvar=-1e9, max_q_kvar=0.0, index=ext_grid_bus)
     pp.create_polynomial_cost(net, ext_grid_bus, 'ext_grid', numpy.array([-1, 0]), type='p')
+    return [net, genidxdict, linedict, xfmrdict, fxidxdict, swidxdict, swidxs, gids, genbuses, ext_grid_bus, pfactor_dict]
 
-    # -- DONE CREATING NETWORK ------------------------------------------------
 
-    # -- DIAGNOSTIC DEVELOPMENT -----------------------------------------------
-    # pp.diagnostic(net, report_style='detailed', warnings_only=False)
+def build_case(raw_fname, con_fname, rop_fname, inl_fname, metrics=None):
+    """ parse the four input files and build the network, return everything the solve needs """
+    metrics = metrics or RunMetrics()
+    print('GETTING RAW DATA FROM FILE .........................................', os.path.split(raw_fname)[1])
+    metrics.start('parse_raw')
+    mva_base, basefreq, rawdata = get_raw_data(raw_fname)
+    print('GETTING CONTINGENCY DATA FROM FILE .................................', os.path.split(con_fname)[1])
+    metrics.start('parse_con')
+    contable = get_contingencies(con_fname)
+    print('GETTING GENERATOR OPF DATA FROM FILE ...............................', os.path.split(rop_fname)[1])
+    metrics.start('parse_rop')
+    genopfdict, gdispdict, pwlcostdata = get_rop_data(rop_fname)
+    print('GETTING GENERATOR PARTICIPATION FACTORS FROM FILE ..................', os.path.split(inl_fname)[1])
+    metrics.start('parse_inl')
+    participation_dict = get_gen_reserves(inl_fname)
+    print('------------------------- CREATING NETWORK -------------------------')
+    metrics.start('build_network')
+    network = create_network(mva_base, basefreq, rawdata, genopfdict, gdispdict, pwlcostdata, participation_dict)
+    metrics.stop()
+    return [mva_base, basefreq, rawdata, contable, genopfdict, gdispdict, pwlcostdata, participation_dict] + network
+
+
+# -- PREFLIGHT: PARSE AND CROSS-CHECK THE INPUT FILES WITHOUT BUILDING THE NETWORK --
+PARSE_ERRORS = (ValueError, IndexError, KeyError, StopIteration, UnicodeDecodeError, OSError)
+RAW_KEY_FIELDS = {'bus': [0, 2, 3], 'load': [0], 'fixshunt': [0], 'gen': [0, 1, 16, 17], 'branch': [0, 1, 2], 'xfmr2w': [0, 1, 3],
+                  'swshunt': [0]}     # buses, BASKV, IDE, ID, CKT, PT and PB
+
+
+def get_branch_keys(rawdata):
+    """ line and 2w transformer keys as create_network builds them, transformer keys start at the high voltage bus """
+    branchdata = rawdata['branch']
+    xfmr2wdata = rawdata['xfmr2w']
+    buskv = dict(zip(rawdata['bus']['I'].tolist(), rawdata['bus']['BASKV'].tolist()))
+    linekeys = [str(x) + '-' + str(y) + '-' + z for x, y, z in zip(branchdata['I'].tolist(), branchdata['J'].tolist(), branchdata['CKT'].tolist())]
+    xfmrkeys = []
+    for x, y, z in zip(xfmr2wdata['I'].tolist(), xfmr2wdata['J'].tolist(), xfmr2wdata['CKT'].tolist()):
+        if buskv.get(x, 0.0) < buskv.get(y, 0.0):
+            x, y = y, x
+        xfmrkeys.append(str(x) + '-' + str(y) + '-' + z)
+    return linekeys, xfmrkeys
+
+
+def preflight_case(raw_fname, rop_fname, inl_fname, con_fname):
+    """ parse the four input files and cross-check them without pandapower, return a list of problems (empty when the case looks solvable) """
+    problems = []
+    print('CHECKING RAW DATA ..................................................', os.path.split(raw_fname)[1])
+    try:
+        mva_base, basefreq, rawdata = get_raw_data(raw_fname, RAW_KEY_FIELDS)
+    except PARSE_ERRORS as e:
+        return ['RAW: CANNOT PARSE ' + raw_fname + ': ' + repr(e)]
+    busdata = rawdata['bus']
+    gendata = rawdata['gen']
+    buses, counts = numpy.unique(busdata['I'], return_counts=True)
+    problems += ['RAW: DUPLICATE BUS %d' % x for x in buses[counts > 1]]
+    swingbuses = busdata['I'][busdata['IDE'] == 3]
+    if len(swingbuses) != 1:
+        problems.append('RAW: %d SWING BUSES (IDE 3), EXPECTED ONE' % len(swingbuses))
+    elif not (gendata['I'] == swingbuses[0]).any():
+        problems.append('RAW: NO GENERATOR AT SWING BUS %d' % swingbuses[0])
+    for section, columns in [('load', ['I']), ('fixshunt', ['I']), ('gen', ['I']), ('branch', ['I', 'J']), ('xfmr2w', ['I', 'J']), ('swshunt', ['I'])]:
+        for column in columns:
+            problems += ['RAW: %s REFERENCES UNKNOWN BUS %d' % (section.upper(), x) for x in numpy.setdiff1d(rawdata[section][column], buses)]
+    genkeys = [str(x) + '-' + y for x, y in zip(gendata['I'].tolist(), gendata['ID'].tolist())]
+    genset = set(genkeys)
+    linekeys, xfmrkeys = get_branch_keys(rawdata)
+    branchset = set(linekeys + xfmrkeys)
+
+    # -- CONTINGENCIES MUST NAME EXISTING GENERATORS, LINES AND TRANSFORMERS --
+    print('CHECKING CONTINGENCY DATA ..........................................', os.path.split(con_fname)[1])
+    try:
+        # -- KEY SETS OF A PLAIN CON FILE FIRST, THE FULL PARSE ONLY TO REPORT UNKNOWN ELEMENTS OR FOR OTHER LAYOUTS --
+        keysets = get_contingency_key_sets(con_fname)
+        if keysets is None or not keysets[0] <= genset or \
+                any('-'.join([key.split('-', 2)[x] for x in [1, 0, 2]]) not in branchset for key in keysets[1] - branchset):
+            contable = get_contingencies(con_fname)
+            conlabels = numpy.repeat(numpy.arange(len(contable['labels'])), numpy.diff(contable['offsets']))
+            for c, kind, key in zip(conlabels.tolist(), contable['kinds'].tolist(), get_contingency_keys(contable)):
+                if kind == CON_GEN and key not in genset:
+                    problems.append('CON: CONTINGENCY %s OUTAGES UNKNOWN GENERATOR %s' % (contable['labels'][c], key))
+                elif kind == CON_BRANCH and key not in branchset and '-'.join([key.split('-', 2)[x] for x in [1, 0, 2]]) not in branchset:
+                    problems.append('CON: CONTINGENCY %s OUTAGES UNKNOWN BRANCH %s' % (contable['labels'][c], key))
+    except PARSE_ERRORS as e:
+        problems.append('CON: CANNOT PARSE ' + con_fname + ': ' + repr(e))
+
+    # -- DISPATCH TABLES MUST LEAD TO A COST TABLE COVERING THE GENERATOR RANGE --
+    print('CHECKING GENERATOR OPF DATA ........................................', os.path.split(rop_fname)[1])
+    try:
+        genopfdict, gdispdict, pwlcostdata = get_rop_keys(rop_fname)
+    except PARSE_ERRORS as e:
+        genopfdict, gdispdict, pwlcostdata = [{}, {}, format_pwlcostdata([], shared=False)]
+        problems.append('ROP: CANNOT PARSE ' + rop_fname + ': ' + repr(e))
+    genpos = dict(zip(genkeys, range(len(genkeys))))
+    ropkeys = list(genopfdict)
+    tables = [genopfdict[x] for x in ropkeys]
+    positions = numpy.array([genpos.get(x, -1) for x in ropkeys], dtype=numpy.int64)
+    rows = numpy.array([pwlcostdata['tables'].get(gdispdict.get(x), -1) for x in tables], dtype=numpy.int64)
+    ascending, pmin, pmax = check_pwl_curves(pwlcostdata)
+    checked = (positions >= 0) & (rows >= 0)
+    ordered = numpy.ones(len(ropkeys), dtype=bool)
+    covered = numpy.ones(len(ropkeys), dtype=bool)
+    ordered[checked] = ascending[rows[checked]]
+    with numpy.errstate(invalid='ignore'):                          # empty cost tables have nan limits and cover nothing
+        covered[checked] = (gendata['PB'][positions[checked]] <= pmax[rows[checked]]) & (gendata['PT'][positions[checked]] >= pmin[rows[checked]])
+    for k in numpy.flatnonzero(~checked | ~ordered | ~covered).tolist():
+        genkey, table = ropkeys[k], tables[k]
+        if positions[k] < 0:
+            problems.append('ROP: DISPATCH DATA FOR UNKNOWN GENERATOR %s' % genkey)
+        elif table not in gdispdict:
+            problems.append('ROP: GENERATOR %s REFERENCES MISSING POWER DISPATCH TABLE %d' % (genkey, table))
+        elif rows[k] < 0:
+            problems.append('ROP: POWER DISPATCH TABLE %d REFERENCES MISSING COST TABLE %d' % (table, gdispdict[table]))
+        elif not ordered[k]:
+            problems.append('ROP: PIECEWISE LINEAR COSTS FOR %s ARE NOT IN ASCENDING ORDER' % genkey)
+        else:
+            problems.append('ROP: PIECEWISE LINEAR COSTS FOR %s DO NOT COVER THE GENERATOR POWER RANGE' % genkey)
 
+    # -- PARTICIPATION FACTORS MUST NAME EXISTING GENERATORS ------------------
+    print('CHECKING GENERATOR PARTICIPATION FACTORS ...........................', os.path.split(inl_fname)[1])
     try:
-        os.remove(outfname1)
-    except FileNotFoundError:
-        pass
+        participation_dict = get_gen_reserves(inl_fname)
+        problems += ['INL: PARTICIPATION FACTOR FOR UNKNOWN GENERATOR %s' % x for x in participation_dict if x not in genset]
+    except PARSE_ERRORS as e:
+        problems.append('INL: CANNOT PARSE ' + inl_fname + ': ' + repr(e))
+    return problems
+
+
+# -- ON-DISK CASE CACHE, KEYED BY INPUT FILE CONTENTS AND BUILD CONSTANTS --------
+def get_case_key(fnames):
+    """ sha256 of the input file contents, the build constants and the cache layout version """
+    digest = hashlib.sha256(('%d-%d' % (CASE_CACHE_VERSION, CONRATING)).encode())
+    for fname in fnames:
+        with open(fname, 'rb') as fobject:
+            for chunk in iter(lambda: fobject.read(1 << 20), b''):
+                digest.update(chunk)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def load_cached_case(cache_dir, key):
+    """ return the cached case for key or None, a hit marks the entry as most recently used """
+    fname = os.path.join(cache_dir, key + '.pkl')
     try:
-        os.remove(outfname2)
+        with open(fname, 'rb') as fobject:
+            case = pickle.load(fobject)
     except FileNotFoundError:
-        pass
-    #try:
-    #    os.remove(base_outfname1)
-    #except FileNotFoundError:
-    #    pass
-    #try:
-    #    os.remove(base_outfname2)
-    #except FileNotFoundError:
-    #    pass
+        return None
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        print('DISCARDING UNREADABLE CACHE ENTRY ..................................', key[:12])
+        try:
+            os.remove(fname)
+        except OSError:
+            pass
+        return None
+    os.utime(fname)
+    return case
+
+
+def save_cached_case(cache_dir, key, case, maxbytes):
+    """ write the case atomically, then evict least recently used entries beyond maxbytes """
+    os.makedirs(cache_dir, exist_ok=True)
+    fname = os.path.join(cache_dir, key + '.pkl')
+    tmpfname = fname + '.' + str(os.getpid()) + '.tmp'
+    with open(tmpfname, 'wb') as fobject:
+        pickle.dump(case, fobject, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmpfname, fname)
+    entries = []
+    for entry in os.listdir(cache_dir):
+        if entry.endswith('.pkl'):
+            path = os.path.join(cache_dir, entry)
+            entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+    total = sum(x[1] for x in entries)
+    for mtime, size, path in sorted(entries):
+        if total <= maxbytes:
+            break
+        if path == fname:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+    return
+
+
+# -- CASE API: LOAD A CASE ONCE, SOLVE IT FROM ANY CALLER ---------------------
+CASE_FIELDS = ['mva_base', 'basefreq', 'rawdata', 'contable', 'genopfdict', 'gdispdict', 'pwlcostdata', 'participation_dict',
+               'net', 'genidxdict', 'linedict', 'xfmrdict', 'fxidxdict', 'swidxdict', 'swidxs', 'gids', 'genbuses', 'ext_grid_bus',
+               'pfactor_dict']
+SOLVE_OPTIONS = {'workers': 1, 'warm_start': False, 'screen_threshold': None, 'keep_results': True, 'deadline': None, 'cost_history': None,
+                 'contingency_mode': 'opf', 'low_rank': False, 'topology': False, 'solve_mode': 'ac', 'opf_engine': 'pandapower'}
+
+
+def load_case(raw_fname, rop_fname, inl_fname, con_fname, cache_dir=None, cache_size=1024.0, metrics=None):
+    """ parse the input files and build the network, or load both from the case cache, return the case keyed by CASE_FIELDS """
+    metrics = metrics or RunMetrics()
+    case = None
+    if cache_dir is not None:
+        metrics.start('cache_load')
+        case_key = get_case_key([raw_fname, con_fname, rop_fname, inl_fname])
+        case = load_cached_case(cache_dir, case_key)
+        if case is not None:
+            print('LOADED PARSED CASE AND NETWORK FROM CACHE ..........................', case_key[:12])
+    if case is None:
+        case = build_case(raw_fname, con_fname, rop_fname, inl_fname, metrics)
+        if cache_dir is not None:
+            metrics.start('cache_store')
+            save_cached_case(cache_dir, case_key, case, int(cache_size * 1024 ** 2))
+    metrics.stop()
+    case = dict(zip(CASE_FIELDS, case))
+    case['swingbus'] = get_swingbus_data(case['rawdata']['bus'])[0]
+    return case
+
+
+def get_contingency_tasks(contable, g_dict, l_dict, x_dict):
+    """ resolve the contingency table to a list of (label, element table, element index), a contingency opening several
+        elements is (label, 'multi', ((element table, element index), ...)), one without elements (label, None, None);
+        generator outages come first, then all other contingencies, each in con file order """
+    tables, indices = resolve_contingencies(contable, g_dict, l_dict, x_dict)
+    kinds = contable['kinds']
+    offsets = contable['offsets'].tolist()
+    gen_tasks = []
+    tasks = []
+    for c, conlabel in enumerate(contable['labels']):
+        elements = []
+        for k in range(offsets[c], offsets[c + 1]):
+            if tables[k] >= 0:
+                elements.append((CON_ELEMENTS[tables[k]], int(indices[k])))
+            elif kinds[k] == CON_GEN:
+                print('GENERATOR NOT FOUND ................................................', conlabel)
+            else:
+                print('LINE OR TRANSFORMER NOT FOUND ......................................', conlabel)
+        unit_outage = offsets[c + 1] > offsets[c] and (kinds[offsets[c]:offsets[c + 1]] == CON_GEN).all()
+        if len(elements) == 1:
+            task = (conlabel,) + elements[0]
+        elif elements:
+            task = (conlabel, 'multi', tuple(elements))
+        else:
+            task = (conlabel, None, None)
+        (gen_tasks if unit_outage else tasks).append(task)
+    return gen_tasks + tasks
+
+
+def create_outage_session(net):
+    """ capture the solved base case state that must be restored after every contingency """
+    return {'net': net,
+            'in_service': {'gen': net.gen['in_service'].values.copy(),
+                           'line': net.line['in_service'].values.copy(),
+                           'trafo': net.trafo['in_service'].values.copy()},
+            'gen_p_kw': net.gen['p_kw'].values.copy(),
+            'gen_vm_pu': net.gen['vm_pu'].values.copy(),
+            'ext_grid_vm_pu': net.ext_grid['vm_pu'].values.copy(),
+            'base_p_kw': net.res_gen['p_kw'].values.copy(),
+            'base_vm_pu': net.res_gen['vm_pu'].values.copy(),
+            'base_ext_grid_p_kw': net.res_ext_grid['p_kw'].values.sum(),
+            'base_ext_grid_vm_pu': net.res_bus['vm_pu'].loc[net.ext_grid['bus']].values.copy(),
+            'base_results': {'res_bus': net.res_bus[['vm_pu', 'va_degree']].copy(), 'res_gen': net.res_gen[['p_kw', 'q_kvar']].copy(),
+                             'res_ext_grid': net.res_ext_grid[['p_kw', 'q_kvar']].copy(), 'res_shunt': net.res_shunt[['q_kvar']].copy()}}
+
+
+def apply_outage(session, element, elementidx):
+    if element == 'multi':
+        for x in elementidx:
+            apply_outage(session, *x)
+    elif element is not None:
+        session['net'][element].loc[elementidx, 'in_service'] = False
+    return
+
+
+def seed_base_dispatch(session):
+    """ start generator dispatch and voltage setpoints from the base case opf results """
+    session['net'].gen['p_kw'] = session['base_p_kw']
+    session['net'].gen['vm_pu'] = session['base_vm_pu']
+    return
+
+
+def restore_base_state(session):
+    """ undo outage and warm start changes, raise if anything differs from the captured base state """
+    net = session['net']
+    for element in session['in_service']:
+        net[element]['in_service'] = session['in_service'][element]
+    net.gen['p_kw'] = session['gen_p_kw']
+    net.gen['vm_pu'] = session['gen_vm_pu']
+    net.ext_grid['vm_pu'] = session['ext_grid_vm_pu']
+    for element in session['in_service']:
+        if not numpy.array_equal(net[element]['in_service'].values, session['in_service'][element]):
+            raise RuntimeError('OUTAGE SESSION DID NOT RESTORE ' + element.upper() + ' STATUS')
+    if not (numpy.array_equal(net.gen['p_kw'].values, session['gen_p_kw']) and numpy.array_equal(net.gen['vm_pu'].values, session['gen_vm_pu'])
+            and numpy.array_equal(net.ext_grid['vm_pu'].values, session['ext_grid_vm_pu'])):
+        raise RuntimeError('OUTAGE SESSION DID NOT RESTORE GENERATOR SETPOINTS')
+    return
+
+
+def get_participation_factors(case):
+    """ inl participation factor per network generator row, zero for generators without one """
+    return numpy.array([case['pfactor_dict'].get(x, 0.0) for x in case['net'].gen['name']])
+
+
+def get_participation_dispatch(p_kw, delta, factors, min_p_kw, max_p_kw):
+    """ add delta kw to the dispatch in proportion to the participation factors, a unit stops participating at its
+        pmin or pmax and its share goes to the others, return the new dispatch and the part no unit could take """
+    p_kw = p_kw.copy()
+    active = factors != 0.0
+    while active.any() and abs(delta) > 1e-6:
+        new_p_kw = p_kw + delta * factors * active / (factors * active).sum()
+        new_p_kw[active] = numpy.clip(new_p_kw[active], min_p_kw[active], max_p_kw[active])
+        # -- GENERATION IS NEGATIVE KW, MORE GENERATION MOVES UNITS TOWARDS MIN_P_KW --
+        active &= (new_p_kw > min_p_kw) if delta < 0.0 else (new_p_kw < max_p_kw)
+        delta -= (new_p_kw - p_kw).sum()
+        p_kw = new_p_kw
+    return [p_kw, delta]
+
+
+def solve_governor_response(session, factors):
+    """ post-contingency power flow with the base opf dispatch and voltages, the slack output beyond its base
+        value is shared by the participating generators until it is below GOVERNOR_TOLERANCE or nobody can take it,
+        return the newton iterations of all power flows """
+    import pandapower as pp
+    net = session['net']
+    seed_base_dispatch(session)
+    net.ext_grid['vm_pu'] = session['base_ext_grid_vm_pu']
+    factors = factors * net.gen['in_service'].values
+    init = 'dc'
+    iterations = 0
+    for iteration in range(GOVERNOR_ITERATIONS):
+        pp.runpp(net, init=init, max_iteration=ITMXN, calculate_voltage_angles=True, enforce_q_lims=True)
+        iterations += net._ppc['iterations']
+        init = 'results'
+        delta = net.res_ext_grid['p_kw'].values.sum() - session['base_ext_grid_p_kw']
+        if abs(delta) < GOVERNOR_TOLERANCE:
+            break
+        p_kw, unshared = get_participation_dispatch(net.gen['p_kw'].values, delta, factors, net.gen['min_p_kw'].values, net.gen['max_p_kw'].values)
+        if abs(delta - unshared) < GOVERNOR_TOLERANCE:
+            break
+        net.gen['p_kw'] = p_kw
+    return iterations
+
+
+# -- BRANCH OUTAGE POWER FLOWS ON THE FACTORED BASE CASE JACOBIAN ---------------
+# -- AN OUTAGE CHANGES TWO YBUS ROWS, SO AT MOST FOUR JACOBIAN ROWS: SHERMAN-MORRISON-WOODBURY ON THE BASE LU --
+def get_pf_jacobian(Ybus, V, pvpq, pq):
+    """ newton power flow jacobian [dP/dVa dP/dVm; dQ/dVa dQ/dVm] over pv+pq angles and pq magnitudes, linear in Ybus """
+    import scipy.sparse
+    from pandapower.pf.dSbus_dV_pypower import dSbus_dV
+    dS_dVm, dS_dVa = dSbus_dV(Ybus, V)
+    dS_dVm = dS_dVm.tocsr()
+    dS_dVa = dS_dVa.tocsr()
+    return scipy.sparse.bmat([[dS_dVa[pvpq, :][:, pvpq].real, dS_dVm[pvpq, :][:, pq].real],
+                              [dS_dVa[pq, :][:, pvpq].imag, dS_dVm[pq, :][:, pq].imag]], format='csc')
+
+
+LOW_RANK_INTERNALS = [('pandapower.pd2ppc', '_pd2ppc'), ('pandapower.pf.bustypes', 'bustypes'), ('pandapower.pf.makeSbus', 'makeSbus'),
+                      ('pandapower.pf.makeYbus_pypower', 'makeYbus'), ('pandapower.pf.dSbus_dV_pypower', 'dSbus_dV'),
+                      ('pandapower.pf.pfsoln_pypower', 'pfsoln'), ('pandapower.results', '_copy_results_ppci_to_ppc'),
+                      ('pandapower.results', '_extract_results')]
+
+
+def get_low_rank_problem():
+    """ why the low rank branch outage solve cannot run on the installed pandapower, None when it can: it calls private
+        pandapower functions that only the LOW_RANK_PANDAPOWER releases are known to have with the expected behaviour """
+    import importlib
+    import pandapower
+    version = getattr(pandapower, '__version__', 'unknown')
+    if not version.startswith(LOW_RANK_PANDAPOWER):
+        return 'pandapower ' + version + ' is not one of ' + ', '.join([x + 'x' for x in LOW_RANK_PANDAPOWER])
+    for module, name in LOW_RANK_INTERNALS:
+        try:
+            if hasattr(importlib.import_module(module), name):
+                continue
+        except ImportError:
+            pass
+        return 'pandapower has no ' + module + '.' + name
+    return None
+
+
+def get_low_rank_model(session, factors):
+    """ governor response power flow of the intact network in pandapower's internal format, with its jacobian
+        factored once, everything a branch outage solve needs; None when a generator sits at a reactive limit """
+    import scipy.sparse.linalg
+    from pandapower.pd2ppc import _pd2ppc
+    from pandapower.pf.bustypes import bustypes
+    from pandapower.pf.makeSbus import makeSbus
+    from pandapower.pf.makeYbus_pypower import makeYbus
+    net = session['net']
+    solve_governor_response(session, factors)
+    vm = net.res_bus['vm_pu'].values
+    va = numpy.radians(net.res_bus['va_degree'].values)
+    seed_base_dispatch(session)
+    ppc, ppci = _pd2ppc(net)
+    # -- PRIVATE NETWORK ATTRIBUTES SET BY THE POWER FLOW AND THE CONVERSION, FULL POWER FLOWS WHEN ONE IS MISSING --
+    if not all([x in net for x in ['_ppc', '_pd2ppc_lookups', '_options']]):
+        return None
+    lookups = net._pd2ppc_lookups
+    bus, gen, branch = ppci['bus'], ppci['gen'], ppci['branch']
+    ref, pv, pq = bustypes(bus, gen)
+    pvpq = numpy.r_[pv, pq]
+    Ybus, Yf, Yt = makeYbus(ppci['baseMVA'], bus, branch)
+    V = numpy.zeros(len(bus), dtype=complex)
+    V[lookups['bus'][net.bus.index.values]] = vm * numpy.exp(1j * va)
+    # -- PANDAPOWER ROW -> PPCI ROW FOR IN SERVICE GENERATORS AND BRANCHES ----
+    gen_is = ppci['internal']['gen_is']
+    branch_is = ppci['internal']['branch_is']
+    genrows = numpy.where(gen_is, numpy.cumsum(gen_is) - 1, -1)[lookups['gen'][net.gen.index.values]]
+    branchrows = numpy.where(branch_is, numpy.cumsum(branch_is) - 1, -1)
+    model = {'ppc': ppc, 'ppci': ppci, 'Ybus': Ybus, 'Yf': Yf, 'Yt': Yt, 'ref': ref, 'pq': pq, 'pvpq': pvpq, 'V': V,
+             'Sbus': makeSbus(ppci['baseMVA'], bus, gen), 'genrows': genrows, 'genbus': lookups['bus'][net.gen['bus'].values],
+             'branchrows': dict([(x, branchrows[y[0]:y[1]]) for x, y in lookups['branch'].items()]),
+             'tol': net._options['tolerance_kva'] * 1e-3, 'factors': factors * net.gen['in_service'].values}
+    if not check_low_rank_qlims(model, gen):
+        return None
+    model['lu'] = scipy.sparse.linalg.splu(get_pf_jacobian(Ybus, V, pvpq, pq))
+    return model
+
+
+def check_low_rank_qlims(model, gen):
+    """ true when no generator besides the slack is outside its reactive limits """
+    from pandapower.idx_gen import QG, QMAX, QMIN, GEN_STATUS
+    on = gen[:, GEN_STATUS] > 0
+    on[model['ppci']['internal']['ref_gens']] = False
+    return not ((gen[on, QG] > gen[on, QMAX] + 1e-6) | (gen[on, QG] < gen[on, QMIN] - 1e-6)).any()
+
+
+def solve_low_rank_outage(session, model, element, elementidx):
+    """ governor response power flow of one branch outage with chord iterations on the base case jacobian, updated for
+        the outage by sherman-morrison-woodbury, results go into net.res_*; return the chord iterations, 0 when the outage
+        islands the network, the iterations do not converge or a generator ends outside its reactive limits """
+    import scipy.sparse
+    from pandapower.idx_brch import BR_STATUS, PF, QF, PT, QT
+    from pandapower.idx_bus import PD
+    from pandapower.idx_gen import PG
+    from pandapower.pf.pfsoln_pypower import pfsoln
+    from pandapower.results import _copy_results_ppci_to_ppc, _extract_results
+    net = session['net']
+    ppci = model['ppci']
+    baseMVA = ppci['baseMVA']
+    pvpq, pq, ref = model['pvpq'], model['pq'], model['ref']
+    k = model['branchrows'][element][net[element].index.get_loc(elementidx)]
+    if k < 0:
+        return 0
+    # -- YBUS CHANGE OF THE OUTAGE AND THE JACOBIAN ROWS IT TOUCHES -----------
+    nbus = len(model['V'])
+    fbus, tbus = ppci['branch'][k, [0, 1]].real.astype(int)
+    delta_y = (scipy.sparse.csr_matrix(([1.0], ([fbus], [0])), shape=(nbus, 1)) * model['Yf'][k, :] +
+               scipy.sparse.csr_matrix(([1.0], ([tbus], [0])), shape=(nbus, 1)) * model['Yt'][k, :])
+    Ybus = model['Ybus'] - delta_y
+    delta_j = get_pf_jacobian(delta_y, model['V'], pvpq, pq).tocsr()
+    rows = numpy.flatnonzero(numpy.diff(delta_j.indptr))
+    D = delta_j[rows, :]
+    E = numpy.zeros((delta_j.shape[0], len(rows)))
+    E[rows, numpy.arange(len(rows))] = 1.0
+    W = model['lu'].solve(E)
+    M = numpy.eye(len(rows)) - D * W
+    if numpy.linalg.cond(M) > 1e12:
+        return 0
+    def solve(b):
+        x = model['lu'].solve(b)
+        return x + W.dot(numpy.linalg.solve(M, D * x))
+
+    # -- CHORD ITERATIONS, GOVERNOR RESPONSE SHARES THE SLACK CHANGE BETWEEN THEM --
+    V = model['V'].copy()
+    Sbus = model['Sbus'].copy()
+    p_kw = session['base_p_kw'].copy()
+    gens = net.gen
+    npvpq = len(pvpq)
+    chords = 0
+    for iteration in range(GOVERNOR_ITERATIONS):
+        for chord in range(LOW_RANK_ITERATIONS):
+            mismatch = V * numpy.conj(Ybus * V) - Sbus
+            F = numpy.r_[mismatch[pvpq].real, mismatch[pq].imag]
+            if abs(F).max() < model['tol']:
+                break
+            dx = solve(-F)
+            chords += 1
+            Va = numpy.angle(V)
+            Vm = abs(V)
+            Va[pvpq] += dx[:npvpq]
+            Vm[pq] += dx[npvpq:]
+            V = Vm * numpy.exp(1j * Va)
+        else:
+            return 0
+        slack_p = (V[ref] * numpy.conj(Ybus[ref, :] * V)).real * baseMVA + ppci['bus'][ref, PD]
+        delta = -1e3 * slack_p.sum() - session['base_ext_grid_p_kw']
+        if abs(delta) < GOVERNOR_TOLERANCE:
+            break
+        new_p_kw, unshared = get_participation_dispatch(p_kw, delta, model['factors'], gens['min_p_kw'].values, gens['max_p_kw'].values)
+        if abs(delta - unshared) < GOVERNOR_TOLERANCE:
+            break
+        numpy.add.at(Sbus, model['genbus'], -1e-3 * (new_p_kw - p_kw) / baseMVA)
+        p_kw = new_p_kw
+
+    # -- PANDAPOWER RESULTS WITHOUT THE OUTAGED BRANCH ------------------------
+    keep = numpy.arange(len(ppci['branch'])) != k
+    gen = ppci['gen'].copy()
+    on = model['genrows'] >= 0
+    gen[model['genrows'][on], PG] = -1e-3 * p_kw[on]
+    bus, gen, branch = pfsoln(baseMVA, ppci['bus'].copy(), gen, ppci['branch'][keep].copy(), Ybus,
+                              model['Yf'][keep, :], model['Yt'][keep, :], V, ref, ppci['internal']['ref_gens'])
+    if not check_low_rank_qlims(model, gen):
+        return 0
+    internal = dict(ppci['internal'], branch_is=ppci['internal']['branch_is'].copy())
+    internal['branch_is'][numpy.flatnonzero(internal['branch_is'])[k]] = False
+    ppc = dict(model['ppc'], branch=model['ppc']['branch'].copy(), gen=model['ppc']['gen'].copy())
+    outaged = ~internal['branch_is'] & ppci['internal']['branch_is']
+    ppc['branch'][outaged, BR_STATUS] = 0
+    ppc['branch'][numpy.ix_(outaged, [PF, QF, PT, QT])] = 0.0
+    result = {'baseMVA': baseMVA, 'bus': bus, 'gen': gen, 'branch': branch, 'internal': internal, 'success': True,
+              'iterations': iteration + 1, 'et': 0.0}
+    _extract_results(net, _copy_results_ppci_to_ppc(result, ppc, 'pf'))
+    return chords
+
+
+# -- NATIVE SPARSE AC OPF: PRIMAL-DUAL INTERIOR POINT ON THE PARSED CASE ARRAYS --
+# -- SAME PROBLEM AS PANDAPOWER'S OPF OF THE BUILT NETWORK (BRANCH CURRENT LIMITS, EXTERNAL GRID LINEAR COST, PIECEWISE
+# -- LINEAR COSTS AS EPIGRAPH CONSTRAINTS ON ONE COST VARIABLE PER GENERATOR), WITHOUT THE DATAFRAME TO PPC CONVERSION --
+def get_native_opf_model(case):
+    """ native ac opf arrays of a loaded case, built from its parsed data in network element order: raw buses then the
+        external grid bus, raw lines then the swing tie then 2w transformers, swing, raw and switched shunt generators then
+        the external grid; powers in mw and mvar, impedances in pu on the case mva base """
+    import pandas
+    rawdata = case['rawdata']
+    mva_base = case['mva_base']
+    busdata = rawdata['bus']
+    branchdata = rawdata['branch']
+    xfmr2wdata = rawdata['xfmr2w']
+    swshuntdata = rawdata['swshunt']
+    swingbus, swing_name, swing_kv, swing_angle, swing_vlow, swing_vhigh = get_swingbus_data(busdata)
+    gendata, swing_key, swing_id, swing_vreg, swing_pgen, swing_pmin, swing_pmax, swing_qgen, swing_qmin, swing_qmax = \
+        get_swing_gen_data(rawdata['gen'], swingbus)
+
+    # -- BUSES, THE EXTERNAL GRID BUS LAST AT THE SWING VOLTAGE SETPOINT ------
+    busindex = pandas.Index(busdata['I'])
+    nbus = len(busindex) + 1
+    extbus = nbus - 1
+    buskv = numpy.append(busdata['BASKV'], swing_kv)
+    loads = rawdata['load'][rawdata['load']['STATUS'] != 0]
+    fixshunts = rawdata['fixshunt'][rawdata['fixshunt']['STATUS'] != 0]
+    swshunts = swshuntdata[swshuntdata['STAT'] != 0]
+
+    # -- LINES ARE RAW R, X, B; THE SWING TIE HAS NO FLOW LIMIT ---------------
+    # -- 2W TRANSFORMERS FROM THE HIGH VOLTAGE SIDE, IMPEDANCE AND MAGNETIZING SUSCEPTANCE (MAG1 ON THE RATING BASE)
+    # -- IN PANDAPOWER'S T MODEL, CONVERTED TO PI, OFF NOMINAL RATIO AND SHIFT AT THE HIGH VOLTAGE SIDE --
+    fromkv = buskv[busindex.get_indexer(xfmr2wdata['I'])]
+    tokv = buskv[busindex.get_indexer(xfmr2wdata['J'])]
+    swap = fromkv < tokv
+    xfmrrating = xfmr2wdata[['RATB1', 'RATB1', 'RATC1'][CONRATING]]
+    r = xfmr2wdata['R1_2'].astype(complex)
+    x = abs(xfmr2wdata['X1_2']).astype(complex)
+    y = -xfmr2wdata['MAG1'] * xfmrrating / mva_base + 0j
+    tee = y != 0.0
+    za = (r[tee] + 1j * x[tee]) / 2.0
+    zsum = za * za + 2.0 * za * (-1j / y[tee])
+    r[tee] = (zsum * y[tee] / -1j).real
+    x[tee] = (zsum * y[tee] / -1j).imag
+    y[tee] = -2j * za / zsum
+    nline = len(branchdata)
+    tiex = 0.002 / (swing_kv ** 2 / mva_base)
+    model = {
+        'mva_base': mva_base, 'nbus': nbus, 'extbus': extbus, 'va_ref': math.radians(swing_angle),
+        'bus_on': numpy.append(abs(busdata['IDE']) < 4, True), 'buskv': buskv,
+        'vmin': numpy.append(busdata['EVLO'], swing_vreg), 'vmax': numpy.append(busdata['EVHI'], swing_vreg),
+        'pd': numpy.bincount(busindex.get_indexer(loads['I']), loads['PL'], nbus),
+        'qd': numpy.bincount(busindex.get_indexer(loads['I']), loads['QL'], nbus),
+        'bs': numpy.bincount(busindex.get_indexer(fixshunts['I']), -1e-3 * fixshunts['BL'], nbus),
+        'nline': nline + 1,
+        'frompos': numpy.concatenate([busindex.get_indexer(branchdata['I']), [busindex.get_loc(swingbus)],
+                                      busindex.get_indexer(numpy.where(swap, xfmr2wdata['J'], xfmr2wdata['I']))]),
+        'topos': numpy.concatenate([busindex.get_indexer(branchdata['J']), [extbus],
+                                    busindex.get_indexer(numpy.where(swap, xfmr2wdata['I'], xfmr2wdata['J']))]),
+        'r': numpy.concatenate([branchdata['R'], [0.0], r]),
+        'x': numpy.concatenate([branchdata['X'], [tiex], x]),
+        'b': numpy.concatenate([branchdata['B'], [0.0], y]),
+        'ratio': numpy.concatenate([numpy.ones(nline + 1), numpy.where(swap, xfmr2wdata['WINDV2'], xfmr2wdata['WINDV1']) /
+                                    numpy.where(swap, xfmr2wdata['WINDV1'], xfmr2wdata['WINDV2'])]),
+        'shift': numpy.radians(numpy.concatenate([numpy.zeros(nline + 1), xfmr2wdata['ANG1']])),
+        'rating': numpy.concatenate([branchdata[['RATEA', 'RATEB', 'RATEC'][CONRATING]], [1e9], xfmrrating]),
+        'limited': numpy.concatenate([numpy.ones(nline, dtype=bool), [False], numpy.ones(len(xfmr2wdata), dtype=bool)]),
+        'branch_on': numpy.concatenate([branchdata['ST'] != 0, [True], xfmr2wdata['STAT'] != 0])}
+
+    # -- GENERATORS: SWING, RAW, SWITCHED SHUNTS (REACTIVE ONLY), EXTERNAL GRID (IMPORT ONLY) --
+    # -- LIMITS FROM THE KW / KVAR GENERATION CONVENTION OF THE PARSED DATA ---
+    total_qmin = numpy.zeros(len(swshunts))
+    total_qmax = numpy.zeros(len(swshunts))
+    for j in range(1, 9):
+        kvars = swshunts['B' + str(j)]
+        total_qmin += numpy.where(kvars < 0.0, swshunts['N' + str(j)] * kvars, 0.0)
+        total_qmax += numpy.where(kvars > 0.0, swshunts['N' + str(j)] * kvars, 0.0)
+    nsw = len(swshunts)
+    genkeys = [swing_key] + [str(x) + '-' + y for x, y in zip(gendata['I'].tolist(), gendata['ID'].tolist())]
+    model.update({
+        'genpos': numpy.concatenate([[busindex.get_loc(swingbus)], busindex.get_indexer(gendata['I']), busindex.get_indexer(swshunts['I']),
+                                     [extbus]]),
+        'pmin': -1e-3 * numpy.concatenate([[swing_pmax], gendata['PB'], numpy.zeros(nsw), [0.0]]),
+        'pmax': -1e-3 * numpy.concatenate([[swing_pmin], gendata['PT'], numpy.zeros(nsw), [-1e9]]),
+        'qmin': -1e-3 * numpy.concatenate([[swing_qmax], gendata['QB'], total_qmax, [0.0]]),
+        'qmax': -1e-3 * numpy.concatenate([[swing_qmin], gendata['QT'], total_qmin, [-1e9]]),
+        'gen_on': numpy.concatenate([[True], gendata['STAT'] != 0, numpy.ones(nsw + 1, dtype=bool)])})
+    model['pmin'] += NATIVE_OPF_DELTA                   # pandapower's delta, fixed p generators end up with crossed limits
+    model['pmax'] -= NATIVE_OPF_DELTA
+    model['qmin'] -= NATIVE_OPF_DELTA
+    model['qmax'] += NATIVE_OPF_DELTA
+
+    # -- COSTS: THE EXTERNAL GRID PAYS 1 PER KW, PIECEWISE LINEAR SEGMENTS OF THE DISPATCHABLE GENERATORS AS PANDAPOWER
+    # -- WRITES THEM INTO GENCOST, CURVE POINTS (KW, -1E3 * COST) AGAINST THE DISPATCH IN MW --
+    ngen = len(model['genpos'])
+    model['linear_cost'] = numpy.zeros(ngen)
+    model['linear_cost'][-1] = 1e3
+    genopfdict = case['genopfdict']
+    pwlcostdata = case['pwlcostdata']
+    offsets = pwlcostdata['offsets']
+    dispatchable = [i for i, genkey in enumerate(genkeys) if genkey in genopfdict]
+    rows = numpy.array([pwlcostdata['tables'][case['gdispdict'][genopfdict[genkeys[i]]]] for i in dispatchable], dtype=numpy.int64)
+    nsegments = numpy.maximum(offsets[rows + 1] - offsets[rows] - 1, 0)
+    first = numpy.repeat(offsets[rows] - numpy.append(0, numpy.cumsum(nsegments)[:-1]), nsegments) + numpy.arange(nsegments.sum())
+    p = pwlcostdata['p']
+    f = -1e3 * pwlcostdata['f']
+    slope = (f[first + 1] - f[first]) / (p[first + 1] - p[first])
+    model.update({'cost_gen': numpy.array(dispatchable, dtype=numpy.int64)[nsegments > 0],
+                  'segment_gen': numpy.repeat(numpy.array(dispatchable, dtype=numpy.int64), nsegments),
+                  'segment_slope': slope, 'segment_intercept': f[first] - slope * p[first]})
+    return model
+
+
+def get_native_admittances(model, branches, buspos, shunts):
+    """ branch end admittances of the given branches (from end: yff, yft; to end: ytf, ytt) and the sparse bus admittance
+        matrix over the solved buses, with every diagonal entry stored; shunts are the bus shunt admittances in pu """
+    import scipy.sparse
+    nb = len(shunts)
+    ys = 1.0 / (model['r'][branches] + 1j * model['x'][branches])
+    tap = model['ratio'][branches] * numpy.exp(1j * model['shift'][branches])
+    ytt = ys + 1j * model['b'][branches] / 2.0
+    f = buspos[model['frompos'][branches]]
+    t = buspos[model['topos'][branches]]
+    ends = {'f': f, 't': t, 'yff': ytt / (tap * numpy.conj(tap)), 'yft': -ys / numpy.conj(tap), 'ytf': -ys / tap, 'ytt': ytt}
+    diagonal = numpy.arange(nb)
+    Ybus = scipy.sparse.coo_matrix((numpy.concatenate([ends['yff'], ends['yft'], ends['ytf'], ends['ytt'], shunts]),
+                                    (numpy.concatenate([f, f, t, t, diagonal]), numpy.concatenate([f, t, f, t, diagonal]))), shape=(nb, nb)).tocsr()
+    Ybus.sum_duplicates()
+    return [ends, Ybus]
+
+
+def get_native_power_derivatives(Ybus, rows, V, lam):
+    """ bus power injections S = V conj(Ybus V), the entries (row, column, dS/dVa, dS/dVm) of their jacobian and the entries
+        (row, column, value) of the hessian of re(lam_p' S) + im(lam_q' S) over [Va, Vm] for lam = lam_p - j lam_q """
+    nb = len(V)
+    cols = Ybus.indices
+    y = Ybus.data
+    diagonal = numpy.arange(nb)
+    Ibus = Ybus.dot(V)
+    Vm = abs(V)
+    Vnorm = V / Vm
+    S = V * numpy.conj(Ibus)
+    jac = [numpy.append(rows, diagonal), numpy.append(cols, diagonal),
+           numpy.append(-1j * V[rows] * numpy.conj(y * V[cols]), 1j * S),
+           numpy.append(V[rows] * numpy.conj(y * Vnorm[cols]), numpy.conj(Ibus) * Vnorm)]
+    if lam is None:
+        return [S, jac, None]
+    # -- E = diag(conj V) (Ybus^H diag(V lam) - diag(Ybus^H (V lam))), C = diag(lam V) conj(Ybus diag(V)), F = C - diag(lam S) --
+    lamV = lam * V
+    E = numpy.append(numpy.conj(V[cols] * y) * lamV[rows], -numpy.conj(V) * numpy.conj(Ybus.T.dot(numpy.conj(lamV))))
+    C = lamV[rows] * numpy.conj(y * V[cols])
+    F = numpy.append(C, -lam * S)
+    erows = numpy.append(cols, diagonal)
+    ecols = numpy.append(rows, diagonal)
+    frows = numpy.append(rows, diagonal)
+    fcols = numpy.append(cols, diagonal)
+    gva = numpy.concatenate([1j * E / Vm[erows], -1j * F / Vm[frows]]).real
+    gvvrows = numpy.append(rows, cols)
+    gvvcols = numpy.append(cols, rows)
+    gvv = (numpy.append(C, C) / (Vm[gvvrows] * Vm[gvvcols])).real
+    vrows = numpy.append(erows, frows)
+    vcols = numpy.append(ecols, fcols)
+    hess = [numpy.concatenate([erows, frows, vcols, nb + vrows, nb + gvvrows]),
+            numpy.concatenate([ecols, fcols, nb + vrows, vcols, nb + gvvcols]),
+            numpy.concatenate([E.real, F.real, gva, gva, gvv])]
+    return [S, jac, hess]
+
+
+def get_native_flow_derivatives(ends, V, mu):
+    """ squared current magnitudes |I|^2 of the limited branch ends, I = ca V[a] + cb V[b], the entries (row, column, value)
+        of their jacobian and of the hessian of mu' |I|^2 over [Va, Vm] """
+    nb = len(V)
+    a = ends['a']
+    b = ends['b']
+    I = ends['ca'] * V[a] + ends['cb'] * V[b]
+    rows = numpy.arange(len(I))
+    derivatives = [1j * ends['ca'] * V[a], 1j * ends['cb'] * V[b], ends['ca'] * V[a] / abs(V[a]), ends['cb'] * V[b] / abs(V[b])]
+    cols = [a, b, nb + a, nb + b]
+    jac = [numpy.tile(rows, 4), numpy.concatenate(cols), 2.0 * (numpy.conj(I) * numpy.concatenate(derivatives).reshape((4, -1))).real.ravel()]
+    if mu is None:
+        return [(I * numpy.conj(I)).real, jac, None]
+    # -- 2 re(mu dI' conj(dI)) OVER THE FOUR VARIABLES OF EACH END, 2 re(mu conj(I) d2I) ON THE ANGLE-ANGLE AND ANGLE-MAGNITUDE PAIRS --
+    muI = mu * numpy.conj(I)
+    hrows = [cols[p] for p in range(4) for q in range(4)]
+    hcols = [cols[q] for p in range(4) for q in range(4)]
+    hvals = [2.0 * (mu * derivatives[p] * numpy.conj(derivatives[q])).real for p in range(4) for q in range(4)]
+    for k, bus in enumerate([a, b]):
+        second = 2.0 * (muI * derivatives[k]).real / abs(V[bus])
+        hrows.extend([cols[k], cols[k], cols[k + 2]])
+        hcols.extend([cols[k], cols[k + 2], cols[k]])
+        hvals.extend([2.0 * (1j * muI * derivatives[k]).real, second, second])
+    return [(I * numpy.conj(I)).real, jac, [numpy.concatenate(hrows), numpy.concatenate(hcols), numpy.concatenate(hvals)]]
+
+
+def solve_native_opf(model, branch_on, gen_on, start=None, max_it=OPF_ITMXN):
+    """ ac opf of the model with the given in service branches and generators by a primal-dual interior point method (the
+        pips iteration without step control); buses not connected to the external grid are left out; variables are bus
+        angles and magnitudes, generator p and q and one cost variable per piecewise linear cost, fixed ones are eliminated;
+        the flat start is pips' (middle of the bounds), start gives bus vm/va and generator mw/mvar to start from instead """
+    import scipy.sparse
+    import scipy.sparse.csgraph
+    import scipy.sparse.linalg
+    base = model['mva_base']
+    # -- BUSES CONNECTED TO THE EXTERNAL GRID BY IN SERVICE BRANCHES ----------
+    branch_on = branch_on & model['bus_on'][model['frompos']] & model['bus_on'][model['topos']]
+    nbus = model['nbus']
+    graph = scipy.sparse.csr_matrix((numpy.ones(int(branch_on.sum())), (model['frompos'][branch_on], model['topos'][branch_on])), shape=(nbus, nbus))
+    labels = scipy.sparse.csgraph.connected_components(graph, directed=False)[1]
+    buses = numpy.flatnonzero(model['bus_on'] & (labels == labels[model['extbus']]))
+    buspos = -numpy.ones(nbus, dtype=numpy.int64)
+    buspos[buses] = numpy.arange(len(buses))
+    branches = numpy.flatnonzero(branch_on & (buspos[model['frompos']] >= 0))
+    gens = numpy.flatnonzero(gen_on & (buspos[model['genpos']] >= 0))
+    nb = len(buses)
+    ng = len(gens)
+    ends, Ybus = get_native_admittances(model, branches, buspos, 1j * model['bs'][buses] / base)
+    ybusrows = numpy.repeat(numpy.arange(nb), numpy.diff(Ybus.indptr))
+    limited = numpy.flatnonzero(model['limited'][branches] & (model['rating'][branches] > 0.0) & (model['rating'][branches] < 1e10))
+    flowends = {'a': numpy.tile(ends['f'][limited], 2), 'b': numpy.tile(ends['t'][limited], 2),
+                'ca': numpy.append(ends['yff'][limited], ends['ytf'][limited]), 'cb': numpy.append(ends['yft'][limited], ends['ytt'][limited])}
+    flowlimit = numpy.tile((model['rating'][branches[limited]] / base) ** 2, 2)
+    nflow = len(flowlimit)
+    genbus = buspos[model['genpos'][gens]]
+    Sd = (model['pd'][buses] + 1j * model['qd'][buses]) / base
+    # -- COST VARIABLES AND EPIGRAPH ROWS OF THE IN SERVICE COSTED GENERATORS -
+    genrow = -numpy.ones(len(gen_on), dtype=numpy.int64)
+    genrow[gens] = numpy.arange(ng)
+    costgens = model['cost_gen'][genrow[model['cost_gen']] >= 0]
+    ny = len(costgens)
+    costrow = -numpy.ones(len(gen_on), dtype=numpy.int64)
+    costrow[costgens] = numpy.arange(ny)
+    segments = numpy.flatnonzero(costrow[model['segment_gen']] >= 0)
+    nseg = len(segments)
+    nx = 2 * nb + 2 * ng + ny
+    cost = numpy.concatenate([numpy.zeros(2 * nb), model['linear_cost'][gens] * base, numpy.zeros(ng), numpy.ones(ny)]) * NATIVE_OPF_COST_SCALE
+
+    # -- BOUNDS, FIXED VARIABLES (REFERENCE ANGLE, EXTERNAL GRID VOLTAGE) ARE ELIMINATED --
+    refpos = buspos[model['extbus']]
+    xmin = numpy.concatenate([numpy.full(nb, -numpy.inf), model['vmin'][buses], model['pmin'][gens] / base, model['qmin'][gens] / base, numpy.full(ny, -numpy.inf)])
+    xmax = numpy.concatenate([numpy.full(nb, numpy.inf), model['vmax'][buses], model['pmax'][gens] / base, model['qmax'][gens] / base, numpy.full(ny, numpy.inf)])
+    xmin[refpos] = xmax[refpos] = model['va_ref']
+    fixed = xmin == xmax
+    free = numpy.flatnonzero(~fixed)
+    nfree = len(free)
+    freepos = -numpy.ones(nx, dtype=numpy.int64)
+    freepos[free] = numpy.arange(nfree)
+    xfull = numpy.where(fixed, xmin, 0.0)
+
+    # -- LINEAR INEQUALITIES A x <= b: EPIGRAPH ROWS y >= slope * p + intercept, FINITE UPPER AND LOWER BOUNDS --
+    upper = numpy.flatnonzero(xmax[free] < 1e10)
+    lower = numpy.flatnonzero(xmin[free] > -1e10)
+    segmentgen = model['segment_gen'][segments]
+    Ab = scipy.sparse.coo_matrix((numpy.concatenate([model['segment_slope'][segments] * base, -numpy.ones(nseg), numpy.ones(len(upper)), -numpy.ones(len(lower))]),
+                                  (numpy.concatenate([numpy.arange(nseg), numpy.arange(nseg), nseg + numpy.arange(len(upper)), nseg + len(upper) + numpy.arange(len(lower))]),
+                                   numpy.concatenate([freepos[2 * nb + genrow[segmentgen]], freepos[2 * nb + 2 * ng + costrow[segmentgen]], upper, lower]))),
+                                 shape=(nseg + len(upper) + len(lower), nfree))
+    bb = numpy.concatenate([-model['segment_intercept'][segments], xmax[free][upper], -xmin[free][lower]])
+    # -- GENERATOR COLUMNS OF THE POWER BALANCE JACOBIAN (FIXED GENERATOR POWERS DROP OUT) --
+    genjac = [numpy.append(genbus, nb + genbus), freepos[2 * nb + numpy.arange(2 * ng)], -numpy.ones(2 * ng)]
+
+    # -- START: MIDDLE OF THE BOUNDS (INFINITE ONES AT +-1E10) OR THE GIVEN SOLUTION, COST VARIABLES ABOVE THEIR SEGMENTS --
+    # -- AT THE START DISPATCH, THE CURVES ARE EXTRAPOLATED FAR PAST THEIR LAST POINT SO THE LARGEST TABLE COST IS NO BOUND --
+    x0 = (numpy.clip(xmin, -1e10, 1e10) + numpy.clip(xmax, -1e10, 1e10)) / 2.0
+    x0[:nb] = model['va_ref']
+    if start is not None:
+        given = numpy.concatenate([start['va'][buses], start['vm'][buses], start['mw'][gens] / base, start['mvar'][gens] / base])
+        x0[:2 * nb + 2 * ng] = numpy.clip(numpy.where(numpy.isnan(given), x0[:2 * nb + 2 * ng], given), xmin[:2 * nb + 2 * ng], xmax[:2 * nb + 2 * ng])
+    if ny:
+        top = numpy.full(ny, -numpy.inf)
+        numpy.maximum.at(top, costrow[segmentgen], model['segment_slope'][segments] * base * x0[2 * nb + genrow[segmentgen]]
+                         + model['segment_intercept'][segments])
+        x0[2 * nb + 2 * ng:] = top + 0.1 * abs(top)
+
+    def get_matrix(entries, shape):
+        """ sparse matrix of (row, column, value) entries in free variable columns, entries of fixed variables dropped """
+        keep = entries[1] >= 0
+        return scipy.sparse.csr_matrix((entries[2][keep], (entries[0][keep], entries[1][keep])), shape=shape)
+
+    def evaluate(x, lam=None, mu=None):
+        """ cost, constraints and their jacobians at the free variables x, the lagrangian hessian for multipliers lam, mu """
+        xfull[free] = x
+        V = xfull[nb:2 * nb] * numpy.exp(1j * xfull[:nb])
+        S, sjac, shess = get_native_power_derivatives(Ybus, ybusrows, V, None if lam is None else lam[:nb] - 1j * lam[nb:])
+        flow, fjac, fhess = get_native_flow_derivatives(flowends, V, None if mu is None else mu[:nflow])
+        if lam is not None:
+            rows = numpy.append(shess[0], fhess[0])
+            cols = numpy.append(shess[1], fhess[1])
+            keep = numpy.flatnonzero((freepos[rows] >= 0) & (freepos[cols] >= 0))
+            return scipy.sparse.csr_matrix((numpy.append(shess[2], fhess[2])[keep], (freepos[rows[keep]], freepos[cols[keep]])), shape=(nfree, nfree))
+        mismatch = S + Sd - numpy.bincount(genbus, xfull[2 * nb:2 * nb + ng], nb) - 1j * numpy.bincount(genbus, xfull[2 * nb + ng:2 * nb + 2 * ng], nb)
+        dg = get_matrix([numpy.concatenate([sjac[0], nb + sjac[0], sjac[0], nb + sjac[0], genjac[0]]),
+                         numpy.concatenate([freepos[sjac[1]], freepos[sjac[1]], freepos[nb + sjac[1]], freepos[nb + sjac[1]], genjac[1]]),
+                         numpy.concatenate([sjac[2].real, sjac[2].imag, sjac[3].real, sjac[3].imag, genjac[2]])], (2 * nb, nfree))
+        dh = get_matrix([numpy.append(fjac[0], nflow + Ab.row), numpy.append(freepos[fjac[1]], Ab.col), numpy.append(fjac[2], Ab.data)],
+                        (nflow + Ab.shape[0], nfree))
+        return [cost.dot(xfull), numpy.append(mismatch.real, mismatch.imag), numpy.append(flow - flowlimit, Ab.dot(x) - bb), dg, dh]
+
+    # -- PRIMAL-DUAL INTERIOR POINT ITERATIONS, CONVERGENCE MEASURED ON THE FULL VARIABLE VECTOR --
+    x = x0[free]
+    f, g, h, dg, dh = evaluate(x)
+    neq = len(g)
+    niq = len(h)
+    gamma = 1.0
+    lam = numpy.zeros(neq)
+    z = numpy.where(h < -1.0, -h, 1.0)
+    mu = numpy.where(gamma / z > 1.0, gamma / z, 1.0)
+    f0 = f
+    status = 'Did not converge'
+    iterations = 0
+    while True:
+        Lx = cost[free] + dg.T.dot(lam) + dh.T.dot(mu)
+        xnorm = abs(xfull).max()
+        feascond = max(abs(g).max(), h.max() if niq else 0.0) / (1.0 + max(xnorm, abs(z).max() if niq else 0.0))
+        gradcond = abs(Lx).max() / (1.0 + max(abs(lam).max(), abs(mu).max() if niq else 0.0))
+        compcond = z.dot(mu) / (1.0 + xnorm)
+        costcond = abs(f - f0) / (1.0 + abs(f0))
+        if feascond < NATIVE_OPF_FEASTOL and gradcond < NATIVE_OPF_TOLERANCE and compcond < NATIVE_OPF_TOLERANCE and costcond < NATIVE_OPF_TOLERANCE:
+            status = 'Converged'
+            break
+        if iterations and (numpy.isnan(x).any() or alphap < 1e-8 or alphad < 1e-8 or gamma < 1e-16 or gamma > 1e16):
+            status = 'Numerically failed'
+            break
+        if iterations == max_it:
+            break
+        iterations += 1
+        f0 = f
+        # -- REDUCED KKT SYSTEM [M dg'; dg 0] [dx; dlam] = [-N; -g], ONE SPARSE LU --
+        dhT = dh.T.tocsr()
+        M = evaluate(x, lam, mu) + dhT.dot(scipy.sparse.diags(mu / z).dot(dh))
+        N = Lx + dhT.dot((mu * h + gamma) / z)
+        kkt = scipy.sparse.bmat([[M, dg.T], [dg, None]], format='csc')
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            try:
+                step = scipy.sparse.linalg.splu(kkt).solve(numpy.append(-N, -g))
+            except RuntimeError:                                   # singular kkt matrix
+                step = numpy.full(nfree + neq, numpy.nan)
+        if numpy.isnan(step).any():
+            status = 'Numerically failed'
+            break
+        dx = step[:nfree]
+        dz = -h - z - dh.dot(dx)
+        dmu = -mu + (gamma - mu * dz) / z
+        k = dz < 0.0
+        alphap = min(NATIVE_OPF_STEP * (z[k] / -dz[k]).min(), 1.0) if k.any() else 1.0
+        k = dmu < 0.0
+        alphad = min(NATIVE_OPF_STEP * (mu[k] / -dmu[k]).min(), 1.0) if k.any() else 1.0
+        x = x + alphap * dx
+        z = z + alphap * dz
+        lam = lam + alphad * step[nfree:]
+        mu = mu + alphad * dmu
+        if niq:
+            gamma = NATIVE_OPF_CENTERING * z.dot(mu) / niq
+        f, g, h, dg, dh = evaluate(x)
+
+    # -- SOLUTION ON THE FULL ELEMENT ARRAYS, NAN / ZERO FOR ELEMENTS LEFT OUT OF THE SOLVE --
+    V = xfull[nb:2 * nb] * numpy.exp(1j * xfull[:nb])
+    vm = numpy.full(nbus, numpy.nan)
+    va = numpy.full(nbus, numpy.nan)
+    vm[buses] = abs(V)
+    va[buses] = xfull[:nb]
+    mw = numpy.zeros(len(gen_on))
+    mvar = numpy.zeros(len(gen_on))
+    mw[gens] = base * xfull[2 * nb:2 * nb + ng]
+    mvar[gens] = base * xfull[2 * nb + ng:2 * nb + 2 * ng]
+    sf = numpy.zeros(len(branch_on), dtype=complex)
+    st = numpy.zeros(len(branch_on), dtype=complex)
+    Vf = V[ends['f']]
+    Vt = V[ends['t']]
+    sf[branches] = base * Vf * numpy.conj(ends['yff'] * Vf + ends['yft'] * Vt)
+    st[branches] = base * Vt * numpy.conj(ends['ytf'] * Vf + ends['ytt'] * Vt)
+    return {'success': status == 'Converged', 'message': status, 'iterations': iterations, 'objective': f / NATIVE_OPF_COST_SCALE,
+            'vm': vm, 'va': va, 'mw': mw, 'mvar': mvar, 'sf': sf, 'st': st}
+
+
+def write_native_results(net, model, solution):
+    """ native opf solution into the network result tables, as far as pandapower's opf fills them """
+    import pandas
+    nline = model['nline']
+    vm = solution['vm']
+    solved = ~numpy.isnan(vm)
+    mw = solution['mw']
+    mvar = solution['mvar']
+    # -- BUS INJECTIONS (LOAD CONVENTION): LOADS, FIXED SHUNTS AT THE SOLVED VOLTAGE, GENERATORS --
+    p_kw = 1e3 * (model['pd'] * solved - numpy.bincount(model['genpos'], mw, model['nbus']))
+    q_kvar = 1e3 * (model['qd'] * solved - model['bs'] * vm ** 2 - numpy.bincount(model['genpos'], mvar, model['nbus']))
+    net.res_bus = pandas.DataFrame({'vm_pu': vm, 'va_degree': numpy.degrees(solution['va']), 'p_kw': numpy.where(solved, p_kw, 0.0),
+                                    'q_kvar': numpy.where(solved, q_kvar, 0.0)}, index=net.bus.index, columns=['vm_pu', 'va_degree', 'p_kw', 'q_kvar'])
+    ngen = len(net.gen)
+    genvm = vm[model['genpos']]
+    net.res_gen = pandas.DataFrame({'p_kw': -1e3 * mw[:ngen] + 0.0, 'q_kvar': -1e3 * mvar[:ngen] + 0.0,
+                                    'va_degree': numpy.degrees(solution['va'][model['genpos'][:ngen]]), 'vm_pu': genvm[:ngen]},
+                                   index=net.gen.index, columns=['p_kw', 'q_kvar', 'va_degree', 'vm_pu'])
+    net.res_ext_grid = pandas.DataFrame({'p_kw': -1e3 * mw[ngen:] + 0.0, 'q_kvar': -1e3 * mvar[ngen:] + 0.0}, index=net.ext_grid.index,
+                                        columns=['p_kw', 'q_kvar'])
+    # -- BRANCH END FLOWS, CURRENTS AND LOADING AGAINST THE RATING --------------
+    sf = solution['sf']
+    st = solution['st']
+    vmf = vm[model['frompos']]
+    vmt = vm[model['topos']]
+    i_from = numpy.where(solved[model['frompos']], abs(sf) / vmf, 0.0) / (math.sqrt(3) * model['buskv'][model['frompos']])
+    i_to = numpy.where(solved[model['topos']], abs(st) / vmt, 0.0) / (math.sqrt(3) * model['buskv'][model['topos']])
+    loading = 100.0 * numpy.maximum(i_from * model['buskv'][model['frompos']], i_to * model['buskv'][model['topos']]) * math.sqrt(3) / model['rating']
+    line = slice(0, nline)
+    trafo = slice(nline, len(sf))
+    net.res_line = pandas.DataFrame({
+        'p_from_kw': 1e3 * sf[line].real, 'q_from_kvar': 1e3 * sf[line].imag, 'p_to_kw': 1e3 * st[line].real, 'q_to_kvar': 1e3 * st[line].imag,
+        'pl_kw': 1e3 * (sf[line] + st[line]).real, 'ql_kvar': 1e3 * (sf[line] + st[line]).imag, 'i_from_ka': i_from[line], 'i_to_ka': i_to[line],
+        'i_ka': numpy.maximum(i_from[line], i_to[line]), 'loading_percent': loading[line]}, index=net.line.index,
+        columns=['p_from_kw', 'q_from_kvar', 'p_to_kw', 'q_to_kvar', 'pl_kw', 'ql_kvar', 'i_from_ka', 'i_to_ka', 'i_ka', 'loading_percent'])
+    net.res_trafo = pandas.DataFrame({
+        'p_hv_kw': 1e3 * sf[trafo].real, 'q_hv_kvar': 1e3 * sf[trafo].imag, 'p_lv_kw': 1e3 * st[trafo].real, 'q_lv_kvar': 1e3 * st[trafo].imag,
+        'pl_kw': 1e3 * (sf[trafo] + st[trafo]).real, 'ql_kvar': 1e3 * (sf[trafo] + st[trafo]).imag, 'i_hv_ka': i_from[trafo], 'i_lv_ka': i_to[trafo],
+        'loading_percent': loading[trafo]}, index=net.trafo.index,
+        columns=['p_hv_kw', 'q_hv_kvar', 'p_lv_kw', 'q_lv_kvar', 'pl_kw', 'ql_kvar', 'i_hv_ka', 'i_lv_ka', 'loading_percent'])
+    loadsolved = solved[net.bus.index.get_indexer(net.load['bus'].values)] & net.load['in_service'].values
+    net.res_load = pandas.DataFrame({'p_kw': net.load['p_kw'].values * loadsolved, 'q_kvar': net.load['q_kvar'].values * loadsolved},
+                                    index=net.load.index, columns=['p_kw', 'q_kvar'])
+    shuntvm = vm[net.bus.index.get_indexer(net.shunt['bus'].values)]
+    shuntq = net.shunt['q_kvar'].values * net.shunt['step'].values * net.shunt['in_service'].values
+    net.res_shunt = pandas.DataFrame({'p_kw': 0.0, 'q_kvar': numpy.nan_to_num(shuntq * shuntvm ** 2), 'vm_pu': shuntvm},
+                                     index=net.shunt.index, columns=['p_kw', 'q_kvar', 'vm_pu'])
+    net.res_cost = solution['objective']
+    return
+
+
+def run_native_opf(net, model, start=None):
+    """ native ac opf of the network's in service branches and generators, results into net.res_* like pp.runopp when it
+        converges; start is a base results dict to start from. Return the interior point success, iterations and message """
+    gen_on = numpy.append(net.gen['in_service'].values, net.ext_grid['in_service'].values)
+    branch_on = numpy.append(net.line['in_service'].values, net.trafo['in_service'].values)
+    if start is not None:
+        start = {'vm': numpy.nan_to_num(start['res_bus']['vm_pu'].values), 'va': numpy.radians(numpy.nan_to_num(start['res_bus']['va_degree'].values)),
+                 'mw': -1e-3 * numpy.append(start['res_gen']['p_kw'].values, start['res_ext_grid']['p_kw'].values),
+                 'mvar': -1e-3 * numpy.append(start['res_gen']['q_kvar'].values, start['res_ext_grid']['q_kvar'].values)}
+    solution = solve_native_opf(model, branch_on, gen_on, start)
+    if solution['success']:
+        write_native_results(net, model, solution)
+    return {'success': solution['success'], 'iterations': solution['iterations'], 'message': solution['message']}
+
+
+def get_opf_differences(net_a, net_b):
+    """ largest bus voltage (pu, degrees) and generator dispatch (mw) differences and the relative objective difference of two opf results """
+    return {'vm_pu': numpy.nanmax(abs(net_a.res_bus['vm_pu'].values - net_b.res_bus['vm_pu'].values)),
+            'va_degree': numpy.nanmax(abs(net_a.res_bus['va_degree'].values - net_b.res_bus['va_degree'].values)),
+            'mw': 1e-3 * max(abs(net_a.res_gen['p_kw'].values - net_b.res_gen['p_kw'].values).max(),
+                             abs(net_a.res_ext_grid['p_kw'].values - net_b.res_ext_grid['p_kw'].values).max()),
+            'objective': abs(float(net_a.res_cost) - float(net_b.res_cost)) / max(1.0, abs(float(net_a.res_cost)))}
+
+
+def check_native_opf(case):
+    """ solve the base case opf with pandapower and with the native kernel on copies of the network, raise if the bus
+        voltages, generator dispatch or objective differ by more than NATIVE_CHECK_TOLERANCE """
+    import pandapower as pp
+    print('CHECKING NATIVE OPF AGAINST PANDAPOWER OPF .........................')
+    pp_net = copy.deepcopy(case['net'])
+    start_time = time.time()
+    pp.runopp(pp_net, init='flat', calculate_voltage_angles=True, verbose=False, suppress_warnings=True)
+    pp_time = time.time() - start_time
+    native_net = copy.deepcopy(case['net'])
+    start_time = time.time()
+    output = run_native_opf(native_net, get_native_opf_model(case))
+    if not output['success']:
+        raise pp.OPFNotConverged('Native optimal power flow did not converge: ' + output['message'])
+    native_time = time.time() - start_time
+    quantities = ['vm_pu', 'va_degree', 'mw', 'objective']
+    differences = get_opf_differences(pp_net, native_net)
+    print('PANDAPOWER / NATIVE OPF SECONDS ....................................', round(pp_time, 2), round(native_time, 2))
+    print('LARGEST VM / VA / MW / RELATIVE OBJECTIVE DIFFERENCE ...............', ' '.join(['%.2e' % differences[x] for x in quantities]))
+    mismatches = [x for x in quantities if not differences[x] <= NATIVE_CHECK_TOLERANCE[x]]
+    if mismatches:
+        raise RuntimeError('NATIVE OPF DOES NOT MATCH PANDAPOWER OPF: ' + ', '.join(mismatches))
+    print('NATIVE OPF MATCHES PANDAPOWER OPF ..................................')
+    return
+
+
+# -- DC OPF TIER: LOSSLESS FLAT VOLTAGE OPF, AC OPF FOR CRITICAL RESULTS ------
+def solve_dc_opf(net):
+    """ dc opf in place, reported with flat voltage magnitudes (generators at their setpoints), no reactive power and the
+        fixed shunts at their nominal mvar """
+    import pandapower as pp
+    pp.rundcopp(net, verbose=False, suppress_warnings=True)
+    net.res_bus['vm_pu'] = 1.0
+    net.res_bus['q_kvar'] = 0.0
+    net.res_gen['vm_pu'] = net.gen['vm_pu'].values
+    net.res_gen['q_kvar'] = 0.0
+    net.res_ext_grid['q_kvar'] = 0.0
+    net.res_shunt['q_kvar'] = net.shunt['q_kvar'].values * net.shunt['step'].values * net.shunt['in_service'].values
+    net.res_shunt['vm_pu'] = 1.0
+    return
+
+
+def get_dc_criticality(net, lost_units):
+    """ why a dc opf result needs the ac opf: 'flow' when a branch is loaded to TIER_LOADING of its rating, 'voltage' when
+        in service generators were lost (with their reactive support) or a branch angle difference reaches TIER_ANGLE, else None """
+    va = net.res_bus['va_degree']
+    loading = numpy.append(net.res_line['loading_percent'].values, net.res_trafo['loading_percent'].values)
+    angle = numpy.append(abs(va.loc[net.line['from_bus']].values - va.loc[net.line['to_bus']].values) * net.line['in_service'].values,
+                         abs(va.loc[net.trafo['hv_bus']].values - va.loc[net.trafo['lv_bus']].values) * net.trafo['in_service'].values)
+    if len(loading) and numpy.nanmax(loading) >= 100.0 * TIER_LOADING:
+        return 'flow'
+    if lost_units or (len(angle) and numpy.nanmax(angle) >= TIER_ANGLE):
+        return 'voltage'
+    return None
+
+
+# -- CONVERGENCE TELEMETRY OF THE CONTINGENCY SOLVES ----------------------------
+@contextlib.contextmanager
+def record_opf_output(opf_output):
+    """ add pips iterations and the last pips message of pandapower's opfs inside the block to opf_output, pandapower drops them
+        from converged results, so its opf function is wrapped for the block only and restored when the block exits """
+    import pandapower.optimal_powerflow as optimal_powerflow
+    opf = optimal_powerflow.opf
+
+    def recording_opf(*args, **kwargs):
+        result = opf(*args, **kwargs)
+        output = result.get('raw', {}).get('output', {})
+        opf_output['iterations'] += output.get('iterations', 0)
+        opf_output['message'] = output.get('message', '')
+        return result
+    optimal_powerflow.opf = recording_opf
+    try:
+        yield opf_output
+    finally:
+        optimal_powerflow.opf = opf
+
+
+def get_power_mismatch(net):
+    """ largest bus power balance residual (kva) of the solved network: bus injections against line and transformer end flows """
+    import pandas
+    busindex = net.bus.index
+    residual = (net.res_bus['p_kw'].values + 1j * net.res_bus['q_kvar'].values).astype(complex)
+    for element, ends in [('line', [('from_bus', 'p_from_kw', 'q_from_kvar'), ('to_bus', 'p_to_kw', 'q_to_kvar')]),
+                          ('trafo', [('hv_bus', 'p_hv_kw', 'q_hv_kvar'), ('lv_bus', 'p_lv_kw', 'q_lv_kvar')])]:
+        results = net['res_' + element]
+        for bus, p, q in ends:
+            numpy.add.at(residual, busindex.get_indexer(net[element][bus].values), results[p].values + 1j * results[q].values)
+    residual = abs(residual)
+    return float(residual[~numpy.isnan(residual)].max()) if len(residual) else 0.0
+
+
+def solve_contingency(session, task, options):
+    """ solve one contingency opf (or governor response power flow) in place, return the result columns needed for reporting,
+        the solver convergence and the cpu time used, a solve that fails reports the base case results """
+    import pandapower as pp
+    conlabel, element, elementidx = task
+    c_start = time.process_time()
+    c_wall = time.time()
+    net = session['net']
+    opf_output = {'iterations': 0, 'message': ''}
+    native_output = {'iterations': 0, 'message': ''}
+    # -- BRANCH OUTAGES BY LOW RANK UPDATES, THE BASE CASE JACOBIAN IS FACTORED ON FIRST USE --
+    low_rank = options.get('mode') == 'governor' and options.get('low_rank') and element in ('line', 'trafo')
+    if low_rank and 'low_rank' not in session:
+        try:
+            session['low_rank'] = get_low_rank_model(session, options['pfactors'])
+        finally:
+            restore_base_state(session)
+    with record_opf_output(opf_output):
+        try:
+            apply_outage(session, element, elementidx)
+            # -- WARM START FROM BASECASE, RETRY WITH FLAT START IF NOT CONVERGED -
+            start = 'flat'
+            path = 'ac'
+            iterations = 0
+            c_result = {'label': conlabel, 'status': 'converged', 'objective': None, 'dc_critical': None}
+            try:
+                if options.get('solve_mode', 'ac') != 'ac':
+                    # -- DC OPF FIRST, THE TIERED MODE GOES ON TO THE AC OPF WHEN THE DC RESULT IS CRITICAL --
+                    solve_dc_opf(net)
+                    lost_units = sum([1 for x, idx in get_task_elements(task) if x == 'gen' and session['in_service']['gen'][net.gen.index.get_loc(idx)]])
+                    c_result['dc_critical'] = get_dc_criticality(net, lost_units)
+                    if options['solve_mode'] == 'dc' or c_result['dc_critical'] is None:
+                        start = None
+                        path = 'dcopf'
+                if options.get('mode') == 'governor':
+                    # -- GOVERNOR RESPONSE POWER FLOW INSTEAD OF A CONTINGENCY OPF --
+                    start = None
+                    path = 'pf'
+                    if low_rank and session['low_rank'] is not None:
+                        iterations = solve_low_rank_outage(session, session['low_rank'], element, elementidx)
+                        start = 'low_rank' if iterations else None
+                    if start is None:
+                        iterations = solve_governor_response(session, options['pfactors'])
+                elif options['warm_start'] and path == 'ac' and options.get('native_model') is not None:
+                    output = run_native_opf(net, options['native_model'], session['base_results'])
+                    native_output.update(iterations=output['iterations'], message=output['message'])
+                    if output['success']:
+                        start = 'warm'
+                elif options['warm_start'] and path == 'ac':
+                    seed_base_dispatch(session)
+                    try:
+                        pp.runopp(net, init='pf', calculate_voltage_angles=True, verbose=False, suppress_warnings=True, PDIPM_MAX_IT=OPF_ITMXN)
+                        start = 'warm'
+                    except pp.OPFNotConverged:
+                        net.gen['p_kw'] = session['gen_p_kw']
+                        net.gen['vm_pu'] = session['gen_vm_pu']
+                if start == 'flat' and options.get('native_model') is not None:
+                    output = run_native_opf(net, options['native_model'])
+                    native_output.update(iterations=native_output['iterations'] + output['iterations'], message=output['message'])
+                    if not output['success']:
+                        raise pp.OPFNotConverged('Native optimal power flow did not converge: ' + output['message'])
+                elif start == 'flat':
+                    pp.runopp(net, init='flat', calculate_voltage_angles=True, verbose=False, suppress_warnings=True, PDIPM_MAX_IT=OPF_ITMXN)
+                c_result.update({'res_bus': net.res_bus[['vm_pu', 'va_degree']].copy(),
+                                 'res_gen': net.res_gen[['p_kw', 'q_kvar']].copy(),
+                                 'res_ext_grid': net.res_ext_grid[['p_kw', 'q_kvar']].copy(),
+                                 'res_shunt': net.res_shunt[['q_kvar']].copy(),
+                                 'mismatch': None if path == 'dcopf' else get_power_mismatch(net)})
+                if path in ('ac', 'dcopf'):
+                    c_result['objective'] = float(net.res_cost)
+            except (pp.OPFNotConverged, pp.LoadflowNotConverged) as error:
+                c_result.update(status='not_converged', message=native_output['message'] or opf_output['message'] or str(error))
+            except Exception as error:
+                c_result.update(status='failed', message=repr(error))
+            # -- OPF TELEMETRY: PIPS OUTPUT RECORDED FROM PANDAPOWER PLUS THE OUTPUT RETURNED BY THE NATIVE ENGINE --
+            opf_iterations = opf_output['iterations'] + native_output['iterations']
+            c_result.update({'start': start, 'path': path, 'iterations': opf_iterations if path in ('ac', 'dcopf') else iterations})
+            c_result.setdefault('message', (native_output['message'] or opf_output['message']) if path in ('ac', 'dcopf') else '')
+        finally:
+            restore_base_state(session)
+    c_result['cpu_time'] = time.process_time() - c_start
+    c_result['wall_time'] = time.time() - c_wall
+    c_result['peak_rss_mb'] = get_peak_rss_mb()
+    return c_result
+
+
+# -- CONTINGENCY WORKER PROCESS STATE (BASE NETWORK IS SENT ONCE PER WORKER) --
+worker_session = None
+worker_options = None
+
+
+def init_contingency_worker(base_net, options):
+    global worker_session, worker_options
+    worker_session = create_outage_session(base_net)
+    worker_options = options
+    return
+
+
+def solve_contingency_slice(tasks):
+    return [solve_contingency(worker_session, task, worker_options) for task in tasks]
+
+
+def get_contingency_slices(tasks, nworkers):
+    """ split tasks into contiguous slices, several per worker for load balancing """
+    slicesize = max(1, int(math.ceil(len(tasks) / (4.0 * nworkers))))
+    return [tasks[i:i + slicesize] for i in range(0, len(tasks), slicesize)]
+
+
+def run_contingencies(base_net, tasks, options):
+    """ generator yielding contingency results in task order, solved serially or by a process pool """
+    nworkers = options['workers']
+    if nworkers <= 1 or len(tasks) <= 1:
+        session = create_outage_session(base_net)
+        for task in tasks:
+            yield solve_contingency(session, task, options)
+        return
+    nworkers = min(nworkers, len(tasks))
+    pool = multiprocessing.Pool(nworkers, initializer=init_contingency_worker, initargs=(base_net, options))
+    try:
+        for results in pool.imap(solve_contingency_slice, get_contingency_slices(tasks, nworkers)):
+            for result in results:
+                yield result
+    finally:
+        pool.terminate()
+        pool.join()
+    return
+
+
+# -- TOPOLOGY PRE-ANALYSIS: BRIDGES, ISLANDING AND NO-OP CONTINGENCIES -------
+def get_topology(net, busdata, branchdata, xfmr2wdata, swingbus):
+    """ in service bus/branch graph of the raw network (lines then 2w transformers, in network index order), its bridges and
+        articulation points from one iterative depth first search per connected component, the swing bus component first """
+    import pandas
+    nline = len(branchdata)
+    busindex = pandas.Index(busdata['I'])
+    frompos = busindex.get_indexer(numpy.append(branchdata['I'], xfmr2wdata['I']))
+    topos = busindex.get_indexer(numpy.append(branchdata['J'], xfmr2wdata['J']))
+    status = numpy.append(net.line['in_service'].values[:nline], net.trafo['in_service'].values).astype(bool)
+    nbus = len(busindex)
+    # -- ADJACENCY BY BRANCH, PARALLEL CIRCUITS ARE SEPARATE EDGES AND NEVER BRIDGES --
+    edges = numpy.flatnonzero(status & (frompos != topos))
+    ends = numpy.append(frompos[edges], topos[edges])
+    order = numpy.argsort(ends, kind='mergesort')
+    adjstart = numpy.searchsorted(ends[order], numpy.arange(nbus + 1)).tolist()
+    adjbus = numpy.append(topos[edges], frompos[edges])[order].tolist()
+    adjedge = numpy.append(edges, edges)[order].tolist()
+    disc = [-1] * nbus          # discovery order
+    low = [0] * nbus            # lowest discovery order reachable from the subtree through one back edge
+    last = [0] * nbus           # highest discovery order in the subtree, the subtree is disc[v]..last[v]
+    component = [-1] * nbus
+    bridgebus = numpy.full(len(status), -1, dtype=numpy.int64)     # subtree root cut off by each bridge
+    articulation = numpy.zeros(nbus, dtype=bool)
+    counter = 0
+    ncomponent = 0
+    slack = busindex.get_loc(swingbus)
+    for root in [slack] + list(range(nbus)):
+        if disc[root] >= 0:
+            continue
+        disc[root] = low[root] = counter
+        component[root] = ncomponent
+        counter += 1
+        children = 0
+        stack = [[root, -1, adjstart[root]]]
+        while stack:
+            top = stack[-1]
+            v = top[0]
+            if top[2] < adjstart[v + 1]:
+                w, e = adjbus[top[2]], adjedge[top[2]]
+                top[2] += 1
+                if e == top[1]:
+                    continue
+                if disc[w] < 0:
+                    disc[w] = low[w] = counter
+                    component[w] = ncomponent
+                    counter += 1
+                    stack.append([w, e, adjstart[w]])
+                elif disc[w] < low[v]:
+                    low[v] = disc[w]
+                continue
+            stack.pop()
+            last[v] = counter - 1
+            if not stack:
+                continue
+            u = stack[-1][0]
+            low[u] = min(low[u], low[v])
+            if low[v] > disc[u]:
+                bridgebus[top[1]] = v
+            if u == root:
+                children += 1
+            elif low[v] >= disc[u]:
+                articulation[u] = True
+        articulation[root] = children > 1
+        ncomponent += 1
+    return {'nbus': nbus, 'nline': nline, 'slack': slack, 'frompos': frompos, 'topos': topos, 'status': status, 'disc': numpy.array(disc),
+            'last': numpy.array(last), 'component': numpy.array(component), 'bridgebus': bridgebus, 'articulation': articulation,
+            'genpos': busindex.get_indexer(net.gen['bus'].values)}
+
+
+def get_task_elements(task):
+    """ (element table, element index) pairs opened by a contingency task """
+    conlabel, element, elementidx = task
+    if element == 'multi':
+        return list(elementidx)
+    if element is None:
+        return []
+    return [(element, elementidx)]
+
+
+def classify_contingencies(topology, net, tasks):
+    """ [kind, island bus mask or None] per task: 'noop' when every element is already out of service or outside the swing bus
+        component, 'island' when the opened branches cut buses off the swing bus component, else 'normal' """
+    import scipy.sparse
+    import scipy.sparse.csgraph
+    main = topology['component'] == 0
+    genmain = net.gen['in_service'].values & main[topology['genpos']]
+    classes = []
+    for task in tasks:
+        branches = []
+        active = False
+        for element, elementidx in get_task_elements(task):
+            if element == 'gen':
+                active |= bool(genmain[net.gen.index.get_loc(elementidx)])
+                continue
+            k = elementidx if element == 'line' else topology['nline'] + elementidx
+            if topology['status'][k] and main[topology['frompos'][k]]:
+                branches.append(k)
+        if not branches:
+            classes.append(['normal' if active else 'noop', None])
+            continue
+        if len(branches) == 1 and topology['bridgebus'][branches[0]] < 0:
+            classes.append(['normal', None])
+            continue
+        if len(branches) == 1:
+            v = topology['bridgebus'][branches[0]]
+            island = (topology['disc'] >= topology['disc'][v]) & (topology['disc'] <= topology['last'][v])
+        else:
+            # -- SEVERAL BRANCHES: CONNECTED COMPONENTS OF THE GRAPH WITHOUT THEM --
+            keep = topology['status'].copy()
+            keep[branches] = False
+            graph = scipy.sparse.csr_matrix((numpy.ones(keep.sum()), (topology['frompos'][keep], topology['topos'][keep])),
+                                            shape=(topology['nbus'], topology['nbus']))
+            labels = scipy.sparse.csgraph.connected_components(graph, directed=False)[1]
+            island = main & (labels != labels[topology['slack']])
+        classes.append(['island' if island.any() else 'normal', island if island.any() else None])
+    return classes
+
+
+def solve_topology_contingency(case, base, task, kind, island):
+    """ contingency result without an opf: the base case for a no-op, for an islanding outage the island buses are dead and
+        the lost generation less the lost load is picked up by the remaining participating generators, the rest by the slack """
+    c_start = time.process_time()
+    c_wall = time.time()
+    res_bus = base['res_bus'].copy()
+    res_gen = base['res_gen'].copy()
+    res_ext_grid = base['res_ext_grid'].copy()
+    res_shunt = base['res_shunt'].copy()
+    if kind == 'island':
+        net = case['net']
+        gens = net.gen
+        busrows = numpy.zeros(len(res_bus), dtype=bool)
+        busrows[:len(island)] = island          # bus rows follow raw bus order, ext grid bus last
+        islandbuses = net.bus.index[busrows]
+        lost = gens.index.isin([x for element, x in get_task_elements(task) if element == 'gen']) | gens['bus'].isin(islandbuses).values
+        p_kw = res_gen['p_kw'].values.copy()
+        delta = p_kw[lost].sum() + net.res_load['p_kw'].values[net.load['bus'].isin(islandbuses).values].sum()
+        factors = get_participation_factors(case) * gens['in_service'].values * ~lost
+        p_kw[lost] = 0.0
+        p_kw, unshared = get_participation_dispatch(p_kw, delta, factors, gens['min_p_kw'].values, gens['max_p_kw'].values)
+        res_ext_grid.iloc[0, 0] += unshared
+        res_gen['p_kw'] = p_kw
+        res_gen.loc[lost, 'q_kvar'] = 0.0
+        res_bus.loc[busrows, ['vm_pu', 'va_degree']] = 0.0
+        res_shunt.loc[net.shunt['bus'].isin(islandbuses).values, 'q_kvar'] = 0.0
+    return {'label': task[0], 'res_bus': res_bus, 'res_gen': res_gen, 'res_ext_grid': res_ext_grid, 'res_shunt': res_shunt,
+            'start': None, 'path': kind,
+            'severity': None, 'cpu_time': time.process_time() - c_start, 'wall_time': time.time() - c_wall, 'peak_rss_mb': get_peak_rss_mb()}
+
+
+def run_topology_contingencies(tasks, classes, results, fast):
+    """ generator yielding results in task order, fast path results for no-op and islanding tasks, the others from results """
+    for task, (kind, island) in zip(tasks, classes):
+        yield next(results) if kind == 'normal' else fast(task, kind, island)
+    return
+
+
+# -- DC SENSITIVITY SCREENING OF BRANCH OUTAGES -------------------------------
+def get_dc_model(net, busdata, branchdata, xfmr2wdata, swingbus):
+    """ dc model of the solved base case: factored reduced susceptance matrix, branch ends, base flows and ratings """
+    import pandas
+    import scipy.sparse
+    import scipy.sparse.linalg
+    # -- BRANCHES ARE LINES THEN 2W TRANSFORMERS, IN NETWORK INDEX ORDER ------
+    nline = len(branchdata)
+    busindex = pandas.Index(busdata['I'])
+    frompos = busindex.get_indexer(numpy.append(branchdata['I'], xfmr2wdata['I']))
+    topos = busindex.get_indexer(numpy.append(branchdata['J'], xfmr2wdata['J']))
+    x_pu = numpy.append(branchdata['X'], xfmr2wdata['X1_2'])
+    x_pu = numpy.where(abs(x_pu) < 1e-6, 1e-6, x_pu)
+    b_pu = 1.0 / x_pu
+    status = numpy.append(net.line['in_service'].values[:nline], net.trafo['in_service'].values)
+    # -- BASE CASE MW FLOWS IN RAW FROM->TO DIRECTION AND MVA RATINGS ---------
+    xfmrflow = numpy.where(net.trafo['hv_bus'].values == xfmr2wdata['I'], net.res_trafo['p_hv_kw'].values, net.res_trafo['p_lv_kw'].values)
+    flow = 1e-3 * numpy.append(net.res_line['p_from_kw'].values[:nline], xfmrflow) * status
+    linekv = net.bus['vn_kv'].loc[net.line['from_bus'].values[:nline]].values
+    rating = numpy.append(math.sqrt(3) * net.line['max_i_ka'].values[:nline] * linekv, 1e-3 * net.trafo['sn_kva'].values)
+    # -- REDUCED SUSCEPTANCE MATRIX WITH THE SWING BUS AS ANGLE REFERENCE -----
+    nbus = len(busindex)
+    nbranch = len(b_pu)
+    incidence = scipy.sparse.csr_matrix((numpy.append(numpy.ones(nbranch), -numpy.ones(nbranch)),
+                                         (numpy.append(numpy.arange(nbranch), numpy.arange(nbranch)), numpy.append(frompos, topos))),
+                                        shape=(nbranch, nbus))
+    bbus = (incidence.T * scipy.sparse.diags(b_pu * status) * incidence).tolil()
+    isolated = numpy.flatnonzero(bbus.diagonal() == 0.0)
+    bbus[isolated, isolated] = 1.0                          # keep buses without in service branches out of the way
+    slack = busindex.get_loc(swingbus)
+    keep = numpy.flatnonzero(numpy.arange(nbus) != slack)
+    lu = scipy.sparse.linalg.splu(bbus.tocsc()[keep, :][:, keep])
+    return {'lu': lu, 'keep': keep, 'nbus': nbus, 'nline': nline, 'frompos': frompos, 'topos': topos, 'b_pu': b_pu,
+            'status': status, 'flow': flow, 'rating': rating, 'mva_base': 1e-3 * net.sn_kva,
+            'res_bus': net.res_bus[['vm_pu', 'va_degree']].copy(), 'res_gen': net.res_gen[['p_kw', 'q_kvar']].copy(),
+            'res_ext_grid': net.res_ext_grid[['p_kw', 'q_kvar']].copy(), 'res_shunt': net.res_shunt[['q_kvar']].copy()}
+
+
+def get_dc_angles(model, branches):
+    """ bus angle response (rad per pu) to a unit transfer across each branch, one column per branch """
+    injection = numpy.zeros((model['nbus'], len(branches)))
+    columns = numpy.arange(len(branches))
+    injection[model['frompos'][branches], columns] += 1.0
+    injection[model['topos'][branches], columns] -= 1.0
+    angles = numpy.zeros((model['nbus'], len(branches)))
+    angles[model['keep'], :] = model['lu'].solve(injection[model['keep'], :])
+    return angles
+
+
+def get_task_branch(model, task):
+    """ position of a contingency's outaged branch in the dc model, None for generator outages """
+    conlabel, element, elementidx = task
+    if element == 'line':
+        return elementidx
+    if element == 'trafo':
+        return model['nline'] + elementidx
+    return None
+
+
+def screen_contingencies(model, tasks, chunksize=256):
+    """ estimate worst post-outage branch loading for all branch outages with ptdf/lodf, None for other tasks """
+    severities = [None] * len(tasks)
+    positions = [(j, get_task_branch(model, task)) for j, task in enumerate(tasks)]
+    positions = [(j, k) for j, k in positions if k is not None]
+    status = model['status']
+    flow = model['flow']
+    monitored = status & (model['rating'] > 0.0)
+    for i in range(0, len(positions), chunksize):
+        taskpos, branches = [numpy.array(x) for x in zip(*positions[i:i + chunksize])]
+        columns = numpy.arange(len(branches))
+        angles = get_dc_angles(model, branches)
+        ptdf = (model['b_pu'] * status)[:, None] * (angles[model['frompos'], :] - angles[model['topos'], :])
+        denom = 1.0 - ptdf[branches, columns]
+        islanding = abs(denom) < 1e-6
+        denom[islanding] = 1.0
+        lodf = ptdf / denom
+        lodf[branches, columns] = -1.0
+        postflow = flow[:, None] + lodf * flow[branches]
+        loading = numpy.where(monitored[:, None], abs(postflow) / numpy.where(monitored, model['rating'], 1.0)[:, None], 0.0)
+        severity = loading.max(axis=0)
+        severity[islanding & status[branches]] = numpy.inf
+        for j, value in zip(taskpos, severity):
+            severities[j] = float(value)
+    return severities
+
+
+def get_dc_shift(model, branches, nrows):
+    """ bus angle change (degrees, nrows result rows) when the given in service branches open and their base flows move
+        onto the rest of the dc model, None when the outage islands the dc model """
+    angles = get_dc_angles(model, branches)
+    ptdf = model['b_pu'][branches][:, None] * (angles[model['frompos'][branches], :] - angles[model['topos'][branches], :])
+    remaining = numpy.eye(len(branches)) - ptdf
+    if numpy.linalg.cond(remaining) > 1e12:
+        return None
+    transfer = numpy.linalg.solve(remaining, model['flow'][branches] / model['mva_base'])
+    shift = numpy.zeros(nrows)
+    shift[:model['nbus']] = numpy.degrees(angles.dot(transfer))     # bus rows follow raw bus order, ext grid bus last
+    return shift
+
+
+def solve_contingency_dc(model, task):
+    """ approximate contingency result: base case dispatch and voltages, dc angle shift for the branch outage """
+    c_start = time.process_time()
+    c_wall = time.time()
+    res_bus = model['res_bus'].copy()
+    k = get_task_branch(model, task)
+    if model['status'][k]:
+        shift = get_dc_shift(model, numpy.array([k]), len(res_bus))
+        if shift is not None:
+            res_bus['va_degree'] += shift
+    return {'label': task[0], 'res_bus': res_bus, 'res_gen': model['res_gen'].copy(), 'res_ext_grid': model['res_ext_grid'].copy(),
+            'res_shunt': model['res_shunt'].copy(), 'start': None, 'path': 'dc', 'cpu_time': time.process_time() - c_start,
+            'wall_time': time.time() - c_wall, 'peak_rss_mb': get_peak_rss_mb()}
+
+
+def run_screened_contingencies(base_net, tasks, options, model, severities, threshold):
+    """ generator yielding results in task order, ac opf above the severity threshold and dc estimates below it """
+    dc_path = [x is not None and x < threshold for x in severities]
+    ac_results = run_contingencies(base_net, [x for x, dc in zip(tasks, dc_path) if not dc], options)
+    for task, dc, severity in zip(tasks, dc_path, severities):
+        c_result = solve_contingency_dc(model, task) if dc else next(ac_results)
+        c_result['severity'] = severity
+        yield c_result
+    return
+
+
+# -- DEADLINE SCHEDULING: AC OPFS BY SEVERITY PER EXPECTED SOLVE TIME, FALLBACK RESULTS FOR WHAT DOES NOT FIT --
+DEADLINE_RESERVE = 1.0              # seconds kept free before the deadline for fallbacks and writing
+DEADLINE_RESERVE_PER_CON = 0.01     # seconds per contingency, until the write time is learned from a previous run
+
+
+def load_contingency_costs(fname):
+    """ learned ac solve wall time per contingency label and mean write time per contingency, empty without history """
+    costs = {'solve': {}, 'write': None}
+    if fname is not None and os.path.exists(fname):
+        with open(fname, 'r') as fobject:
+            costs.update(json.load(fobject))
+    return costs
+
+
+def save_contingency_costs(fname, costs, records):
+    """ fold the contingency metrics records of this run into the learned costs, averaged with the previous runs """
+    solve = costs['solve']
+    for record in records:
+        if record['path'] in ('ac', 'pf'):
+            previous = solve.get(record['label'])
+            solve[record['label']] = record['wall_time'] if previous is None else 0.5 * (previous + record['wall_time'])
+    if records:
+        write_time = sum([x['write_time'] for x in records]) / len(records)
+        costs['write'] = write_time if costs['write'] is None else 0.5 * (costs['write'] + write_time)
+    with open(fname, 'w') as fobject:
+        json.dump(costs, fobject, indent=1, sort_keys=True)
+    return
+
+
+def get_contingency_priorities(net, tasks, severities, base_opf_time, costs):
+    """ estimated severity and ac solve time per task: dc post-outage loading for branches, lost share of generation plus one
+        for generators, two for multi-element outages, solve times from the learned costs, else their median, else the base case opf time """
+    base_p = net.res_gen['p_kw']
+    total_p = base_p.values.sum() + net.res_ext_grid['p_kw'].values.sum()
+    priorities = []
+    for task, severity in zip(tasks, severities):
+        if task[1] == 'gen':
+            severity = 1.0 + base_p.at[task[2]] / total_p
+        elif task[1] == 'multi':
+            severity = 2.0
+        priorities.append(0.0 if severity is None else severity)
+    known = sorted(costs['solve'].values())
+    default = known[len(known) // 2] if known else base_opf_time
+    seconds = [max(1e-3, costs['solve'].get(x[0], default)) for x in tasks]
+    return [priorities, seconds]
+
+
+def get_fallback_contingency(case, base, model, task):
+    """ cheap contingency result from the base case: dc angle shift for the opened branches, the generation of outaged
+        units is picked up by the participating generators in proportion to their factors within their limits, the rest by
+        the slack; a multi-element outage gets both """
+    conlabel, element, elementidx = task
+    if element in ('line', 'trafo'):
+        return solve_contingency_dc(model, task)
+    c_start = time.process_time()
+    c_wall = time.time()
+    res_bus = base['res_bus'].copy()
+    res_gen = base['res_gen'].copy()
+    res_ext_grid = base['res_ext_grid'].copy()
+    c_result = {'label': conlabel}
+    elements = get_task_elements(task)
+    branches = numpy.array([get_task_branch(model, (conlabel, x, idx)) for x, idx in elements if x != 'gen'], dtype=numpy.int64)
+    branches = branches[model['status'][branches]]
+    if len(branches):
+        shift = get_dc_shift(model, branches, len(res_bus))
+        if shift is None:
+            c_result['message'] = 'outage islands the dc model, bus angles are not shifted'
+        else:
+            res_bus['va_degree'] += shift
+    units = [idx for x, idx in elements if x == 'gen']
+    if units:
+        gens = case['net'].gen
+        k = gens.index.get_indexer(units)
+        p_kw = res_gen['p_kw'].values.copy()
+        lost = p_kw[k].sum()
+        factors = get_participation_factors(case) * gens['in_service'].values
+        factors[k] = 0.0
+        p_kw[k] = 0.0
+        p_kw, unshared = get_participation_dispatch(p_kw, lost, factors, gens['min_p_kw'].values, gens['max_p_kw'].values)
+        res_ext_grid.iloc[0, 0] += unshared
+        res_gen['p_kw'] = p_kw
+        res_gen.iloc[k, 1] = 0.0
+    c_result.update({'res_bus': res_bus, 'res_gen': res_gen, 'res_ext_grid': res_ext_grid, 'res_shunt': base['res_shunt'].copy(),
+                     'start': None, 'path': 'fallback', 'cpu_time': time.process_time() - c_start, 'wall_time': time.time() - c_wall,
+                     'peak_rss_mb': get_peak_rss_mb()})
+    return c_result
+
+
+def solve_indexed_contingency(j, task):
+    return [j, solve_contingency(worker_session, task, worker_options)]
+
+
+def get_next_deadline_task(order, seconds, deadline):
+    """ first task in priority order whose expected solve time still fits before the deadline, None when none fits """
+    now = time.time()
+    return next((k for k in order if now + seconds[k] <= deadline), None)
+
+
+def solve_deadline_serial(base_net, tasks, options, order, seconds, deadline):
+    """ ac opfs of the ordered tasks in this process while they fit before the deadline, results by task position """
+    results = {}
+    # -- THE DEADLINE IS CHECKED BETWEEN TASKS, AN OPF RUNNING AT THE DEADLINE IS NOT ABANDONED IN PROCESS --
+    session = create_outage_session(base_net)
+    while order:
+        j = get_next_deadline_task(order, seconds, deadline)
+        if j is None:
+            break
+        order.remove(j)
+        try:
+            results[j] = solve_contingency(session, tasks[j], options)
+        except Exception as error:
+            print('CONTINGENCY FAILED, USING FALLBACK .................................', tasks[j][0], type(error).__name__)
+    return results
+
+
+def solve_deadline_pool(base_net, tasks, options, order, seconds, deadline):
+    """ ac opfs of the ordered tasks in worker processes while they fit before the deadline, results by task position """
+    results = {}
+    done = queue.Queue()
+    # -- AN OPF STILL RUNNING AT THE DEADLINE IS ABANDONED WITH ITS WORKER --
+    nworkers = min(options['workers'], len(order))
+    pool = multiprocessing.Pool(nworkers, initializer=init_contingency_worker, initargs=(base_net, options))
+    running = 0
+    try:
+        while order or running:
+            while running < nworkers and order:
+                j = get_next_deadline_task(order, seconds, deadline)
+                if j is None:
+                    order = []
+                    break
+                order.remove(j)
+                pool.apply_async(solve_indexed_contingency, (j, tasks[j]), callback=done.put, error_callback=lambda e, j=j: done.put([j, e]))
+                running += 1
+            if not running:
+                break
+            try:
+                j, c_result = done.get(timeout=max(0.0, deadline - time.time()))
+            except queue.Empty:
+                print('DEADLINE REACHED, ABANDONED RUNNING CONTINGENCIES .................', running)
+                break
+            running -= 1
+            if isinstance(c_result, Exception):
+                print('CONTINGENCY FAILED, USING FALLBACK .................................', tasks[j][0], type(c_result).__name__)
+            else:
+                results[j] = c_result
+    finally:
+        pool.terminate()
+        pool.join()
+    return results
+
+
+def run_deadline_contingencies(base_net, tasks, options, ac, priorities, seconds, deadline, fallback):
+    """ generator yielding results in task order: ac opfs in order of priority per expected second while they fit before
+        the deadline, fallback results for the tasks not solved in time, tasks without ac get their fallback directly """
+    order = sorted([j for j in range(len(tasks)) if ac[j]], key=lambda j: -priorities[j] / seconds[j])
+    # -- IN PROCESS FOR ONE WORKER AND INSIDE DAEMONIC PROCESSES (BATCH WORKERS), WHICH CANNOT START A POOL --
+    if not order:
+        results = {}
+    elif options['workers'] <= 1 or multiprocessing.current_process().daemon:
+        results = solve_deadline_serial(base_net, tasks, options, order, seconds, deadline)
+    else:
+        results = solve_deadline_pool(base_net, tasks, options, order, seconds, deadline)
+    for j, task in enumerate(tasks):
+        if j in results:
+            c_result = results.pop(j)
+        else:
+            c_result = fallback(task)
+            if ac[j]:
+                c_result['path'] = 'fallback'
+        yield c_result
+    return
+
+
+def solve_case(case, options=None, sink=None, metrics=None):
+    """ solve the base case and contingency opfs of a loaded case, pass results to the sink (closed when done) and return them """
+    import pandapower as pp
+    options = dict(SOLVE_OPTIONS, **(options or {}))
+    metrics = metrics or RunMetrics()
+    net = case['net']
+    start_time = time.time()
+    print('--------------------------------------------------------------------')
+    print('------------------------ OPTIMAL POWER FLOW ------------------------')
+    print('--------------------------------------------------------------------')
+
+    # -- SOLVE BASECASE OPTIMAL POWER FLOW, DC FIRST IN THE DC AND TIERED SOLVE MODES --
+    if options['solve_mode'] != 'ac' and options['contingency_mode'] != 'opf':
+        raise ValueError('DC AND TIERED SOLVE MODES NEED THE OPF CONTINGENCY MODE')
+    print('SOLVING BASECASE OPTIMAL POWER FLOW ................................')
+    metrics.start('base_opf')
+    native_model = None
+    if options['opf_engine'] == 'native':
+        print('AC OPF ENGINE ......................................................', options['opf_engine'])
+        native_model = get_native_opf_model(case)
+    base_fidelity = 'ac'
+    if options['solve_mode'] != 'ac':
+        solve_dc_opf(net)
+        base_fidelity = 'dc'
+        dc_critical = get_dc_criticality(net, 0)
+        if options['solve_mode'] == 'tiered' and dc_critical is not None:
+            print('BASECASE DC OPF RESULT IS CRITICAL, SOLVING AC OPF .................', dc_critical)
+            base_fidelity = 'ac'
+    if base_fidelity == 'ac' and native_model is not None:
+        native_output = run_native_opf(net, native_model)
+        if not native_output['success']:
+            raise pp.OPFNotConverged('Native optimal power flow did not converge: ' + native_output['message'])
+    elif base_fidelity == 'ac':
+        pp.runopp(net,  init='flat', calculate_voltage_angles=True, verbose=False, suppress_warnings=True)
+    base_opf_time = time.time() - start_time
+
+    # -- BASECASE BUS AND GENERATOR RESULTS -----------------------------------
+    metrics.start('base_write')
+    result_maps = get_result_maps(net, case['fxidxdict'], case['swidxdict'], case['ext_grid_bus'], case['swidxs'], case['swingbus'])
+    genrows, base_pgens = get_gen_report(net.res_gen, case['gids'], case['genbuses'], net.res_ext_grid, result_maps)
+    base = {'objective': float(net.res_cost),
+            'fidelity': base_fidelity,
+            'res_bus': net.res_bus[['vm_pu', 'va_degree']].copy(),
+            'res_gen': net.res_gen[['p_kw', 'q_kvar']].copy(),
+            'res_ext_grid': net.res_ext_grid[['p_kw', 'q_kvar']].copy(),
+            'res_shunt': net.res_shunt[['q_kvar']].copy(),
+            'buses': get_bus_report(net.res_bus, result_maps, net.res_gen, net.res_shunt),
+            'generators': genrows,
+            'pgenerators': base_pgens}
+    if sink is not None:
+        sink.write_base(base)
+    metrics.stop()
+    print('DONE WITH BASECASE OPTIMAL POWER FLOW...............................', round(time.time() - start_time, 1))
+    if options['solve_mode'] != 'ac':
+        print('BASECASE RESULT FIDELITY ...........................................', base_fidelity)
+
+    # -- CONTINGENCY OPTIMAL POWER FLOWS --------------------------------------
+    start_time = time.time()
+    screen_threshold = options['screen_threshold']
+    contingency_options = {'workers': options['workers'], 'warm_start': options['warm_start'], 'mode': options['contingency_mode'],
+                           'low_rank': options['low_rank'], 'solve_mode': options['solve_mode'], 'native_model': native_model}
+    if options['solve_mode'] != 'ac':
+        print('CONTINGENCY SOLVE MODE .............................................', options['solve_mode'])
+    if options['contingency_mode'] == 'governor':
+        contingency_options['pfactors'] = get_participation_factors(case)
+        low_rank_problem = get_low_rank_problem() if options['low_rank'] else None
+        if low_rank_problem is not None:
+            print('LOW RANK UPDATES UNAVAILABLE, BRANCH OUTAGES BY FULL POWER FLOWS ...', low_rank_problem)
+            contingency_options['low_rank'] = False
+        elif options['low_rank']:
+            print('BRANCH OUTAGES BY LOW RANK UPDATES OF THE BASE CASE JACOBIAN .......')
+        print('GOVERNOR RESPONSE CONTINGENCY POWER FLOWS, PARTICIPATING UNITS .....', int((contingency_options['pfactors'] != 0.0).sum()))
+    contingency_tasks = get_contingency_tasks(case['contable'], case['genidxdict'], case['linedict'], case['xfmrdict'])
+    if contingency_tasks:
+        print('RUNNING OPF CONTINGENCIES ..........................................', len(contingency_tasks))
+        if options['workers'] > 1:
+            print('CONTINGENCY WORKER PROCESSES .......................................', options['workers'])
+
+    # -- TOPOLOGY PRE-ANALYSIS, NO-OP AND ISLANDING CONTINGENCIES SKIP THE OPF --
+    rawdata = case['rawdata']
+    all_tasks = contingency_tasks
+    if options['topology']:
+        metrics.start('topology')
+        topology = get_topology(net, rawdata['bus'], rawdata['branch'], rawdata['xfmr2w'], case['swingbus'])
+        topology_classes = classify_contingencies(topology, net, contingency_tasks)
+        metrics.stop()
+        print('BRIDGES / ARTICULATION POINTS ......................................', int((topology['bridgebus'] >= 0).sum()), int(topology['articulation'].sum()))
+        print('NO-OP / ISLANDING CONTINGENCIES ....................................', sum(1 for x in topology_classes if x[0] == 'noop'),
+              sum(1 for x in topology_classes if x[0] == 'island'))
+        print('NO-OP AND ISLANDING CONTINGENCIES BY TOPOLOGY FAST PATHS ...........')
+        contingency_tasks = [x for x, y in zip(all_tasks, topology_classes) if y[0] == 'normal']
+
+    # -- SCREEN BRANCH OUTAGES WITH DC SENSITIVITIES --------------------------
+    deadline = options['deadline']
+    if screen_threshold is not None or deadline is not None:
+        metrics.start('dc_screening')
+        dc_model = get_dc_model(net, rawdata['bus'], rawdata['branch'], rawdata['xfmr2w'], case['swingbus'])
+        severities = screen_contingencies(dc_model, contingency_tasks)
+        metrics.stop()
+    if screen_threshold is not None:
+        print('SCREENING BRANCH OUTAGES WITH DC PTDF/LODF .........................', screen_threshold)
+        print('BRANCH OUTAGES BELOW SCREENING THRESHOLD (DC PATH) .................', sum(1 for x in severities if x is not None and x < screen_threshold))
+
+    # -- SCHEDULE AC OPFS AGAINST THE DEADLINE, FALLBACK RESULTS FOR THE REST --
+    if deadline is not None:
+        costs = load_contingency_costs(options['cost_history'])
+        priorities, seconds = get_contingency_priorities(net, contingency_tasks, severities, base_opf_time, costs)
+        ac = [screen_threshold is None or x is None or x >= screen_threshold for x in severities]
+        reserve = DEADLINE_RESERVE + len(contingency_tasks) * (costs['write'] or DEADLINE_RESERVE_PER_CON)
+        print('CONTINGENCY TIME LEFT BEFORE DEADLINE ..............................', round(deadline - reserve - time.time(), 1))
+        fallback = lambda task: get_fallback_contingency(case, base, dc_model, task)
+        contingency_results = run_deadline_contingencies(net, contingency_tasks, dict(contingency_options, workers=max(1, options['workers'])),
+                                                         ac, priorities, seconds, deadline - reserve, fallback)
+        contingency_results = (dict(x, severity=y) for x, y in zip(contingency_results, severities))
+    elif screen_threshold is not None:
+        contingency_results = run_screened_contingencies(net, contingency_tasks, contingency_options, dc_model, severities, screen_threshold)
+    else:
+        contingency_results = run_contingencies(net, contingency_tasks, contingency_options)
+    if options['topology']:
+        fast = lambda task, kind, island: solve_topology_contingency(case, base, task, kind, island)
+        contingency_results = run_topology_contingencies(all_tasks, topology_classes, contingency_results, fast)
+
+    contingencies = []
+    solve_time = 0.0
+    start_counts = {'warm': 0, 'flat': 0}
+    status_counts = {'converged': 0, 'not_converged': 0, 'failed': 0, 'not_solved': 0}
+    path_counts = {'ac': 0, 'pf': 0, 'dc': 0, 'fallback': 0, 'noop': 0, 'island': 0, 'dcopf': 0}
+    metrics.start('contingencies')
+    for c_result in contingency_results:
+        solve_time += c_result['cpu_time']
+        path_counts[c_result['path']] += 1
+        status_counts[c_result.get('status', 'not_solved')] += 1
+        # -- FIDELITY OF THE WRITTEN RESULT, A NO-OP REPORTS THE BASE CASE ------
+        # -- A FAILED SOLVE HAS NO RESULT, IT IS LOGGED AND LEFT OUT OF SOLUTION2 --
+        if c_result.get('status') in ('not_converged', 'failed'):
+            c_result['fidelity'] = 'none'
+            print('CONTINGENCY NOT SOLVED, LEFT OUT OF SOLUTION2 ......................', c_result['label'], c_result['status'])
+        elif c_result['path'] == 'noop':
+            c_result['fidelity'] = base_fidelity
+        else:
+            c_result['fidelity'] = {'ac': 'ac', 'pf': 'ac', 'dcopf': 'dc'}.get(c_result['path'], 'estimate')
+        if c_result['path'] == 'ac':
+            start_counts[c_result['start']] += 1
+        write_start = time.time()
+        if c_result['fidelity'] != 'none':
+            c_result['buses'] = get_bus_report(c_result['res_bus'], result_maps, c_result['res_gen'], c_result['res_shunt'])
+            c_result['generators'], c_gens = get_gen_report(c_result['res_gen'], case['gids'], case['genbuses'], c_result['res_ext_grid'], result_maps)
+            c_result['delta_p'] = c_gens - base_pgens
+        if sink is not None:
+            sink.write_contingency(c_result)
+        metrics.add_contingency(c_result, time.time() - write_start)
+        if options['keep_results']:
+            contingencies.append(c_result)
+
+    if sink is not None:
+        sink.close()
+    metrics.stop()
+    wall_time = time.time() - start_time
+    print('DONE WITH OPF CONTINGENCIES ........................................', round(wall_time, 1))
+    if all_tasks and wall_time > 0.0:
+        print('CONTINGENCY PARALLELISM (SOLVE CPU TIME / WALL TIME) ...............', round(solve_time / wall_time, 2))
+    if options['warm_start']:
+        print('CONTINGENCIES SOLVED FROM WARM / FLAT START ........................', start_counts['warm'], start_counts['flat'])
+    if options['solve_mode'] != 'ac':
+        print('CONTINGENCIES WITH DC OPF / AC OPF RESULTS .........................', path_counts['dcopf'], path_counts['ac'])
+    if status_counts['not_converged'] or status_counts['failed']:
+        print('NOT CONVERGED / FAILED, LEFT OUT OF SOLUTION2 ......................', status_counts['not_converged'], status_counts['failed'])
+    if deadline is not None:
+        print('CONTINGENCIES SOLVED BEFORE DEADLINE / FALLBACK ....................', path_counts['ac'] + path_counts['pf'], path_counts['fallback'])
+        if options['cost_history'] is not None:
+            save_contingency_costs(options['cost_history'], costs, metrics.contingencies)
+    return {'base': base, 'contingencies': contingencies, 'solve_time': solve_time, 'wall_time': wall_time, 'start_counts': start_counts,
+            'path_counts': path_counts, 'status_counts': status_counts}
+
+
+# -- SOLVE ONE CASE FROM ITS INPUT FILES, SOLUTIONS AND METRICS GO INTO OUTDIR --
+def solve_case_files(raw_fname, rop_fname, inl_fname, con_fname, outdir, options=None, cache_dir=None, cache_size=1024.0, listener=None):
+    """ load, solve and write one case into outdir, metrics are written also when a stage fails, return the result file names """
+    outfname1 = os.path.join(outdir, 'solution1.txt')
+    outfname2 = os.path.join(outdir, 'solution2.txt')
+    metricsfname = os.path.join(outdir, 'solution_metrics')
+    options = dict(options or {}, keep_results=False)
+    metrics = RunMetrics(listener)
+    start_time = time.time()
+    # -- A TIME BUDGET COUNTS FROM HERE, CONTINGENCY SOLVE TIMES ARE LEARNED NEXT TO THE SOLUTIONS --
+    if options.get('time_budget') is not None:
+        options['deadline'] = start_time + options['time_budget']
+        options.setdefault('cost_history', os.path.join(outdir, 'contingency_costs.json'))
+    options.pop('time_budget', None)
+    try:
+        case = load_case(raw_fname, rop_fname, inl_fname, con_fname, cache_dir, cache_size, metrics)
+        solution_files = SolutionFiles(outfname1, outfname2, False, options.get('screen_threshold') is not None)
+        solve_case(case, options, solution_files, metrics)
+    finally:
+        metrics.write(metricsfname)
+    return {'solution1': outfname1, 'solution2': outfname2, 'metrics': metricsfname + '.json',
+            'contingencies': len(metrics.contingencies), 'wall_time': time.time() - start_time}
+
+
+# -- SOLVER DAEMON: PRE-WARMED WORKER PROCESSES BEHIND A LOCAL UNIX SOCKET -----
+# -- ONE JSON MESSAGE PER LINE, A CLIENT SENDS ONE REQUEST AND READS EVENTS BACK UNTIL 'done' OR 'error' --
+DAEMON_SOCKET = '/tmp/mypython1_solver.sock'
+DAEMON_FINAL_EVENTS = ('done', 'error')
+DAEMON_STARTUP_TIMEOUT = 300.0      # seconds for every daemon worker to report its warm up
+DAEMON_PROGRESS_TIMEOUT = 3600.0    # seconds without a progress event after which a client stops waiting for its case
+daemon_events = None    # worker side end of the daemon event queue, set by init_daemon_worker
+warm_up_error = None    # traceback of a failed warm up in this worker process, set by init_warm_worker
+
+
+def warm_up_solver():
+    """ import pandapower and solve a two bus power flow and opf, so the first submitted case pays no import or setup cost """
+    import pandapower as pp
+    net = pp.create_empty_network()
+    bus1 = pp.create_bus(net, vn_kv=100.0, min_vm_pu=0.9, max_vm_pu=1.1)
+    bus2 = pp.create_bus(net, vn_kv=100.0, min_vm_pu=0.9, max_vm_pu=1.1)
+    pp.create_ext_grid(net, bus1, min_p_kw=-1e6, max_p_kw=0.0, min_q_kvar=-1e6, max_q_kvar=1e6)
+    pp.create_line_from_parameters(net, bus1, bus2, 1.0, 0.1, 0.4, 0.0, 1.0, max_loading_percent=100.0)
+    pp.create_load(net, bus2, p_kw=1000.0, q_kvar=200.0)
+    pp.create_gen(net, bus2, p_kw=-500.0, min_p_kw=-2000.0, max_p_kw=0.0, min_q_kvar=-1000.0, max_q_kvar=1000.0, controllable=True)
+    pp.create_piecewise_linear_cost(net, 0, 'gen', numpy.array([[-2000.0, 2000.0], [0.0, 0.0]]))
+    pp.runpp(net)
+    pp.runopp(net, init='flat', calculate_voltage_angles=True, verbose=False, suppress_warnings=True)
+    return
+
+
+def init_warm_worker():
+    """ pool initializer, warm up pandapower once per worker process and keep the traceback if that fails: a raising
+        initializer kills the worker, the pool starts a new one and its tasks never run """
+    global warm_up_error
+    try:
+        warm_up_solver()
+    except Exception:
+        warm_up_error = traceback.format_exc()
+    return
+
+
+def init_daemon_worker(events):
+    """ daemon pool initializer, keep the event queue, warm up pandapower once per worker process and report the outcome """
+    global daemon_events
+    daemon_events = events
+    init_warm_worker()
+    if warm_up_error is None:
+        events.put({'event': 'ready', 'pid': os.getpid()})
+    else:
+        events.put({'event': 'startup_error', 'pid': os.getpid(), 'error': 'WORKER WARM UP FAILED', 'traceback': warm_up_error})
+    return
+
+
+def run_daemon_case(case_id, request):
+    """ daemon pool task: solve one submitted case, every progress event is tagged with the case id """
+    def send(event):
+        event['case'] = case_id
+        daemon_events.put(event)
+    if warm_up_error is not None:
+        send({'event': 'error', 'error': 'WORKER WARM UP FAILED', 'traceback': warm_up_error})
+        return
+    send({'event': 'started', 'pid': os.getpid()})
+    try:
+        # -- THE DAEMON POOL IS THE PARALLELISM, DAEMONIC POOL WORKERS CANNOT START CONTINGENCY WORKERS OF THEIR OWN --
+        options = dict(request.get('options') or {}, workers=1)
+        result = solve_case_files(request['raw'], request['rop'], request['inl'], request['con'], request['outdir'], options,
+                                  request.get('cache_dir'), request.get('cache_size', 1024.0), send)
+    except Exception as e:
+        send({'event': 'error', 'error': '%s: %s' % (type(e).__name__, e)})
+        return
+    result['event'] = 'done'
+    send(result)
+    return
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    """ one client connection, served by SolverDaemon.handle """
+    def handle(self):
+        self.server.solver_daemon.handle(self.rfile, self.wfile)
+
+
+class SolverDaemon(object):
+    """ accepts case submissions on a unix socket and solves them in a pool of pre-warmed worker processes """
+    def __init__(self, socket_fname, nworkers, cache_dir=None, cache_size=1024.0, progress_timeout=DAEMON_PROGRESS_TIMEOUT):
+        self.socket_fname = socket_fname
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+        self.progress_timeout = progress_timeout
+        self.events = multiprocessing.Queue()
+        self.pool = multiprocessing.Pool(nworkers, initializer=init_daemon_worker, initargs=(self.events,))
+        self.listeners = {}     # case id -> queue.Queue of events for the connected client
+        self.lock = threading.Lock()
+        self.ncases = 0
+        self.server = None
+        try:
+            self.wait_ready(nworkers)
+        except BaseException:
+            self.pool.terminate()
+            self.pool.join()
+            raise
+
+    def wait_ready(self, nworkers):
+        """ wait for the startup event of every worker, raise with the traceback of a worker that could not warm up """
+        deadline = time.time() + DAEMON_STARTUP_TIMEOUT
+        for j in range(nworkers):
+            try:
+                event = self.events.get(timeout=max(0.0, deadline - time.time()))
+            except queue.Empty:
+                raise RuntimeError('SOLVER DAEMON WORKERS NOT READY AFTER %d SECONDS' % DAEMON_STARTUP_TIMEOUT)
+            if event['event'] == 'startup_error':
+                raise RuntimeError('SOLVER DAEMON ' + event['error'] + '\n' + event['traceback'])
+        return
+
+    def dispatch(self):
+        """ background thread: route worker events to the client waiting for the case """
+        while True:
+            event = self.events.get()
+            if event is None:
+                return
+            # -- A WORKER REPLACED AFTER A CRASH REPORTS ITS STARTUP TOO, ITS CASES GET THE WARM UP ERROR --
+            if event['event'] == 'startup_error':
+                print('SOLVER DAEMON WORKER WARM UP FAILED ................................', event['pid'])
+                continue
+            with self.lock:
+                listener = self.listeners.get(event.get('case'))
+            if listener is not None:
+                listener.put(event)
+
+    def submit(self, request):
+        with self.lock:
+            self.ncases += 1
+            case_id = self.ncases
+            listener = queue.Queue()
+            self.listeners[case_id] = listener
+        request = dict(request)
+        request.setdefault('cache_dir', self.cache_dir)
+        request.setdefault('cache_size', self.cache_size)
+        self.pool.apply_async(run_daemon_case, (case_id, request))
+        return [case_id, listener]
+
+    def handle(self, rfile, wfile):
+        """ read one request line, answer ping and shutdown directly, stream the events of a submitted case """
+        def send(event):
+            wfile.write((json.dumps(event) + '\n').encode())
+            wfile.flush()
+        try:
+            request = json.loads(rfile.readline().decode())
+        except ValueError as e:
+            send({'event': 'error', 'error': 'BAD REQUEST: %s' % e})
+            return
+        command = request.get('command', 'solve')
+        if command == 'ping':
+            send({'event': 'done', 'pid': os.getpid(), 'cases': self.ncases})
+            return
+        if command == 'shutdown':
+            send({'event': 'done'})
+            threading.Thread(target=self.server.shutdown).start()
+            return
+        missing = [x for x in ['con', 'inl', 'raw', 'rop', 'outdir'] if x not in request]
+        if command != 'solve' or missing:
+            send({'event': 'error', 'error': 'BAD REQUEST: command %s, missing %s' % (command, ', '.join(missing))})
+            return
+        case_id, listener = self.submit(request)
+        print('CASE SUBMITTED .....................................................', case_id, request['outdir'])
+        try:
+            send({'event': 'queued', 'case': case_id})
+            while True:
+                try:
+                    event = listener.get(timeout=self.progress_timeout)
+                except queue.Empty:
+                    event = {'event': 'error', 'case': case_id, 'error': 'NO PROGRESS FROM CASE IN %d SECONDS' % self.progress_timeout}
+                send(event)
+                if event['event'] in DAEMON_FINAL_EVENTS:
+                    print('CASE FINISHED ......................................................', case_id, event['event'])
+                    break
+        except OSError:
+            # -- CLIENT WENT AWAY, THE CASE STILL RUNS TO COMPLETION AND WRITES ITS FILES --
+            print('CLIENT DISCONNECTED FROM CASE ......................................', case_id)
+        finally:
+            with self.lock:
+                del self.listeners[case_id]
+        return
+
+    def serve_forever(self):
+        """ serve until a shutdown request, then stop the workers and remove the socket file """
+        if os.path.exists(self.socket_fname):
+            os.remove(self.socket_fname)
+        dispatcher = threading.Thread(target=self.dispatch, name='DaemonDispatch', daemon=True)
+        dispatcher.start()
+        self.server = socketserver.ThreadingUnixStreamServer(self.socket_fname, DaemonRequestHandler)
+        self.server.daemon_threads = True
+        self.server.solver_daemon = self
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            os.remove(self.socket_fname)
+            self.pool.terminate()
+            self.pool.join()
+            self.events.put(None)
+            dispatcher.join()
+        return
+
+
+def request_daemon(socket_fname, request):
+    """ send one request to the solver daemon and yield the events it streams back, up to the final one """
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.connect(socket_fname)
+    with connection, connection.makefile('rwb') as fobject:
+        fobject.write((json.dumps(request) + '\n').encode())
+        fobject.flush()
+        for line in fobject:
+            event = json.loads(line.decode())
+            yield event
+            if event['event'] in DAEMON_FINAL_EVENTS:
+                return
+    raise ConnectionError('SOLVER DAEMON CLOSED THE CONNECTION')
+
+
+# -- BATCH: EVERY SCENARIO DIRECTORY UNDER A ROOT, SOLVED ACROSS ONE SHARED WORKER POOL --
+SCENARIO_EXTENSIONS = ['.con', '.inl', '.raw', '.rop']
+
+
+def find_scenarios(root):
+    """ directories under root holding input files, return [scenario dir, {extension: fname} or None, problem] sorted by input size, largest first """
+    scenarios = []
+    for dirpath, dirnames, fnames in os.walk(root):
+        dirnames.sort()
+        found = dict([(x, sorted([y for y in fnames if y.lower().endswith(x)])) for x in SCENARIO_EXTENSIONS])
+        if not any(found.values()):
+            continue
+        problems = ['%d %s files' % (len(found[x]), x) for x in SCENARIO_EXTENSIONS if len(found[x]) != 1]
+        if problems:
+            scenarios.append([dirpath, None, 'EXPECTED ONE FILE PER EXTENSION, FOUND ' + ', '.join(problems), 0])
+            continue
+        fnames = dict([(x, os.path.join(dirpath, found[x][0])) for x in SCENARIO_EXTENSIONS])
+        scenarios.append([dirpath, fnames, '', sum([os.path.getsize(x) for x in fnames.values()])])
+    # -- LARGEST SCENARIOS START FIRST, SO SMALL ONES FILL THE CORES AT THE END OF THE BATCH --
+    scenarios.sort(key=lambda x: -x[3])
+    return [x[:3] for x in scenarios]
+
+
+def run_batch_scenario(scenario):
+    """ batch pool task: solve one scenario into its own directory, progress prints go to solution.log there """
+    scenario_dir, fnames, options, cache_dir, cache_size = scenario
+    if warm_up_error is not None:
+        return {'scenario': scenario_dir, 'status': 'warm_up_failed', 'error': warm_up_error}
+    record = {'scenario': scenario_dir, 'status': 'ok', 'error': '', 'contingencies': 0, 'wall_time': 0.0,
+              'log': os.path.join(scenario_dir, 'solution.log')}
+    start_time = time.time()
+    with open(record['log'], 'w') as log, contextlib.redirect_stdout(log):
+        try:
+            result = solve_case_files(fnames['.raw'], fnames['.rop'], fnames['.inl'], fnames['.con'], scenario_dir, options,
+                                      cache_dir, cache_size)
+            record['contingencies'] = result['contingencies']
+        except Exception as e:
+            record['status'] = 'failed'
+            record['error'] = '%s: %s' % (type(e).__name__, e)
+            print('SCENARIO FAILED ....................................................', record['error'])
+    record['wall_time'] = time.time() - start_time
+    return record
+
+
+def run_batch(root, nworkers, options=None, cache_dir=None, cache_size=1024.0):
+    """ solve every scenario under root in a pool of pre-warmed worker processes, return one record per scenario """
+    scenarios = find_scenarios(root)
+    records = [{'scenario': x[0], 'status': 'failed', 'error': x[2], 'contingencies': 0, 'wall_time': 0.0, 'log': ''}
+               for x in scenarios if x[1] is None]
+    tasks = [[x[0], x[1], dict(options or {}, workers=1), cache_dir, cache_size] for x in scenarios if x[1] is not None]
+    print('SCENARIOS FOUND ....................................................', len(scenarios))
+    if not tasks:
+        return records
+    pool = multiprocessing.Pool(min(nworkers, len(tasks)), initializer=init_warm_worker)
+    try:
+        for record in pool.imap_unordered(run_batch_scenario, tasks):
+            # -- A WORKER THAT CANNOT WARM UP CANNOT SOLVE ANY SCENARIO, STOP THE BATCH WITH ITS TRACEBACK --
+            if record['status'] == 'warm_up_failed':
+                raise RuntimeError('BATCH WORKER WARM UP FAILED\n' + record['error'])
+            print(('SCENARIO ' + record['status'].upper() + ' ').ljust(68, '.'), record['scenario'], round(record['wall_time'], 1))
+            records.append(record)
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.close()
+        pool.join()
+    return records
+
+
+def write_batch_summary(fname, records):
+    """ write fname.json and fname.csv with one row per scenario: status, runtime, contingencies and error """
+    records = sorted(records, key=lambda x: x['scenario'])
+    with open(fname + '.json', 'w') as fobject:
+        json.dump(records, fobject, indent=1)
+    columns = ['scenario', 'status', 'wall_time', 'contingencies', 'error', 'log']
+    with open(fname + '.csv', 'w', newline='') as fobject:
+        writer = csv.writer(fobject)
+        writer.writerow(columns)
+        writer.writerows([[x[y] for y in columns] for x in records])
+    return
+
+
+def add_solve_options(parser, budget_scope):
+    """ add the solver options shared by the command line, batch and submit parsers, budget_scope says what the time budget covers """
+    parser.add_argument('--warm-start', action='store_true', help='start contingency opfs from the base case solution')
+    parser.add_argument('--contingency-mode', choices=['opf', 'governor'], default='opf',
+                        help='opf re-optimizes every contingency, governor keeps the base dispatch and shares the imbalance by inl participation factors in a power flow')
+    parser.add_argument('--solve-mode', choices=['ac', 'dc', 'tiered'], default='ac',
+                        help='opf fidelity: ac opf, dc opf, or dc opf first and ac opf where the dc result is flow or voltage critical')
+    parser.add_argument('--opf-engine', choices=['pandapower', 'native'], default='pandapower',
+                        help='ac opf solver: pandapower, or the native sparse interior point kernel on the parsed case arrays')
+    parser.add_argument('--low-rank-outages', action='store_true',
+                        help='governor mode: solve branch outages on the factored base case jacobian with low rank updates')
+    parser.add_argument('--topology-fast-paths', action='store_true',
+                        help='skip the opf for contingencies that change nothing or island buses, found by bridge analysis of the topology')
+    parser.add_argument('--screen-threshold', type=float, default=None,
+                        help='dc estimated post-outage loading (fraction of rating) at or above which branch outages get the ac opf')
+    parser.add_argument('--time-budget', type=float, default=None,
+                        help='wall clock seconds ' + budget_scope + ', contingencies not solved in time get a fallback result')
+    return
+
+
+def get_solve_options(args):
+    """ solver options of the batch and daemon workers from arguments parsed with add_solve_options """
+    return {'warm_start': args.warm_start, 'screen_threshold': args.screen_threshold, 'time_budget': args.time_budget,
+            'contingency_mode': args.contingency_mode, 'low_rank': args.low_rank_outages, 'topology': args.topology_fast_paths,
+            'solve_mode': args.solve_mode, 'opf_engine': args.opf_engine}
+
+
+def print_dataframes_results(_net):
+    from pandas import options as pdoptions
+    pdoptions.display.max_columns = 1000
+    pdoptions.display.max_rows = 1000
+    pdoptions.display.max_colwidth = 199
+    pdoptions.display.width = None
+    pdoptions.display.precision = 4
+    print()
+    print('BUS DATAFRAME')
+    print(_net.bus)
+    print()
+    print('BUS RESULTS')
+    print(_net.res_bus)
+    print()
+    print('LINE DATAFRAME')
+    print(_net.line)
+    print()
+    print('LINE RESULTS')
+    print(_net.res_line)
+    print()
+    print('TRANSFORMER DATAFRAME')
+    print(_net.trafo)
+    print()
+    print('TRANSFORMER RESULTS')
+    print(_net.res_trafo)
+    print()
+    print('GENERATOR DATAFRAME')
+    print(_net.gen)
+    print()
+    print('GENERATOR RESULTS')
+    print(_net.res_gen)
+    print()
+    return
+
+
+# =============================================================================
+# -- MAIN ---------------------------------------------------------------------
+# =============================================================================
+if __name__ == "__main__":
+    run_start = time.time()
+    cwd = os.path.dirname(__file__)
+
+    # -- PREFLIGHT: CHECK THE INPUT FILES WITHOUT LOADING THE SOLVER ----------
+    if sys.argv[1:2] == ['preflight']:
+        print()
+        parser = argparse.ArgumentParser(prog=os.path.basename(sys.argv[0]) + ' preflight',
+                                         description='parse and cross-check the input files without building or solving the network')
+        parser.add_argument('con_fname')
+        parser.add_argument('inl_fname')
+        parser.add_argument('raw_fname')
+        parser.add_argument('rop_fname')
+        args = parser.parse_args(sys.argv[2:])
+        start_time = time.time()
+        problems = preflight_case(args.raw_fname, args.rop_fname, args.inl_fname, args.con_fname)
+        for problem in problems:
+            print('PREFLIGHT PROBLEM ..................................................', problem)
+        print('PREFLIGHT PROBLEMS FOUND ...........................................', len(problems))
+        print('DONE WITH PREFLIGHT CHECK ..........................................', round(time.time() - start_time, 2))
+        sys.exit(1 if problems else 0)
+
+    # -- BATCH: SOLVE EVERY SCENARIO DIRECTORY UNDER A ROOT -------------------
+    if sys.argv[1:2] == ['batch']:
+        print()
+        parser = argparse.ArgumentParser(prog=os.path.basename(sys.argv[0]) + ' batch',
+                                         description='solve every scenario directory under root, solutions are written next to the inputs')
+        parser.add_argument('root')
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(), help='number of worker processes, one scenario each at a time')
+        add_solve_options(parser, 'per scenario')
+        parser.add_argument('--cache-dir', default=None, help='directory for cached parsed cases and networks')
+        parser.add_argument('--cache-size', type=float, default=1024.0, help='case cache size limit in MB, least recently used entries are evicted')
+        parser.add_argument('--summary', default=None, help='summary file name without extension, default root/batch_summary')
+        args = parser.parse_args(sys.argv[2:])
+        start_time = time.time()
+        records = run_batch(args.root, max(1, args.workers), get_solve_options(args), args.cache_dir, args.cache_size)
+        summary_fname = args.summary or os.path.join(args.root, 'batch_summary')
+        write_batch_summary(summary_fname, records)
+        for record in [x for x in records if x['status'] != 'ok']:
+            print('SCENARIO FAILED ....................................................', record['scenario'], record['error'])
+        print('SCENARIOS SOLVED / FAILED ..........................................', len(records) - len([x for x in records if x['status'] != 'ok']),
+              len([x for x in records if x['status'] != 'ok']))
+        print('BATCH SUMMARY ......................................................', summary_fname + '.csv')
+        print('DONE WITH BATCH ....................................................', round(time.time() - start_time, 1))
+        sys.exit(1 if any([x['status'] != 'ok' for x in records]) else 0)
+
+    # -- SOLVER DAEMON: KEEP PRE-WARMED WORKERS RUNNING BEHIND A UNIX SOCKET --
+    if sys.argv[1:2] == ['daemon']:
+        print()
+        parser = argparse.ArgumentParser(prog=os.path.basename(sys.argv[0]) + ' daemon',
+                                         description='solve submitted cases in a pool of pre-warmed worker processes')
+        parser.add_argument('--socket', default=DAEMON_SOCKET, help='unix socket the daemon listens on')
+        parser.add_argument('--workers', type=int, default=1, help='number of pre-warmed solver processes, one case each at a time')
+        parser.add_argument('--cache-dir', default=None, help='directory for cached parsed cases and networks')
+        parser.add_argument('--cache-size', type=float, default=1024.0, help='case cache size limit in MB, least recently used entries are evicted')
+        parser.add_argument('--progress-timeout', type=float, default=DAEMON_PROGRESS_TIMEOUT,
+                            help='seconds without progress from a case after which its client gets an error event')
+        args = parser.parse_args(sys.argv[2:])
+        solver_daemon = SolverDaemon(args.socket, max(1, args.workers), args.cache_dir, args.cache_size, args.progress_timeout)
+        print('SOLVER DAEMON LISTENING ON .........................................', args.socket)
+        solver_daemon.serve_forever()
+        print('SOLVER DAEMON STOPPED ..............................................', solver_daemon.ncases)
+        sys.exit(0)
+
+    # -- SUBMIT A CASE TO THE SOLVER DAEMON, OR STOP IT -----------------------
+    if sys.argv[1:2] == ['submit']:
+        print()
+        parser = argparse.ArgumentParser(prog=os.path.basename(sys.argv[0]) + ' submit',
+                                         description='solve a case in a running solver daemon, solutions are written into the output directory')
+        parser.add_argument('con_fname', nargs='?')
+        parser.add_argument('inl_fname', nargs='?')
+        parser.add_argument('raw_fname', nargs='?')
+        parser.add_argument('rop_fname', nargs='?')
+        parser.add_argument('--socket', default=DAEMON_SOCKET, help='unix socket the daemon listens on')
+        parser.add_argument('--outdir', default='.', help='directory for solution1.txt, solution2.txt and the metrics files')
+        add_solve_options(parser, 'for the case in the daemon')
+        parser.add_argument('--ping', action='store_true', help='only check that the daemon is up')
+        parser.add_argument('--shutdown', action='store_true', help='stop the daemon')
+        args = parser.parse_args(sys.argv[2:])
+        if args.ping or args.shutdown:
+            request = {'command': 'ping' if args.ping else 'shutdown'}
+        elif None in [args.con_fname, args.inl_fname, args.raw_fname, args.rop_fname]:
+            parser.error('con_fname, inl_fname, raw_fname and rop_fname are required to submit a case')
+        else:
+            # -- THE DAEMON HAS ITS OWN WORKING DIRECTORY, SEND ABSOLUTE PATHS --
+            request = {'command': 'solve', 'con': os.path.abspath(args.con_fname), 'inl': os.path.abspath(args.inl_fname),
+                       'raw': os.path.abspath(args.raw_fname), 'rop': os.path.abspath(args.rop_fname),
+                       'outdir': os.path.abspath(args.outdir),
+                       'options': get_solve_options(args)}
+        event = {}
+        for event in request_daemon(args.socket, request):
+            if event['event'] == 'stage':
+                print('STAGE ..............................................................', event['stage'])
+            elif event['event'] == 'contingency':
+                print('CONTINGENCY DONE ...................................................', event['count'], event['label'], event['path'])
+            elif event['event'] == 'error':
+                print('SOLVER DAEMON ERROR ................................................', event['error'])
+                if 'traceback' in event:
+                    print(event['traceback'])
+            elif event['event'] == 'done' and 'solution1' in event:
+                print('SOLUTION FILES .....................................................', event['solution1'], event['solution2'])
+                print('METRICS FILE .......................................................', event['metrics'])
+                print('DONE WITH CASE .....................................................', round(event['wall_time'], 1))
+            else:
+                print(('SOLVER DAEMON ' + event['event'].upper() + ' ').ljust(68, '.'), ' '.join(
+                    ['%s=%s' % (x, event[x]) for x in sorted(event) if x != 'event']))
+        sys.exit(1 if event.get('event') != 'done' else 0)
+
+    # -- DEVELOPMENT DEFAULT --------------------------------------------------
+    if not sys.argv[1:]:
+        con_fname = cwd + r'/sandbox/scenario_1/custom_case.con'
+        inl_fname = cwd + r'/sandbox/scenario_1/case.inl'
+        raw_fname = cwd + r'/sandbox/scenario_1/custom_case.raw'
+        rop_fname = cwd + r'/sandbox/scenario_1/case.rop'
+        outfname1 = cwd + r'/sandbox/scenario_1/solution1.txt'
+        outfname2 = cwd + r'/sandbox/scenario_1/solution2.txt'
+
+        n_workers = 1
+        warm_start = False
+        screen_threshold = None
+        background_writer = False
+        cache_dir = None
+        cache_size = 1024.0
+        time_budget = None
+        contingency_mode = 'opf'
+        low_rank = False
+        topology = False
+        solve_mode = 'ac'
+        opf_engine = 'pandapower'
+        check_native = False
+
+    # -- USING COMMAND LINE ---------------------------------------------------
+    if sys.argv[1:]:
+        print()
+        parser = argparse.ArgumentParser()
+        parser.add_argument('con_fname')
+        parser.add_argument('inl_fname')
+        parser.add_argument('raw_fname')
+        parser.add_argument('rop_fname')
+        parser.add_argument('--workers', type=int, default=1, help='number of contingency worker processes')
+        add_solve_options(parser, 'for the whole run')
+        parser.add_argument('--check-native-opf', action='store_true', help='verify the native opf engine against pandapower on the base case')
+        parser.add_argument('--background-writer', action='store_true', help='serialize and flush contingency results on a background thread')
+        parser.add_argument('--cache-dir', default=None, help='directory for cached parsed cases and networks')
+        parser.add_argument('--cache-size', type=float, default=1024.0, help='case cache size limit in MB, least recently used entries are evicted')
+        args = parser.parse_args()
+        con_fname = args.con_fname
+        inl_fname = args.inl_fname
+        raw_fname = args.raw_fname
+        rop_fname = args.rop_fname
+        outfname1 = 'solution1.txt'
+        outfname2 = 'solution2.txt'
+        n_workers = max(1, args.workers)
+        warm_start = args.warm_start
+        screen_threshold = args.screen_threshold
+        background_writer = args.background_writer
+        cache_dir = args.cache_dir
+        cache_size = args.cache_size
+        time_budget = args.time_budget
+        contingency_mode = args.contingency_mode
+        low_rank = args.low_rank_outages
+        topology = args.topology_fast_paths
+        solve_mode = args.solve_mode
+        opf_engine = args.opf_engine
+        check_native = args.check_native_opf
+        if solve_mode != 'ac' and contingency_mode != 'opf':
+            parser.error('--solve-mode dc and tiered need --contingency-mode opf')
+
+    # =========================================================================
+    # -- PARSE THE INPUT FILES AND CREATE NETWORK (OR LOAD THEM FROM CACHE) ---
+    # =========================================================================
+    print()
+    metrics = RunMetrics()
+    # -- STAGE AND CONTINGENCY METRICS GO NEXT TO THE SOLUTION FILES ON EXIT, ALSO WHEN A STAGE FAILS --
+    atexit.register(metrics.write, os.path.join(os.path.dirname(outfname1), 'solution_metrics'))
+    case = load_case(raw_fname, rop_fname, inl_fname, con_fname, cache_dir, cache_size, metrics)
+
+    # -- CHECK THE NATIVE OPF ENGINE AGAINST PANDAPOWER ON THE BASE CASE ------
+    if check_native:
+        check_native_opf(case)
+
+    # -- DIAGNOSTIC DEVELOPMENT -----------------------------------------------
+    # pp.diagnostic(net, report_style='detailed', warnings_only=False)
 
     # print('--------------------------------------------------------------------')
     # print('----------------------- STRAIGHT POWER FLOW ------------------------')
@@ -1129,80 +3537,14 @@ if __name__ == "__main__":
     # print('DONE WITH CONTINGENCIES POWER FLOW .................................', round(time.time() - start_time, 1))
 
     # =========================================================================
-    # -- PROCESS BASECASE OPTIMAL POWER FLOW ----------------------------------
+    # -- SOLVE BASECASE AND CONTINGENCY OPTIMAL POWER FLOWS, WRITE SOLUTIONS --
     # =========================================================================
-    print('--------------------------------------------------------------------')
-    print('------------------------ OPTIMAL POWER FLOW ------------------------')
-    print('--------------------------------------------------------------------')
-
-    # -- SOLVE BASECASE OPTIMAL POWER FLOW --------------------------------
-    print('SOLVING BASECASE OPTIMAL POWER FLOW ................................')
-    pp.runopp(net,  init='flat', calculate_voltage_angles=True, verbose=False, suppress_warnings=True)
-
-    # -- PARTICIPATING GENERATORS Pmin = max(Pgen + pfactor * pdelta, Pmin) --------
-    # for gbus in genbuses:
-    #     if gbus in pfactor_dict:
-    #         pfactor = pfactor_dict[gbus]
-    #         # TODO ----------- get gen index
-    #         pgen = net.res_gen.loc[gbus]['p_kw']
-    #         pmin = net.gen.loc[gbus]['min_p_kw']
-    #         new_pmin = max(pgen + pfactor, pmin)
-    #         net.gen.loc[gbus, 'min_p_kw'] = new_pmin
-
-    # -- COPY BASE CASE NETWORK FOR CONTINGENCY INITIALIZATION ------------
-    opf_base_net = copy.deepcopy(net)
-
-    # -- DEVELOPEMENT -----------------------------------------------------
-    # print_dataframes_results(net)
-
-    # -- WRITE BASECASE BUS AND GENERATOR RESULTS TO FILE -----------------
-    write_base_bus_results(outfname1, net.res_bus, fxidxdict, swidxdict, net.res_gen, net.shunt, ext_grid_bus)
-    base_pgens = write_base_gen_results(outfname1, net.res_gen, gids, genbuses, net.res_ext_grid, swingbus, ext_grid_bus, swidxs)
-    print('DONE WITH BASECASE OPTIMAL POWER FLOW...............................', round(time.time() - start_time, 1))
-
-    # =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
-    # -- PROCESS OPF CONTINGENCIES ----------------------------------------
-    # =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
-    start_time = time.time()
-    if outagedict['gen']:
-        print('RUNNING OPF GENERATOR OUTAGES ......................................')
-        for genkey in outagedict['gen']:
-            net = copy.deepcopy(opf_base_net)
-            conlabel = outagedict['gen'][genkey]
-            if genkey in genidxdict:
-                genidx = genidxdict[genkey]
-                net.gen.in_service[genidx] = False
-            else:
-                print('GENERATOR NOT FOUND ................................................', conlabel)
-            pp.runopp(net, init='flat', calculate_voltage_angles=True, verbose=True, suppress_warnings=True)
-
-            # -- WRITE CONTINGENCY BUS AND GENERATOR RESULTS TO FILE ----------
-            conlabel = "'" + outagedict['gen'][genkey] + "'"
-            write_bus_results(outfname2, net.res_bus, fxidxdict, swidxdict, net.res_gen, net.shunt, conlabel, ext_grid_bus)
-            write_gen_results(outfname2, net.res_gen, gids, genbuses, base_pgens, net.res_ext_grid, swingbus, ext_grid_bus, swidxs)
-
-    if outagedict['branch']:
-        print('RUNNING OPF LINE AND TRANSFORMER OUTAGES ...........................')
-        for branchkey in outagedict['branch']:
-            net = copy.deepcopy(opf_base_net)
-            conlabel = outagedict['branch'][branchkey]
-            if branchkey in linedict:
-                lineidx = linedict[branchkey]
-                net.line.in_service[lineidx] = False
-            elif branchkey in xfmrdict:
-                xfmridx = xfmrdict[branchkey]
-                net.trafo.in_service[xfmridx] = False
-            else:
-                print('LINE OR TRANSFORMER NOT FOUND ......................................', conlabel)
-            pp.runopp(net, init='flat', calculate_voltage_angles=True, verbose=True, suppress_warnings=True)
-
-            # -- DEVELOPEMENT -----------------------------------------------------
-            # print_dataframes_results(net)
-
-            # -- WRITE CONTINGENCY BUS AND GENERATOR RESULTS TO FILE ----------
-            conlabel = "'" + outagedict['branch'][branchkey] + "'"
-            write_bus_results(outfname2, net.res_bus, fxidxdict, swidxdict, net.res_gen, net.shunt, conlabel, ext_grid_bus)
-            write_gen_results(outfname2, net.res_gen, gids, genbuses, base_pgens, net.res_ext_grid, swingbus, ext_grid_bus, swidxs)
-
-    print('DONE WITH OPF CONTINGENCIES ........................................', round(time.time() - start_time, 1))
+    solution_files = SolutionFiles(outfname1, outfname2, background_writer, screen_threshold is not None)
+    solve_options = {'workers': n_workers, 'warm_start': warm_start, 'screen_threshold': screen_threshold, 'keep_results': False,
+                     'contingency_mode': contingency_mode, 'low_rank': low_rank, 'topology': topology, 'solve_mode': solve_mode,
+                     'opf_engine': opf_engine}
+    if time_budget is not None:
+        solve_options['deadline'] = run_start + time_budget
+        solve_options['cost_history'] = os.path.join(os.path.dirname(outfname1), 'contingency_costs.json')
+    solve_case(case, solve_options, solution_files, metrics)
 
@@ -0,0 +1,276 @@
+import os
+import math
+import random
+import argparse
+
+# -- TEMPLATE CASE (IEEE 14-BUS) NEXT TO THIS SCRIPT -----------------------------
+cwd = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_RAW = os.path.join(cwd, 'case.raw')
+TEMPLATE_ROP = os.path.join(cwd, 'case.rop')
+TEMPLATE_INL = os.path.join(cwd, 'case.inl')
+
+BUS_STRIDE = 100                # tile k uses bus numbers k * BUS_STRIDE + template bus
+TIE_EAST = (4, 2)               # template buses joined by the tie line to the next tile in a row
+TIE_SOUTH = (9, 3)              # template buses joined by the tie line to the tile below
+TIE_RECORD = "{0},{1},'TL', 2.00000E-2, 8.00000E-2,   0.02000,100.0,130.0,130.0,  0.00000,  0.00000,  0.00000,  0.00000,1,1,   0.00,   1,1.0000,0,1,0,1,0,1"
+TEMPLATE_SKIP = ('GEN-3-1', 'GEN-8-1', 'LINE-7-8-BL', 'LINE-7-9-BL')   # template outages without an opf solution, 7-8 islands bus 8
+COST_SPREAD = 0.3               # cost tables of tiles after the first are scaled by a factor in [1 - spread/2, 1 + spread/2]
+
+
+# =============================================================================
+# -- FUNCTIONS ----------------------------------------------------------------
+# =============================================================================
+def is_terminator(line):
+    """ raw/rop section terminator: a record starting with 0 followed by a comment, or Q """
+    text = line.strip()
+    return text == 'Q' or text == '0' or text.startswith('0 ')
+
+
+def read_raw_sections(fname):
+    """ split a raw file into its 3 header lines, a list of (records, terminator) sections and the trailing lines """
+    with open(fname, 'r') as fobject:
+        lines = fobject.read().splitlines()
+    header = lines[:3]
+    sections = []
+    records = []
+    j = 3
+    while j < len(lines):
+        line = lines[j]
+        j += 1
+        if line.strip() == 'Q':
+            break
+        if is_terminator(line):
+            sections.append((records, line))
+            records = []
+        else:
+            records.append(line)
+    return header, sections, lines[j - 1:]
+
+
+def set_fields(record, values):
+    """ replace comma separated fields of a record, values = {field position: new text} """
+    fields = record.split(',')
+    for j in values:
+        fields[j] = values[j]
+    return ','.join(fields)
+
+
+def shift_bus(field, offset):
+    """ offset a bus number field keeping its width, 0 (no bus) stays 0 """
+    busnum = int(field)
+    if busnum == 0:
+        return field
+    return str(busnum + offset).rjust(len(field))
+
+
+def get_tile_count(nbuses, template_buses):
+    return max(1, int(math.ceil(nbuses / float(template_buses))))
+
+
+def tile_raw_sections(sections, ntiles):
+    """ repeat bus, load, shunt, generator, branch and transformer records per tile, keep one swing bus """
+    # -- RAW SECTION ORDER: 0 BUS, 1 LOAD, 2 FIXED SHUNT, 3 GENERATOR, 4 BRANCH, 5 TRANSFORMER, 16 SWITCHED SHUNT --
+    tiled = []
+    for s, (records, terminator) in enumerate(sections):
+        if s not in (0, 1, 2, 3, 4, 5, 16):
+            tiled.append((list(records), terminator))
+            continue
+        out = []
+        for k in range(ntiles):
+            offset = k * BUS_STRIDE
+            j = 0
+            while j < len(records):
+                fields = records[j].split(',')
+                if s == 0:
+                    busnum = int(fields[0]) + offset
+                    values = {0: str(busnum).rjust(len(fields[0])), 1: "'" + ('BUS-' + str(busnum)).ljust(12) + "'"}
+                    if k > 0 and int(fields[3]) == 3:
+                        values[3] = '2'                         # one swing bus, the other tiles' swing buses become pv buses
+                    out.append(set_fields(records[j], values))
+                elif s == 4:
+                    out.append(set_fields(records[j], {0: shift_bus(fields[0], offset), 1: shift_bus(fields[1], offset)}))
+                elif s == 5:
+                    nlines = 4 if int(fields[2]) == 0 else 5    # 2w records span 4 lines, 3w records 5
+                    out.append(set_fields(records[j], {0: shift_bus(fields[0], offset), 1: shift_bus(fields[1], offset),
+                                                       2: shift_bus(fields[2], offset)}))
+                    out.extend(records[j + 1:j + nlines])
+                    j += nlines
+                    continue
+                elif s == 16:
+                    out.append(set_fields(records[j], {0: shift_bus(fields[0], offset), 6: shift_bus(fields[6], offset)}))
+                else:
+                    out.append(set_fields(records[j], {0: shift_bus(fields[0], offset)}))
+                j += 1
+        if s == 4:
+            out.extend(get_tie_records(ntiles))
+        tiled.append((out, terminator))
+    return tiled
+
+
+def get_tie_records(ntiles):
+    """ tie lines joining the tiles on a square grid, east and south neighbours """
+    width = int(math.ceil(math.sqrt(ntiles)))
+    ties = []
+    for k in range(ntiles):
+        if (k + 1) % width and k + 1 < ntiles:
+            ties.append(TIE_RECORD.format(str(k * BUS_STRIDE + TIE_EAST[0]).rjust(6), str((k + 1) * BUS_STRIDE + TIE_EAST[1]).rjust(6)))
+        if k + width < ntiles:
+            ties.append(TIE_RECORD.format(str(k * BUS_STRIDE + TIE_SOUTH[0]).rjust(6), str((k + width) * BUS_STRIDE + TIE_SOUTH[1]).rjust(6)))
+    return ties
+
+
+def write_raw(fname, header, sections, trailer):
+    with open(fname, 'w', newline='\r\n') as fobject:
+        for line in header:
+            fobject.write(line + '\n')
+        for records, terminator in sections:
+            for line in records:
+                fobject.write(line + '\n')
+            fobject.write(terminator + '\n')
+        for line in trailer:
+            fobject.write(line + '\n')
+    return
+
+
+def read_rop_sections(fname):
+    """ split a rop file into its header line and a list of (records, terminator) sections """
+    with open(fname, 'r') as fobject:
+        lines = fobject.read().splitlines()
+    sections = []
+    records = []
+    for line in lines[1:]:
+        if is_terminator(line):
+            sections.append((records, line))
+            records = []
+        else:
+            records.append(line)
+    return lines[0], sections
+
+
+def tile_rop_sections(sections, ntiles, rng):
+    """ give every tile its own dispatch and cost tables, cost tables scaled by a per-tile factor """
+    # -- ROP SECTION ORDER: 4 GENERATOR DISPATCH, 5 ACTIVE POWER DISPATCH TABLES, 9 PIECEWISE LINEAR COST TABLES --
+    dispatch, powerdisp, costs = sections[4][0], sections[5][0], sections[9][0]
+    ntables = len(powerdisp)
+    # -- GROUP COST TABLE RECORDS: HEADER 'ID, LABEL, NPOINTS' THEN NPOINTS 'MW, COST' LINES --
+    costtables = []
+    j = 0
+    while j < len(costs):
+        npoints = int(costs[j].split(',')[2])
+        costtables.append((costs[j], costs[j + 1:j + 1 + npoints]))
+        j += 1 + npoints
+    out_dispatch, out_powerdisp, out_costs = [], [], []
+    for k in range(ntiles):
+        offset = k * BUS_STRIDE
+        tableoffset = k * ntables
+        factor = 1.0 + COST_SPREAD * (rng.random() - 0.5) if k > 0 else 1.0    # tile 0 keeps the template costs
+        for record in dispatch:
+            fields = record.split(',')
+            out_dispatch.append(set_fields(record, {0: shift_bus(fields[0], offset), 3: ' ' + str(int(fields[3]) + tableoffset)}))
+        for record in powerdisp:
+            fields = record.split(',')
+            out_powerdisp.append(set_fields(record, {0: str(int(fields[0]) + tableoffset), 6: ' ' + str(int(fields[6]) + tableoffset)}))
+        for header, points in costtables:
+            fields = header.split(',')
+            tableid = int(fields[0]) + tableoffset
+            out_costs.append(set_fields(header, {0: str(tableid), 1: ' LINEAR ' + str(tableid)}))
+            for point in points:
+                mw, cost = point.split(',')
+                out_costs.append(mw + ', ' + repr(float(cost) * factor))
+    tiled = list(sections)
+    tiled[4] = (out_dispatch, sections[4][1])
+    tiled[5] = (out_powerdisp, sections[5][1])
+    tiled[9] = (out_costs, sections[9][1])
+    return tiled
+
+
+def write_rop(fname, header, sections):
+    with open(fname, 'w', newline='\r\n') as fobject:
+        fobject.write(header + '\n')
+        for j, (records, terminator) in enumerate(sections):
+            for line in records:
+                fobject.write(line + '\n')
+            fobject.write(terminator + ('\n' if j + 1 < len(sections) else ''))
+    return
+
+
+def tile_inl(fname_in, fname_out, ntiles):
+    with open(fname_in, 'r') as fobject:
+        lines = fobject.read().splitlines()
+    records = [x for x in lines if x.strip() and not is_terminator(x)]
+    with open(fname_out, 'w', newline='\r\n') as fobject:
+        for k in range(ntiles):
+            for record in records:
+                fields = record.split(',')
+                fobject.write(set_fields(record, {0: shift_bus(fields[0], k * BUS_STRIDE)}) + '\n')
+        fobject.write('0 \n')
+    return
+
+
+def get_contingencies(sections, ncontingencies):
+    """ generator outages (except the swing unit) and branch outages, thinned evenly to ncontingencies (0 = all) """
+    buses, gens, branches, xfmrs = sections[0][0], sections[3][0], sections[4][0], sections[5][0]
+    swingbus = [int(x.split(',')[0]) for x in buses if int(x.split(',')[3]) == 3][0]
+    outages = []
+    for record in gens:
+        fields = record.split(',')
+        bus, gid = int(fields[0]), fields[1].strip().strip("'").strip()
+        if bus != swingbus:
+            outages.append(('GEN', bus, gid, None))
+    for record in branches:
+        fields = record.split(',')
+        outages.append(('LINE', int(fields[0]), int(fields[1]), fields[2].strip().strip("'").strip()))
+    j = 0
+    while j < len(xfmrs):
+        fields = xfmrs[j].split(',')
+        if int(fields[2]) == 0:                                 # 3w transformers are not outaged
+            outages.append(('XFMR', int(fields[0]), int(fields[1]), fields[3].strip().strip("'").strip()))
+        j += 4 if int(fields[2]) == 0 else 5
+    contingencies = []
+    for kind, i, j, ckt in outages:
+        if kind == 'GEN':
+            if 'GEN-%d-%s' % (i % BUS_STRIDE, j) not in TEMPLATE_SKIP:
+                contingencies.append(('GEN-%d-%s' % (i, j), 'REMOVE UNIT %s FROM BUS %d' % (j, i)))
+        elif ckt == 'TL' or '%s-%d-%d-%s' % (kind, i % BUS_STRIDE, j % BUS_STRIDE, ckt) not in TEMPLATE_SKIP:
+            contingencies.append(('%s-%d-%d-%s' % (kind, i, j, ckt), 'OPEN BRANCH FROM BUS %d TO BUS %d CIRCUIT %s' % (i, j, ckt)))
+    if 0 < ncontingencies < len(contingencies):
+        step = len(contingencies) / float(ncontingencies)
+        contingencies = [contingencies[int(k * step)] for k in range(ncontingencies)]
+    return contingencies
+
+
+def write_con(fname, contingencies):
+    with open(fname, 'w', newline='\r\n') as fobject:
+        for label, action in contingencies:
+            fobject.write('CONTINGENCY ' + label + '\n' + action + '\n' + 'END\n')
+        fobject.write('END\n')
+    return
+
+
+def make_scaled_case(nbuses, outdir, ncontingencies=0, seed=0):
+    """ write case.raw/.rop/.inl/.con with about nbuses buses into outdir, return (buses, contingencies) written """
+    os.makedirs(outdir, exist_ok=True)
+    rng = random.Random(seed)
+    header, sections, trailer = read_raw_sections(TEMPLATE_RAW)
+    template_buses = len(sections[0][0])
+    ntiles = get_tile_count(nbuses, template_buses)
+    raw_sections = tile_raw_sections(sections, ntiles)
+    header = header[:1] + ['Synthetic case: %d tiles of the %d-bus template' % (ntiles, template_buses)] + header[2:]
+    write_raw(os.path.join(outdir, 'case.raw'), header, raw_sections, trailer)
+    rop_header, rop_sections = read_rop_sections(TEMPLATE_ROP)
+    write_rop(os.path.join(outdir, 'case.rop'), rop_header, tile_rop_sections(rop_sections, ntiles, rng))
+    tile_inl(TEMPLATE_INL, os.path.join(outdir, 'case.inl'), ntiles)
+    contingencies = get_contingencies(raw_sections, ncontingencies)
+    write_con(os.path.join(outdir, 'case.con'), contingencies)
+    return [ntiles * template_buses, len(contingencies)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='write a scaled RAW/ROP/INL/CON case by tiling the 14-bus template')
+    parser.add_argument('nbuses', type=int, help='approximate number of buses, rounded up to whole tiles')
+    parser.add_argument('outdir', help='directory for case.raw, case.rop, case.inl and case.con')
+    parser.add_argument('--contingencies', type=int, default=0, help='number of contingencies to keep, 0 keeps all')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the per-tile cost scaling')
+    args = parser.parse_args()
+    buses, ncon = make_scaled_case(args.nbuses, args.outdir, args.contingencies, args.seed)
+    print('WROTE SCALED CASE (BUSES, CONTINGENCIES) ...........................', buses, ncon)
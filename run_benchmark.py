@@ -0,0 +1,187 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import make_scaled_case
+
+cwd = os.path.dirname(os.path.abspath(__file__))
+SOLVER = os.path.join(cwd, 'MyPython1.py')
+SOLVER_ARGS = []                # used when no solver arguments are given
+NATIVE_ENGINE_BUSES = 10000     # pandapower's opf runs out of memory building its dense constraint matrix from about 10k buses
+
+
+# =============================================================================
+# -- FUNCTIONS ----------------------------------------------------------------
+# =============================================================================
+def get_commit():
+    """ short git commit of the solver tree, '' outside a git checkout """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=cwd, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def get_case_size(casedir):
+    """ bus and contingency counts of an existing case directory """
+    header, sections, trailer = make_scaled_case.read_raw_sections(os.path.join(casedir, 'case.raw'))
+    with open(os.path.join(casedir, 'case.con'), 'r') as fobject:
+        ncon = len([x for x in fobject if x.startswith('CONTINGENCY')])
+    return [len(sections[0][0]), ncon]
+
+
+def get_engine(solver_args):
+    """ opf engine the solver runs with these arguments """
+    if '--opf-engine' in solver_args[:-1]:
+        return solver_args[solver_args.index('--opf-engine') + 1]
+    return 'pandapower'
+
+
+def get_case_args(solver_args, size, native_buses):
+    """ solver arguments for one case size, cases of native_buses or more run the native engine unless the arguments choose one """
+    if '--opf-engine' in solver_args or not native_buses or size < native_buses:
+        return list(solver_args)
+    return list(solver_args) + ['--opf-engine', 'native']
+
+
+def get_workers(solver_args):
+    """ contingency worker processes the solver runs with these arguments """
+    if '--workers' in solver_args[:-1]:
+        return int(solver_args[solver_args.index('--workers') + 1])
+    return 1
+
+
+def get_serial_args(solver_args):
+    """ the same solver arguments with one contingency worker, the serial loop the parallel run is compared against """
+    serial_args = list(solver_args)
+    serial_args[serial_args.index('--workers') + 1] = '1'
+    return serial_args
+
+
+def run_case(casedir, solver_args, logname='benchmark.log'):
+    """ run the solver on casedir/case.*, solution and metrics files are written into casedir, a failing run still reports the stages it got through """
+    command = [sys.executable, SOLVER, 'case.con', 'case.inl', 'case.raw', 'case.rop'] + solver_args
+    mfname = os.path.join(casedir, 'solution_metrics.json')
+    if os.path.exists(mfname):
+        os.remove(mfname)
+    start_time = time.time()
+    with open(os.path.join(casedir, logname), 'w') as log:
+        returncode = subprocess.call(command, cwd=casedir, stdout=log, stderr=subprocess.STDOUT)
+    wall_time = time.time() - start_time
+    stages = {}
+    contingencies = []
+    if os.path.exists(mfname):
+        with open(mfname, 'r') as fobject:
+            metrics = json.load(fobject)
+        stages = dict([(x['stage'], {'wall_time': x['wall_time'], 'cpu_time': x['cpu_time'], 'peak_rss_mb': x['peak_rss_mb']})
+                       for x in metrics['stages']])
+        contingencies = metrics['contingencies']
+    return [returncode, wall_time, stages, contingencies]
+
+
+def get_previous_record(fname, record):
+    """ last stored record for the same case size, solver arguments and opf engine """
+    previous = None
+    if not os.path.exists(fname):
+        return previous
+    with open(fname, 'r') as fobject:
+        for line in fobject:
+            if not line.strip():
+                continue
+            x = json.loads(line)
+            if x['size'] == record['size'] and x['solver_args'] == record['solver_args'] and x['ncontingencies'] == record['ncontingencies'] and \
+                    x.get('engine', get_engine(x['solver_args'])) == record['engine']:
+                previous = x
+    return previous
+
+
+def print_comparison(record, previous):
+    """ stage wall times of this run next to the previous run of the same benchmark """
+    print('-- %d BUSES, %d CONTINGENCIES, %s OPF, COMMIT %s -----' % (record['buses'], record['ncontingencies'], record['engine'].upper(),
+                                                                       record['commit'] or '?'))
+    if record['returncode'] != 0:
+        print('SOLVER FAILED, SEE ................................................', record['log'])
+    print('%-24s %12s %12s %8s' % ('STAGE', 'WALL (S)', 'PREVIOUS', 'RATIO'))
+    names = list(record['stages']) + ['total']
+    for name in names:
+        now = record['total_wall_time'] if name == 'total' else record['stages'][name]['wall_time']
+        before = None
+        if previous is not None:
+            before = previous['total_wall_time'] if name == 'total' else previous['stages'].get(name, {}).get('wall_time')
+        if before:
+            print('%-24s %12.3f %12.3f %8.2f' % (name, now, before, now / before))
+        else:
+            print('%-24s %12.3f %12s %8s' % (name, now, '', ''))
+    speedup = record.get('speedup')
+    if speedup is not None:
+        print('CONTINGENCY WALL TIME WITH --workers 1 / THIS RUN (S) .............',
+              round(record['serial']['stages'].get('contingencies', {}).get('wall_time', 0.0), 3),
+              round(record['stages'].get('contingencies', {}).get('wall_time', 0.0), 3))
+        print('CONTINGENCY SPEEDUP OVER THE SERIAL LOOP (--workers 1) ............', speedup['contingencies'])
+        print('TOTAL SPEEDUP OVER THE SERIAL LOOP (--workers 1) ..................', speedup['total'])
+    return
+
+
+def get_speedup(record, serial):
+    """ serial wall time over parallel wall time of the contingency stage and of the whole run, None when a run failed """
+    if record['returncode'] != 0 or serial['returncode'] != 0:
+        return {'contingencies': None, 'total': None}
+    parallel_time = record['stages'].get('contingencies', {}).get('wall_time')
+    serial_time = serial['stages'].get('contingencies', {}).get('wall_time')
+    return {'contingencies': round(serial_time / parallel_time, 3) if parallel_time and serial_time else None,
+            'total': round(serial['total_wall_time'] / record['total_wall_time'], 3)}
+
+
+# =============================================================================
+# -- MAIN ---------------------------------------------------------------------
+# =============================================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='time every solver stage on synthetic cases of increasing size')
+    parser.add_argument('--sizes', default='100,1000,10000,50000', help='comma separated approximate bus counts')
+    parser.add_argument('--contingencies', type=int, default=20, help='contingencies per case, 0 keeps all')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the per-tile cost scaling')
+    parser.add_argument('--case-dir', default=os.path.join(cwd, 'benchmark_cases'), help='directory for the generated cases')
+    parser.add_argument('--results', default=None, help='results file, one json record per run is appended, default CASE_DIR/benchmark_results.jsonl')
+    parser.add_argument('--native-buses', type=int, default=NATIVE_ENGINE_BUSES,
+                        help='cases of this many buses or more run --opf-engine native unless the solver arguments choose an engine, 0 never')
+    parser.add_argument('--regenerate', action='store_true', help='rewrite cases that already exist')
+    parser.add_argument('--label', default='', help='free text stored with the results')
+    parser.add_argument('--no-serial', action='store_true',
+                        help='with --workers above 1, skip the second --workers 1 run that the speedup is measured against')
+    parser.add_argument('solver_args', nargs=argparse.REMAINDER,
+                        help='arguments passed on to the solver after --, e.g. -- --workers 4, default ' + ' '.join(SOLVER_ARGS))
+    args = parser.parse_args()
+    solver_args = [x for x in args.solver_args if x != '--'] or SOLVER_ARGS
+    results = args.results or os.path.join(args.case_dir, 'benchmark_results.jsonl')
+    if not os.path.exists(os.path.dirname(os.path.abspath(results))):
+        os.makedirs(os.path.dirname(os.path.abspath(results)))
+
+    for size in [int(x) for x in args.sizes.split(',')]:
+        casedir = os.path.join(args.case_dir, 'buses_%d_con_%d' % (size, args.contingencies))
+        start_time = time.time()
+        if args.regenerate or not os.path.exists(os.path.join(casedir, 'case.con')):
+            buses, ncon = make_scaled_case.make_scaled_case(size, casedir, args.contingencies, args.seed)
+        else:
+            buses, ncon = get_case_size(casedir)
+        generate_time = time.time() - start_time
+        print('RUNNING BENCHMARK CASE ...........................................', casedir)
+        case_args = get_case_args(solver_args, size, args.native_buses)
+        returncode, wall_time, stages, contingencies = run_case(casedir, case_args)
+        record = {'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'commit': get_commit(), 'label': args.label,
+                  'size': size, 'buses': buses, 'ncontingencies': ncon,
+                  'solver_args': case_args, 'engine': get_engine(case_args), 'returncode': returncode, 'generate_time': generate_time,
+                  'total_wall_time': wall_time, 'stages': stages,
+                  'contingency_wall_time': sum([x['wall_time'] for x in contingencies]),
+                  'log': os.path.join(casedir, 'benchmark.log')}
+        if get_workers(case_args) > 1 and not args.no_serial:
+            print('RUNNING SERIAL REFERENCE (--workers 1) ...........................', casedir)
+            serial_args = get_serial_args(case_args)
+            returncode, wall_time, stages, contingencies = run_case(casedir, serial_args, 'benchmark_serial.log')
+            record['serial'] = {'solver_args': serial_args, 'returncode': returncode, 'total_wall_time': wall_time, 'stages': stages,
+                                'contingency_wall_time': sum([x['wall_time'] for x in contingencies])}
+            record['speedup'] = get_speedup(record, record['serial'])
+        previous = get_previous_record(results, record)
+        with open(results, 'a') as fobject:
+            fobject.write(json.dumps(record) + '\n')
+        print_comparison(record, previous)
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# -- THE SOLVER IS A SCRIPT IN THE REPOSITORY ROOT, NOT AN INSTALLED PACKAGE --
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
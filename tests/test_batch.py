@@ -0,0 +1,20 @@
+import os
+
+import pytest
+
+import MyPython1
+from test_deadline import copy_case
+
+
+def fail_warm_up():
+    raise ImportError('pandapower is broken')
+
+
+def test_batch_fails_fast_when_workers_cannot_warm_up(tmpdir, monkeypatch):
+    """ a raising pool initializer is restarted forever, the batch must stop with the warm up traceback instead """
+    copy_case(os.path.join(str(tmpdir), 'scenario_1'))
+    monkeypatch.setattr(MyPython1, 'warm_up_solver', fail_warm_up)
+    with pytest.raises(RuntimeError) as error:
+        MyPython1.run_batch(str(tmpdir), 2)
+    assert 'WARM UP FAILED' in str(error.value)
+    assert 'pandapower is broken' in str(error.value)
@@ -0,0 +1,59 @@
+import os
+import gzip
+import pickle
+
+import numpy
+import pytest
+
+import MyPython1
+import make_scaled_case
+from conftest import ROOT
+from MyPython1 import CASE_FIELDS
+
+# -- REFERENCE BUILDS: ELEMENT TABLES AND INDEX MAPS OF THE PER-ROW NETWORK BUILD THE BULK BUILD REPLACED --
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+ELEMENTS = ['bus', 'load', 'gen', 'shunt', 'line', 'trafo', 'ext_grid', 'polynomial_cost', 'piecewise_linear_cost']
+
+
+def load_reference_build(name):
+    """ stored reference build {'tables': {element: dataframe}, 'maps': {case field: index map}} """
+    with gzip.open(os.path.join(DATA_DIR, name + '.pkl.gz'), 'rb') as fobject:
+        return pickle.load(fobject)
+
+
+def compare_tables(net, tables):
+    """ compare the element tables of a network build with reference tables, return the names of tables that differ """
+    import pandas
+    mismatches = []
+    array_columns = {'polynomial_cost': ['c'], 'piecewise_linear_cost': ['p', 'f']}
+    for element in ELEMENTS:
+        columns = array_columns.get(element, [])
+        try:
+            pandas.testing.assert_frame_equal(net[element].drop(columns, axis=1), tables[element].drop(columns, axis=1), check_exact=True)
+            for column in columns:
+                for x, y in zip(net[element][column].values, tables[element][column].values):
+                    numpy.testing.assert_array_equal(x, y)
+        except AssertionError:
+            mismatches.append(element)
+    return mismatches
+
+
+# =============================================================================
+# -- TESTS --------------------------------------------------------------------
+# =============================================================================
+def check_case_build(case_dir, name):
+    """ the network build of a case matches the stored reference build, tables and element index maps """
+    case = MyPython1.build_case(*[os.path.join(case_dir, 'case' + x) for x in ['.raw', '.con', '.rop', '.inl']])
+    case = dict(zip(CASE_FIELDS, case))
+    reference = load_reference_build(name)
+    assert compare_tables(case['net'], reference['tables']) == []
+    assert {x: case[x] for x in CASE_FIELDS[9:]} == reference['maps']
+
+
+def test_case_build_matches_reference():
+    check_case_build(ROOT, 'case_build')
+
+
+def test_scaled_case_build_matches_reference(tmpdir):
+    make_scaled_case.make_scaled_case(300, str(tmpdir), ncontingencies=10)
+    check_case_build(str(tmpdir), 'scaled_300_build')
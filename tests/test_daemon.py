@@ -0,0 +1,43 @@
+import os
+import time
+import threading
+
+import pytest
+
+import MyPython1
+from conftest import ROOT
+
+
+def fail_warm_up():
+    raise ImportError('pandapower is broken')
+
+
+def solve_slowly(*args, **kwargs):
+    time.sleep(60.0)
+
+
+def test_daemon_startup_fails_when_workers_cannot_warm_up(tmpdir, monkeypatch):
+    monkeypatch.setattr(MyPython1, 'warm_up_solver', fail_warm_up)
+    with pytest.raises(RuntimeError) as error:
+        MyPython1.SolverDaemon(os.path.join(str(tmpdir), 'daemon.sock'), 2)
+    assert 'WARM UP FAILED' in str(error.value)
+    assert 'pandapower is broken' in str(error.value)
+
+
+def test_daemon_client_gets_error_when_case_makes_no_progress(tmpdir, monkeypatch):
+    monkeypatch.setattr(MyPython1, 'solve_case_files', solve_slowly)
+    socket_fname = os.path.join(str(tmpdir), 'daemon.sock')
+    solver_daemon = MyPython1.SolverDaemon(socket_fname, 1, progress_timeout=1.0)
+    server = threading.Thread(target=solver_daemon.serve_forever)
+    server.start()
+    try:
+        while not os.path.exists(socket_fname):
+            time.sleep(0.05)
+        request = {'command': 'solve', 'outdir': str(tmpdir)}
+        request.update([(x[1:], os.path.join(ROOT, 'case' + x)) for x in MyPython1.SCENARIO_EXTENSIONS])
+        events = list(MyPython1.request_daemon(socket_fname, request))
+    finally:
+        list(MyPython1.request_daemon(socket_fname, {'command': 'shutdown'}))
+        server.join()
+    assert [x['event'] for x in events] == ['queued', 'started', 'error']
+    assert 'NO PROGRESS' in events[-1]['error']
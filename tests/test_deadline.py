@@ -0,0 +1,29 @@
+import os
+import shutil
+
+import MyPython1
+from conftest import ROOT
+
+
+def copy_case(scenario_dir):
+    """ copy the repository case into a scenario directory """
+    os.makedirs(scenario_dir)
+    for extension in MyPython1.SCENARIO_EXTENSIONS:
+        shutil.copy(os.path.join(ROOT, 'case' + extension), scenario_dir)
+    return scenario_dir
+
+
+def test_budgeted_batch_solves_contingencies_in_daemonic_worker(tmpdir):
+    """ batch workers are daemonic and cannot start a pool, a time budget solves the contingencies in process """
+    scenario_dir = copy_case(os.path.join(str(tmpdir), 'scenario_1'))
+    records = MyPython1.run_batch(str(tmpdir), 1, {'time_budget': 600.0})
+    assert [x['status'] for x in records] == ['ok'], records
+    assert records[0]['contingencies'] > 0
+    with open(records[0]['log']) as fobject:
+        log = fobject.read()
+    assert 'daemonic' not in log
+    assert 'USING FALLBACK' not in log
+    with open(os.path.join(scenario_dir, 'solution2_convergence.csv')) as fobject:
+        rows = fobject.read().splitlines()[1:]
+    assert len(rows) == records[0]['contingencies']
+    assert not [x for x in rows if 'fallback' in x]
@@ -0,0 +1,44 @@
+import os
+
+import numpy
+import pytest
+
+import MyPython1
+import make_scaled_case
+
+
+def solve_governor(case_dir, low_rank):
+    """ governor response contingency results of a case by label, branch outages by low rank updates or full power flows """
+    case = MyPython1.load_case(*[os.path.join(case_dir, 'case' + x) for x in ['.raw', '.rop', '.inl', '.con']])
+    result = MyPython1.solve_case(case, {'contingency_mode': 'governor', 'low_rank': low_rank})
+    return dict([(x['label'], x) for x in result['contingencies']])
+
+
+@pytest.fixture(scope='module')
+def scaled_case(tmpdir_factory):
+    """ scaled case with branch outages and its contingencies solved by full power flows """
+    case_dir = str(tmpdir_factory.mktemp('case'))
+    make_scaled_case.make_scaled_case(14, case_dir, ncontingencies=10)
+    return case_dir, solve_governor(case_dir, False)
+
+
+def test_low_rank_outages_match_full_power_flows(scaled_case):
+    case_dir, full = scaled_case
+    low_rank = solve_governor(case_dir, True)
+    solved = [x for x in low_rank if low_rank[x]['start'] == 'low_rank']
+    assert len(solved) >= 3
+    for label in solved:
+        a, b = low_rank[label], full[label]
+        assert abs(a['res_bus']['vm_pu'].values - b['res_bus']['vm_pu'].values).max() < 1e-6
+        assert numpy.nanmax(abs(a['res_bus']['va_degree'].values - b['res_bus']['va_degree'].values)) < 1e-4
+        assert abs(a['res_gen']['p_kw'].values - b['res_gen']['p_kw'].values).max() < MyPython1.GOVERNOR_TOLERANCE
+        assert abs(a['res_ext_grid']['p_kw'].values - b['res_ext_grid']['p_kw'].values).max() < MyPython1.GOVERNOR_TOLERANCE
+
+
+def test_low_rank_outages_fall_back_on_unknown_pandapower(scaled_case, monkeypatch):
+    case_dir, full = scaled_case
+    monkeypatch.setattr(MyPython1, 'LOW_RANK_PANDAPOWER', ('0.0.',))
+    low_rank = solve_governor(case_dir, True)
+    assert [x for x in low_rank if low_rank[x]['start'] == 'low_rank'] == []
+    for label in full:
+        assert low_rank[label]['res_bus'].equals(full[label]['res_bus'])
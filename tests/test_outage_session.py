@@ -0,0 +1,98 @@
+import os
+import copy
+import time
+
+import pytest
+
+import MyPython1
+import make_scaled_case
+
+
+def run_contingencies_by_copy(base_net, tasks, options):
+    """ reference contingency loop: a flat start opf on a deep copy of the base network per contingency """
+    import pandapower as pp
+    for task in tasks:
+        c_start = time.process_time()
+        c_wall = time.time()
+        net = copy.deepcopy(base_net)
+        for element, elementidx in MyPython1.get_task_elements(task):
+            net[element].loc[elementidx, 'in_service'] = False
+        pp.runopp(net, init='flat', calculate_voltage_angles=True, verbose=False, suppress_warnings=True, PDIPM_MAX_IT=MyPython1.OPF_ITMXN)
+        yield {'label': task[0], 'status': 'converged', 'start': 'flat', 'path': 'ac', 'iterations': 0, 'objective': float(net.res_cost),
+               'res_bus': net.res_bus[['vm_pu', 'va_degree']].copy(), 'res_gen': net.res_gen[['p_kw', 'q_kvar']].copy(),
+               'res_ext_grid': net.res_ext_grid[['p_kw', 'q_kvar']].copy(), 'res_shunt': net.res_shunt[['q_kvar']].copy(),
+               'cpu_time': time.process_time() - c_start, 'wall_time': time.time() - c_wall, 'peak_rss_mb': 0.0}
+
+
+def solve_solution2(case_dir, outdir, options):
+    """ solve the case in case_dir into outdir, return the contingency solution file """
+    os.makedirs(outdir)
+    MyPython1.solve_case_files(*[os.path.join(case_dir, 'case' + x) for x in ['.raw', '.rop', '.inl', '.con']], outdir=outdir, options=options)
+    with open(os.path.join(outdir, 'solution2.txt')) as fobject:
+        return fobject.read()
+
+
+@pytest.fixture(scope='module')
+def reference(tmpdir_factory):
+    """ template case with several generator and branch outages, solved by the deep copy loop """
+    case_dir = str(tmpdir_factory.mktemp('case'))
+    make_scaled_case.make_scaled_case(14, case_dir, ncontingencies=6)
+    run_contingencies = MyPython1.run_contingencies
+    MyPython1.run_contingencies = run_contingencies_by_copy
+    try:
+        solution2 = solve_solution2(case_dir, os.path.join(case_dir, 'copy'), {})
+    finally:
+        MyPython1.run_contingencies = run_contingencies
+    return case_dir, solution2
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_outage_session_matches_deepcopy_loop(reference, workers):
+    case_dir, solution2 = reference
+    assert solution2.count('--contingency') == 6
+    assert solve_solution2(case_dir, os.path.join(case_dir, 'session_%d' % workers), {'workers': workers}) == solution2
+
+
+def test_pandapower_opf_restored_after_contingencies(reference):
+    import pandapower.optimal_powerflow as optimal_powerflow
+    opf = optimal_powerflow.opf
+    case_dir, solution2 = reference
+    assert solve_solution2(case_dir, os.path.join(case_dir, 'restored'), {}) == solution2
+    assert optimal_powerflow.opf is opf
+
+
+def test_failed_contingency_left_out_of_solution2(reference, monkeypatch):
+    case_dir, solution2 = reference
+    run_contingencies = MyPython1.run_contingencies
+    def run_failing_first(net, tasks, options):
+        for c_result in run_contingencies(net, tasks, options):
+            if c_result['label'] == tasks[0][0]:
+                c_result = {x: y for x, y in c_result.items() if not x.startswith('res_')}
+                c_result.update(status='failed', message='injected failure')
+            yield c_result
+    monkeypatch.setattr(MyPython1, 'run_contingencies', run_failing_first)
+    outdir = os.path.join(case_dir, 'failed')
+    failed = solve_solution2(case_dir, outdir, {})
+    blocks = solution2.split('--contingency')
+    assert failed.count('--contingency') == 5
+    assert failed == blocks[0] + '--contingency' + '--contingency'.join(blocks[2:])
+    with open(os.path.join(outdir, 'solution2_convergence.csv')) as fobject:
+        rows = fobject.read().splitlines()
+    assert len(rows) == 7
+    assert ',none,' in rows[1] and ',failed,' in rows[1]
+
+
+@pytest.mark.parametrize('solve_mode', ['dc', 'tiered'])
+def test_dc_results_tagged_in_solutions(reference, solve_mode):
+    case_dir, solution2 = reference
+    outdir = os.path.join(case_dir, solve_mode)
+    blocks = solve_solution2(case_dir, outdir, {'solve_mode': solve_mode}).split('--contingency')[1:]
+    with open(os.path.join(outdir, 'solution2_convergence.csv')) as fobject:
+        fidelities = [x.split(',')[2] for x in fobject.read().splitlines()[1:]]
+    assert len(blocks) == len(fidelities) == 6
+    for block, fidelity in zip(blocks, fidelities):
+        assert ('--fidelity section' in block) == (fidelity != 'ac')
+        assert block.rstrip().endswith('--fidelity section\nfidelity\n' + fidelity) or fidelity == 'ac'
+    with open(os.path.join(outdir, 'solution1.txt')) as fobject:
+        solution1 = fobject.read()
+    assert solve_mode == 'tiered' or solution1.rstrip().endswith('--fidelity section\nfidelity\ndc')
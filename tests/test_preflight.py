@@ -0,0 +1,50 @@
+import os
+import re
+import shutil
+
+import MyPython1
+from conftest import ROOT
+
+
+def copy_case(tmpdir):
+    """ copy the small case into tmpdir, return the raw, rop, inl and con paths in preflight_case order """
+    fnames = []
+    for ext in ['raw', 'rop', 'inl', 'con']:
+        fnames.append(os.path.join(str(tmpdir), 'case.' + ext))
+        shutil.copy(os.path.join(ROOT, 'case.' + ext), fnames[-1])
+    return fnames
+
+
+def edit(fname, pattern, replacement):
+    with open(fname, newline='') as fobject:
+        text = fobject.read()
+    text, n = re.subn(pattern, replacement, text, count=1)
+    assert n == 1
+    with open(fname, 'w', newline='') as fobject:
+        fobject.write(text)
+
+
+def test_clean_case(tmpdir):
+    assert MyPython1.preflight_case(*copy_case(tmpdir)) == []
+
+
+def test_unknown_contingency_elements(tmpdir):
+    """ plain and quoted con records take different parse paths, both report the unknown branch """
+    raw, rop, inl, con = copy_case(tmpdir)
+    edit(con, r"CIRCUIT +BL", "CIRCUIT  ZZ")
+    assert MyPython1.get_contingency_key_sets(con) is not None
+    problems = MyPython1.preflight_case(raw, rop, inl, con)
+    assert problems == ['CON: CONTINGENCY LINE-6-12-BL OUTAGES UNKNOWN BRANCH 6-12-ZZ']
+    edit(con, r"CIRCUIT +(\w+)\r?\n", "CIRCUIT  '\\1'\n")
+    assert MyPython1.get_contingency_key_sets(con) is None
+    assert MyPython1.preflight_case(raw, rop, inl, con) == problems
+
+
+def test_bad_cost_tables(tmpdir):
+    """ a nan point is not ascending, a cost table without points covers no generator range """
+    raw, rop, inl, con = copy_case(tmpdir)
+    edit(rop, r"(begin Piece.*\n.*\n.*\n)[^\n]*\n", "\\1nan, 1.0\n")
+    assert MyPython1.preflight_case(raw, rop, inl, con) == ['ROP: PIECEWISE LINEAR COSTS FOR 3-1 ARE NOT IN ASCENDING ORDER']
+    shutil.copy(os.path.join(ROOT, 'case.rop'), rop)
+    edit(rop, r"(begin Piece.*\n1, LINEAR 1, )10\r?\n(.*\n){10}", "\\g<1>0\n")
+    assert MyPython1.preflight_case(raw, rop, inl, con) == ['ROP: PIECEWISE LINEAR COSTS FOR 3-1 DO NOT COVER THE GENERATOR POWER RANGE']
@@ -0,0 +1,29 @@
+import os
+import re
+
+import numpy
+
+import MyPython1
+from conftest import ROOT
+
+
+def test_bare_zero_terminators(tmpdir):
+    """ a bare 0 record ends a section like '0 / END OF ... DATA', with or without trailing blanks """
+    with open(os.path.join(ROOT, 'case.raw')) as fobject:
+        text = fobject.read()
+    terminators = re.compile(r"^0 / END OF .*$", re.M)
+    nterminators = len(terminators.findall(text))
+    bare = iter(['0', '0   ', '0\t'] * nterminators)
+    fname = os.path.join(str(tmpdir), 'bare.raw')
+    with open(fname, 'w') as fobject:
+        fobject.write(terminators.sub(lambda x: next(bare), text))
+    header, sectionranges = MyPython1.get_raw_section_index(fname)
+    assert len(sectionranges) == nterminators
+    rawdata = MyPython1.get_raw_data(os.path.join(ROOT, 'case.raw'))[2]
+    bare_rawdata = MyPython1.get_raw_data(fname)[2]
+    assert sorted(bare_rawdata) == sorted(rawdata)
+    for section in rawdata:
+        if section == 'xfmr3w':
+            assert bare_rawdata[section] == rawdata[section]
+        else:
+            numpy.testing.assert_array_equal(bare_rawdata[section], rawdata[section])